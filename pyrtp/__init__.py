@@ -0,0 +1,11 @@
+# pyrtp. Random tone pitch task (Mulder et al 2013) as an importable package.
+#   task ......... the psychopy session (main() runs a session)
+#   analysis ..... behavioral report (main() writes sess_results.pdf)
+#   pickle2csv ... converts a session's taskData pickle to data.csv (or every out of date session with --all)
+#   datastore .... consolidated trial store of all sessions with incremental ingestion and queries
+#   adhoc ........ experimenter paced button press / sync pulse logging
+#   render ....... offline stimulus renderer (no psychopy)
+#   benchmark .... trial loop (runTrial with a null audio core) and import time benchmarks (no psychopy)
+#   simulate ..... simulated sessions with a drift-diffusion agent (no psychopy)
+#   params, config, cache, trials, stimulus, synth, audio, response, sync, storage ... building blocks used by the tools above
+# Importing the package (or any of its modules) does not import psychopy, labjack, matplotlib or scipy; those are imported when a tool starts.
@@ -0,0 +1,401 @@
+# RTP_analysis (Random Tone Pitch Analysis). Performs basic RT analysis on behavioral data. Saves a multi-page pdf summarizing results in the session folder. Run the report with main() ($ python pyRTP_analysis.py). matplotlib and scipy are only imported by the functions that need them, so loading data does not pay for them.
+
+import numpy as np
+import pandas as pd
+import os
+
+from pyrtp.storage import findSessionTable,readSessionTable
+from pyrtp.config import loadSessionConfig
+from pyrtp.cache import ResultCache,cacheKey,frameHash
+
+# version of the analyses below. Bump it when a change alters their results or figures, so cached results (pyrtp.cache) are recomputed
+ANALYSIS_VERSION = 1
+
+
+def setupMatplotlib():
+    # plot in separate windows, interactive
+    import matplotlib
+    #matplotlib.use('macosx')
+
+    matplotlib.rcParams['interactive'] = True
+    matplotlib.rcParams['axes.autolimit_mode'] = 'round_numbers'
+    matplotlib.rcParams['axes.xmargin'] = 0
+    matplotlib.rcParams['axes.ymargin'] = 0
+
+
+# Define Functions
+
+# load task_df and config
+def loadData(subj,sessNum):
+    # Loads the session table (data.parquet or data.feather if the session has one, else data.csv) and the config of a session (pyrtp.config.SessionConfig)
+    savedir = os.getcwd()+'/data/'+subj+'/session'+str(sessNum)+'/'
+    sesspath_data = findSessionTable(savedir)
+    task_df = readSessionTable(sesspath_data)
+    config = loadSessionConfig(savedir)
+    return task_df,config,savedir
+
+
+# getRTs
+def getRTs(task_df,evQuery = None,rt_dist_type = 'standard'):
+
+    # This function returns rt values for all trials from a subject. It has the option to filter out particular trials, and apply various transforms on the rt distribution
+
+    #evQuery .. how to filter events
+
+    #rt_dist_type
+    #            'standard' ... no transform       
+    #            'reciprocal'... 1/rt
+    #            'zrrt'...z-score (-1/RT) (as used in later analyses,
+    #             no need to invert axes as high RTs are on the right
+    #            'reciprobit'...cum probability vs. 1/rt
+
+    from scipy import stats
+
+    # filter by trial type (e.g., error = 0)
+    if evQuery != None:
+    	task_df = task_df.query(evQuery)
+
+
+    # parse rt dist type
+    if rt_dist_type == 'standard':
+        rts = task_df['RT'].to_numpy()
+    elif rt_dist_type == 'reciprocal':
+        rts = -1./task_df['RT'].to_numpy().astype('float')
+    elif rt_dist_type == 'zrrt':
+        rts = stats.zscore(-1./task_df.query('RT>0')['RT'].to_numpy().astype('float'))
+    elif rt_dist_type == 'reciprobit':
+    	# SORTED RTs
+    	rts = np.sort(task_df['RT'].to_numpy().astype('float'))
+
+    return rts
+#basic function to plot RT
+def plotRT(task_df, evQuery = None, ax = None,plot_type = 'standard', bins = 40, alpha = 1,label = None,plot_median = False):
+    # Note: this funciton doesnt set the axes for the RT plot. Run set_axes_rt afterwards
+    # Inputs:
+    #evQuery .. how to filter events
+    #ax .. axes to plot on
+    #plot_type ..'standard'... plots standard rts
+    #            'reciprocal'...-1/rt
+    #            'zrrt'...z-score (-1/RT) (as used in later analyses)
+    #            for reciprocal and zrrt, no need to invert axes as high RTs are on the right
+    #            'reciprobit'...cum probability vs. 1/rt
+    #bins......  number of bins for hist plots
+    #alpha.....transperency of histrogram
+    #label..... label of distribution
+    import matplotlib.pyplot as plt
+    from scipy import stats
+
+    # parse fig,ax
+    if ax==None:
+        fig = plt.figure(figsize=(5,5))
+        ax = plt.subplot(111)
+
+    # plot RT dist for various formats
+    if plot_type == 'reciprobit': # plot reciprobit plot -SPECIAL CASE
+        # plot empirical cumulative distribution function of RT dist
+        # x values are sorted RT data
+        rt_sort = getRTs(task_df,evQuery = evQuery,rt_dist_type = plot_type)
+
+
+        # y values are cumulative probabilities (cumulative sum of x values that are normalized)
+        cum_prob = np.cumsum(rt_sort)/np.sum(rt_sort)
+
+        # convert cum_prob to probit scale (inverse of CDF)
+        cum_prob_probit = stats.norm.ppf(cum_prob);
+
+        # plot cumulative probabilities
+        l = ax.plot(-1/rt_sort,cum_prob_probit,marker = '.',linestyle='',alpha=0.5,label = label)
+        col = l[0].get_color()
+        med_rt = np.median(-1/rt_sort)
+
+    else: # plot standard,reciprocal or zrrt RT
+        rts = getRTs(task_df,evQuery = evQuery,rt_dist_type = plot_type)
+        h = ax.hist(rts, bins = bins, alpha = alpha,label = label)
+        col = h[2][0].get_facecolor()
+        med_rt = np.median(rts)
+
+    #if plot_median== True:
+        #yl = ylim()
+        #ax.vlines(x = med_rt,ymin = yl[0]*10, ymax = ylim()[1]*10,linestyles = 'dashed',alpha = 0.7,color = col)
+        #ylim(yl)
+
+
+# set axes for RT plot
+def set_axes_rt(ax, plot_type = 'standard',legend_fontsize = 10):
+    # Input:
+    #ax... axis on which RT distributions are plotted
+    #plot_type ..'standard'... plots standard rts
+    #            'reciprocal'...1/rt
+    #            'reciprobit'...cum probability vs. 1/rt
+
+
+    # invert x-axis and label xticks with RT values
+    if plot_type in ['reciprocal','reciprobit']:
+
+        # set xtick labels as 1/xtick values so that RT values are shown
+        ax.set_xticklabels(labels = -1*np.round(1/ax.get_xticks(),1))
+
+    if plot_type in ['standard','reciprocal']:
+        # set labels
+        ax.set_xlabel('RT (s)')
+        ax.set_ylabel('Count')
+    elif plot_type == 'zrrt':
+        ax.set_xlabel('z(-1/RT)')
+        ax.set_ylabel('Count')
+    elif plot_type == 'reciprobit':
+        # set labels
+        ax.set_xlabel('RT (s)')
+        ax.set_ylabel('z-score Cumulative probability')
+
+    # set label
+    ax.legend(fontsize = legend_fontsize)
+
+
+# plot RT distributions by condition
+# run function
+def plot_RT_by_condition(task_df,condition = 'coherence',bins = 20, evQuery=None,label = None, plot_type = 'standard',fig_params_dict=None,ax = None,plot_median = True):
+    # Inputs
+    # ax ... must be of length two (left is full RT dist, right is by delay)
+    import matplotlib.pyplot as plt
+
+    # default fig_params
+    fig_params={'figsize':(10,5),'label':evQuery,'title':'RT '+plot_type,'title_fontsize':15}
+
+    # update fig_params
+    if fig_params_dict!=None:
+        fig_params.update(fig_params_dict)
+
+    if ax == None:
+        fig = plt.figure(figsize=(fig_params['figsize'][0],fig_params['figsize'][1]))
+
+    # set title
+    fig.suptitle(fig_params['title'],fontsize=fig_params['title_fontsize'])
+
+    # plot full RT
+    # create axes
+    if ax == None:
+        ax_list = [] 
+        ax_list.append(plt.subplot(1,2,1))
+        ax_list.append(plt.subplot(1,2,2))
+
+
+    # plot RT
+    plotRT(task_df,evQuery = evQuery,bins=bins, ax = ax_list[0],plot_type = plot_type,label=fig_params['label'],alpha =0.5, plot_median = plot_median)
+    set_axes_rt(ax= ax_list[0],plot_type = plot_type)
+
+    # plot RT by delay
+
+    # plot RT dist for delay trials
+    condition_list = np.unique(task_df[condition].to_numpy())
+
+    # filter trials based on inputted evQuery
+    if evQuery!=None:
+        task_df = task_df.query(evQuery)
+
+    # loop through delay conditions
+    for i in np.arange(0,len(condition_list)):
+
+        # store thisDelay in self
+        thisCondition = condition_list[i]
+
+        # plot RTs based on filtered events with additional delay filter
+        task_df_filt = task_df[task_df[condition].to_numpy()==thisCondition]
+        plotRT(task_df_filt,evQuery = None,bins=bins, ax = ax_list[1],plot_type = plot_type,alpha = 0.5,label = (condition +str(thisCondition)),plot_median=plot_median)
+
+    # set axes
+    set_axes_rt(ax=ax_list[1],plot_type = plot_type)
+
+# condition summary. Every statistic of the psychometric and chronometric curves, for every block x coherence x direction cell, from one groupby over the trials
+def conditionSummary(task_df, by = ['block','coherence','direction'], quantiles = [0.1,0.25,0.5,0.75,0.9]):
+    # Inputs
+    # task_df ... trials (one session or pooled sessions, e.g. from pyrtp.datastore.TrialStore.query)
+    # by ... condition columns
+    # quantiles ... RT quantiles to compute
+
+    # Returns
+    # summary ... DataFrame indexed by the by columns (sorted) with
+    #   n ... number of trials
+    #   p_right ... proportion of trials with choice == 'right' (trials without a response count as not right)
+    #   rt_n, rt_mean, rt_sem ... number, mean and standard error of the RTs (trials without a RT are left out)
+    #   rt_q<q> ... RT quantiles (e.g. rt_q50 is the median)
+    trials = pd.DataFrame({col:task_df[col].array for col in by})
+    trials['right'] = (task_df['choice'] == 'right').to_numpy()
+    trials['RT'] = task_df['RT'].to_numpy(dtype = float)
+    groups = trials.groupby(by,observed = True,sort = True)
+
+    summary = groups.agg(n = ('right','size'),p_right = ('right','mean'),rt_n = ('RT','count'),rt_mean = ('RT','mean'),rt_sem = ('RT','sem'))
+    if len(quantiles) > 0:
+        rt_q = groups['RT'].quantile(quantiles).unstack()
+        rt_q.columns = ['rt_q'+'{:g}'.format(q*100) for q in quantiles]
+        summary = summary.join(rt_q)
+    return summary
+
+
+def cachedSummary(task_df, cache = None, sessionKey = None):
+    # conditionSummary of task_df, from cache if it was computed before (cache ... pyrtp.cache.ResultCache or None; sessionKey ... see sessionCacheKey, computed from task_df if None)
+    if cache is None:
+        return conditionSummary(task_df)
+    if sessionKey is None:
+        sessionKey = sessionCacheKey(task_df)
+    key = cacheKey('conditionSummary',sessionKey)
+    summary = cache.get(key)
+    if summary is None:
+        summary = cache.put(key,conditionSummary(task_df))
+    return summary
+
+
+def sessionCacheKey(task_df, configHash = None):
+    # cache key of a session's analyses: hash of the trials, the session config (pyrtp.config.SessionConfig.hash) and ANALYSIS_VERSION
+    return cacheKey(ANALYSIS_VERSION,frameHash(task_df),configHash)
+
+
+def sessionSummaries(sessDirs, cache = None):
+    # Condition summaries of many sessions (e.g. for a group report), indexed by subj and sess and then the conditions. With a cache, a session whose trials, config and analysis version are unchanged is not summarized again: it is looked up under the same session key as its report (see sessionCacheKey and writeReport), so either path reuses the other's summary
+    frames = []
+    keys = []
+    for sessDir in sessDirs:
+        task_df = readSessionTable(findSessionTable(sessDir))
+        try:
+            configHash = loadSessionConfig(sessDir).hash
+        except Exception:
+            configHash = None
+        frames.append(cachedSummary(task_df,cache,sessionCacheKey(task_df,configHash) if cache is not None else None))
+        keys.append((os.path.basename(os.path.dirname(os.path.normpath(sessDir))),os.path.basename(os.path.normpath(sessDir))[len('session'):]))
+    return pd.concat(frames,keys = keys,names = ['subj','sess'])
+
+
+def psychometricCells(summary, block):
+    # Rows of summary (see conditionSummary) for one block in the order of the psychometric plots: decreases from high to low coherence, then increases from low to high coherence. Cells without trials are nan rows
+
+    # Returns
+    # cells ... DataFrame with one row per cell
+    # lbl_list ... x tick label of each cell (e.g. 'dec_coh0.8')
+    coherence_list = np.unique(summary.index.get_level_values('coherence'))
+    keys = [(block,c,'decrease') for c in np.flip(coherence_list)]+[(block,c,'increase') for c in coherence_list]
+    cells = summary.reindex(pd.MultiIndex.from_tuples(keys,names = ['block','coherence','direction']))
+    lbl_list = [d[:3]+'_coh'+str(c) for b,c,d in keys]
+    return cells,lbl_list
+
+
+def plotPsychometric_choice(summary,block):
+    import matplotlib.pyplot as plt
+    f = plt.figure()
+
+    # cells of this block, in plot order
+    cells,lbl_list = psychometricCells(summary,block)
+
+    # y axis = prob increase
+    p_inc_list = cells['p_right'].to_numpy()
+
+    # plot prob left 
+    plt.plot(np.arange(0,len(p_inc_list)),p_inc_list,marker = 'x',markersize = 10,markeredgewidth=3,linestyle=None,linewidth = 0)
+    plt.title('block=="'+block+'"')
+    plt.xlabel('Coherence')
+    plt.ylabel('Prob(Right)')
+    plt.xticks(np.arange(0,len(lbl_list)),lbl_list)
+
+def plotPsychometric_rt(summary,block):
+    import matplotlib.pyplot as plt
+    f = plt.figure()
+
+    # cells of this block, in plot order
+    cells,lbl_list = psychometricCells(summary,block)
+
+    rt_mean_list = cells['rt_mean'].to_numpy()
+    rt_sem_list = cells['rt_sem'].to_numpy()
+
+    # plot prob left 
+    plt.errorbar(np.arange(0,len(rt_mean_list)),rt_mean_list,rt_sem_list)
+    plt.title('block=="'+block+'"')
+    plt.xlabel('Coherence')
+    plt.ylabel('RT(s)')
+    plt.xticks(np.arange(0,len(lbl_list)),lbl_list)
+
+
+
+##### RUN SCRIPT
+def writeReport(task_df,savedir,close = False,cache = None,configHash = None):
+    # Plots the session and saves sess_results.pdf in savedir (psychometric functions and RT distributions by block and coherence)
+    # close ... if True, closes the figures once they are saved (batch runs)
+    # cache ... optional pyrtp.cache.ResultCache. If the report of the same trials, config (configHash) and ANALYSIS_VERSION was rendered before, the cached PDF is copied to savedir and nothing is plotted
+    # Returns True if the report came from the cache
+    if cache is not None:
+        sessionKey = sessionCacheKey(task_df,configHash)
+        cached = cache.getFile(cacheKey('writeReport',sessionKey),'.pdf')
+        if cached is not None:
+            import shutil
+            shutil.copyfile(cached,savedir+'sess_results.pdf')
+            return True
+
+    setupMatplotlib()
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    #psychometric and chronometric functions: statistics of every block x coherence x direction cell
+    summary = cachedSummary(task_df,cache,sessionKey) if cache is not None else conditionSummary(task_df)
+
+    with PdfPages(savedir+'sess_results.pdf') as pdf:
+
+        # fast trials
+        plotPsychometric_choice(summary,block = 'fast')
+        pdf.savefig()
+
+        plotPsychometric_rt(summary,block = 'fast')
+        pdf.savefig()
+
+        # slow trials
+        plotPsychometric_choice(summary,block = 'slow')
+        pdf.savefig()
+
+        plotPsychometric_rt(summary,block = 'slow')
+        pdf.savefig()
+
+
+        # plot it
+        rt_thresh=1
+        plot_RT_by_condition(task_df,condition = 'coherence',bins = 20,evQuery = 'RT>'+str(rt_thresh),plot_type = 'standard')
+        pdf.savefig()
+
+        plot_RT_by_condition(task_df,condition = 'coherence',bins = 20,evQuery = 'RT>'+str(rt_thresh),plot_type = 'reciprocal')
+        pdf.savefig()
+
+        plot_RT_by_condition(task_df,condition = 'coherence',bins = 20,evQuery = 'RT>'+str(rt_thresh),plot_type = 'reciprobit')
+        pdf.savefig()
+
+        plot_RT_by_condition(task_df,condition = 'block',bins = 20,evQuery = 'RT>'+str(rt_thresh),plot_type = 'standard')
+        pdf.savefig()
+
+
+        plot_RT_by_condition(task_df,condition = 'block',bins = 20,evQuery = 'RT>'+str(rt_thresh),plot_type = 'reciprocal')
+        pdf.savefig()
+
+        plot_RT_by_condition(task_df,condition = 'block',bins = 20,evQuery ='RT>'+str(rt_thresh),plot_type = 'reciprobit')
+        pdf.savefig()
+
+    if close == True:
+        import matplotlib.pyplot as plt
+        plt.close('all')
+
+    if cache is not None:
+        cache.putFile(cacheKey('writeReport',sessionKey),savedir+'sess_results.pdf','.pdf')
+    return False
+
+def main():
+    # Prompts for subject and session ids, plots the session and saves sess_results.pdf in the session folder
+    subj = input ("Enter Subject ID :") 
+    sessNum = input ("Enter Session number:") 
+
+    # load data
+    task_df,config,savedir = loadData(subj,sessNum)
+
+    # plot and save (reports of unchanged sessions come from the cache in data/.cache)
+    cache = ResultCache(os.getcwd()+'/data/.cache')
+    fromCache = writeReport(task_df,savedir,cache = cache,configHash = config.hash)
+
+    if fromCache == True:
+        print('Report unchanged, copied from cache: '+savedir+'sess_results.pdf')
+    else:
+        input ("CLOSE FIGURES?") 
+
+
+if __name__ == '__main__':
+    main()
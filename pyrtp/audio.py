@@ -0,0 +1,401 @@
+# pyrtp.audio. Callback-driven audio output for the random tone pitch task. A producer thread mixes sound clouds into a ring buffer a few steps ahead of the audio callback, so the main thread never waits on the audio device and stays free to poll for responses and take timestamps.
+
+# Output backends (all share start(ring), stop(), isFinished(), onTime_s, offTime_s):
+#   CallbackOutput ... plays through the sound card with a sounddevice callback stream (sounddevice is only imported when this backend is created)
+#   NullOutput ... consumes the ring buffer in real time without an audio device (headless testing). With record=True it keeps a copy of everything it played
+
+# NullSound is a stand-in for psychopy sound.Sound (optionally recording what it plays), for benchmarks and headless runs of the per-step path.
+
+# CueBank holds the orient and feedback sounds, decoded once at session start.
+
+import threading
+import time
+import numpy as np
+
+from pyrtp.synth import hammingWindow
+
+
+class RingBuffer:
+    # Single producer / single consumer ring of sound cloud slots. The producer writes whole steps (one slot = one sound cloud of samples_per_step samples); the consumer (audio callback) reads any number of frames. The two sides only share integer counters, so the callback never takes a lock.
+
+    # Underrun counters: underruns is the number of reads that ran out of produced frames before the producer was done, underrunFrames is the number of frames filled with silence because of it.
+
+    # Step onsets: if an onset log is passed to reset(), read() writes the onset time of every step that starts within the frames it reads (time of the read plus the offset of the step boundary within the block).
+
+    def __init__(self, n_slots, samples_per_step, sampleRate = 44100):
+        # n_slots ... number of steps the producer can run ahead of playback
+        # samples_per_step ... samples in each sound cloud
+        # sampleRate ... used to convert frame offsets to onset times
+        self.n_slots = n_slots
+        self.samples_per_step = samples_per_step
+        self.sampleRate = sampleRate
+        self.buf = np.zeros((n_slots,samples_per_step),dtype='float32')
+        self._flat = self.buf.reshape(-1)
+        self.reset()
+
+    def reset(self, onset_log = None):
+        # clear counters so the ring can be reused for the next trial
+        # onset_log ... optional preallocated float array (one element per step) that receives step onset times
+        self.written = 0 # steps written by the producer
+        self.read_frames = 0 # frames read by the consumer
+        self.done = False # producer has written its last step
+        self.underruns = 0
+        self.underrunFrames = 0
+        self.onset_log = onset_log
+
+    def slotsFree(self):
+        # number of slots the producer may write without overwriting unplayed audio
+        return self.n_slots-(self.written-self.read_frames//self.samples_per_step)
+
+    def nextSlot(self):
+        # view of the slot that the next step should be written into
+        return self.buf[self.written % self.n_slots]
+
+    def commit(self):
+        # mark the slot returned by nextSlot as written
+        self.written+=1
+
+    def stepsPlayed(self):
+        # number of whole steps that have been read by the consumer
+        return self.read_frames//self.samples_per_step
+
+    def stepsStarted(self):
+        # number of steps whose first frame has been read by the consumer
+        return -(-self.read_frames//self.samples_per_step)
+
+    def isFinished(self):
+        # True once the producer is done and every written frame has been read
+        return self.done & (self.read_frames >= self.written*self.samples_per_step)
+
+    def read(self, out, t_now = None):
+        # Fill out (1-d float32 array) with the next frames. Missing frames are filled with silence and counted as an underrun (unless the producer is done)
+        # t_now ... time at which out starts playing (used for the onset log)
+        n_out = len(out)
+        n = min(n_out,self.written*self.samples_per_step-self.read_frames)
+
+        # log onsets of the steps that start in this block: the first boundary at or after the read position, then one every samples_per_step frames (plain integer arithmetic, no allocation on the audio thread)
+        if (self.onset_log is not None) & (t_now is not None) & (n > 0):
+            step = -(-self.read_frames//self.samples_per_step)
+            last = min((self.read_frames+n-1)//self.samples_per_step,len(self.onset_log)-1)
+            offset = step*self.samples_per_step-self.read_frames
+            while step <= last:
+                self.onset_log[step] = t_now+offset/self.sampleRate
+                step+=1
+                offset+=self.samples_per_step
+
+        # copy in up to two chunks (wrap around the end of the ring)
+        start = self.read_frames % len(self._flat)
+        n1 = min(n,len(self._flat)-start)
+        out[:n1] = self._flat[start:start+n1]
+        out[n1:n] = self._flat[:n-n1]
+
+        if n < n_out:
+            out[n:] = 0
+            if self.done == False:
+                self.underruns+=1
+                self.underrunFrames+=n_out-n
+
+        self.read_frames+=n
+        return n
+
+
+class CloudProducer(threading.Thread):
+    # Producer thread. Mixes each row of a trajectory into the ring buffer (from cached wavetables, see pyrtp.synth.ToneBank), staying as far ahead of playback as the ring allows.
+
+    def __init__(self, ring, traj, bank, dur = 0.05, baseNote = 440, sampleRate = 44100, hamming = True, ramp_s = 0.005, poll_s = None):
+        # ring ... RingBuffer (samples_per_step must match dur*sampleRate)
+        # traj ... pitch trajectory (n_steps x num_tones)
+        # bank ... ToneBank used to mix each step
+        # poll_s ... how long to sleep when the ring is full (default: a quarter step)
+        threading.Thread.__init__(self,daemon = True)
+        self.ring = ring
+        self.traj = traj
+        self.bank = bank
+        self.synth_kwargs = dict(dur = dur,baseNote = baseNote,sampleRate = sampleRate,hamming = hamming,ramp_s = ramp_s)
+        self.poll_s = dur/4 if poll_s is None else poll_s
+        self._stop_event = threading.Event()
+
+    def run(self):
+        for k in np.arange(0,self.traj.shape[0]):
+            # wait for a free slot
+            while self.ring.slotsFree() == 0:
+                if self._stop_event.wait(self.poll_s):
+                    return
+            if self._stop_event.is_set():
+                return
+
+            # mix the step straight into the ring
+            self.bank.mixCloud(self.traj[k],out = self.ring.nextSlot(),**self.synth_kwargs)
+            self.ring.commit()
+
+        self.ring.done = True
+
+    def waitPrimed(self, n_steps, timeout = 1.):
+        # Block until the producer has written n_steps steps (or finished). Returns False on timeout
+        deadline = time.perf_counter()+timeout
+        while (self.ring.written < n_steps) & (self.ring.done == False):
+            if time.perf_counter() > deadline:
+                return False
+            time.sleep(0.0005)
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class CallbackOutput:
+    # Plays a RingBuffer through the sound card with a sounddevice callback stream (https://python-sounddevice.readthedocs.io)
+
+    def __init__(self, sampleRate = 44100, blocksize = 256, latency = 'low', device = None, clock = time.perf_counter):
+        # sampleRate ... must match the sample rate of the ring buffer
+        # blocksize ... frames per callback. Sets how quickly the stream can be stopped
+        # clock ... function returning the current time. Used to timestamp onset and offset (pass core.monotonicClock.getTime to share the task clock). Step onsets (and onTime_s) are the DAC time of their first frame converted to this clock
+        import sounddevice
+        self._sd = sounddevice
+        self.sampleRate = sampleRate
+        self.blocksize = blocksize
+        self.latency = latency
+        self.device = device
+        self.clock = clock
+        self.driverUnderruns = 0 # output underflows reported by the driver
+        self._stream = None
+
+    def _callback(self, outdata, frames, time_info, status):
+        # time at which the first frame of this block reaches the DAC, on the task clock: now plus the output latency reported by the driver (outputBufferDacTime - currentTime, both on the stream clock). Host APIs that do not report stream times give 0, then the block is stamped with the callback time
+        t_now = self.clock()
+        if time_info.outputBufferDacTime > 0:
+            t_now+=time_info.outputBufferDacTime-time_info.currentTime
+        if self.onTime_s is None:
+            self.onTime_s = t_now
+        if status.output_underflow:
+            self.driverUnderruns+=1
+        self.ring.read(outdata[:,0],t_now = t_now)
+        if self.ring.isFinished():
+            raise self._sd.CallbackStop
+
+    def start(self, ring):
+        self.ring = ring
+        self.onTime_s = None
+        self.offTime_s = None
+        self._stream = self._sd.OutputStream(samplerate = self.sampleRate,blocksize = self.blocksize,channels = 1,dtype = 'float32',latency = self.latency,device = self.device,callback = self._callback)
+        self._stream.start()
+        # wait for the first callback so onTime_s is set when start returns
+        while (self.onTime_s is None) & self._stream.active:
+            time.sleep(0)
+
+    def isFinished(self):
+        return self._stream.active == False
+
+    def stop(self):
+        # stop immediately (drop whatever is still queued in the driver). Only the first call has an effect, so the response listener and the main thread can both call it
+        if self.offTime_s is not None:
+            return
+        self._stream.abort()
+        self._stream.close()
+        self.offTime_s = self.clock()
+
+
+class NullOutput:
+    # Consumes a RingBuffer in real time (one block every blocksize/sampleRate seconds) without an audio device. Behaves like CallbackOutput for the rest of the task, so the task can run on a headless machine. With record=True, everything played is kept in self.recorded
+
+    def __init__(self, sampleRate = 44100, blocksize = 256, clock = time.perf_counter, record = False):
+        self.sampleRate = sampleRate
+        self.blocksize = blocksize
+        self.clock = clock
+        self.record = record
+        self.recorded = np.zeros(0,dtype='float32')
+        self.driverUnderruns = 0
+        self._block = np.zeros(blocksize,dtype='float32')
+        self._thread = None
+
+    def _run(self):
+        block_s = self.blocksize/self.sampleRate
+        chunks = []
+        next_t = time.perf_counter()
+        self.onTime_s = self.clock()
+        while (self._stop_event.is_set() == False) & (self.ring.isFinished() == False):
+            n = self.ring.read(self._block,t_now = self.clock())
+            if self.record == True:
+                chunks.append(self._block[:n].copy())
+            next_t+=block_s
+            self._stop_event.wait(max(0,next_t-time.perf_counter()))
+        if self.record == True:
+            self.recorded = np.concatenate([self.recorded]+chunks)
+
+    def start(self, ring):
+        self.ring = ring
+        self.onTime_s = None
+        self.offTime_s = None
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target = self._run,daemon = True)
+        self._thread.start()
+        # wait for the first block so onTime_s is set when start returns
+        while (self.onTime_s is None) & self._thread.is_alive():
+            time.sleep(0)
+
+    def isFinished(self):
+        return self._thread.is_alive() == False
+
+    def stop(self):
+        if self.offTime_s is not None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self.offTime_s = self.clock()
+
+
+class NullSound:
+    # Stand-in for psychopy sound.Sound with no audio device. play() and stop() do nothing, except that play() appends the buffer to recorder (a list) when one is given, so the played sequence can be checked afterwards
+
+    def __init__(self, value = None, secs = None, sampleRate = 44100, volume = 1, hamming = False, recorder = None, **kwargs):
+        self.value = value
+        self.sampleRate = sampleRate
+        self.volume = volume
+        self.recorder = recorder
+        if secs is not None:
+            self.stopTime = secs
+        else:
+            self.stopTime = len(value)/sampleRate
+        self.playing = False
+
+    def play(self):
+        self.playing = True
+        if self.recorder is not None:
+            self.recorder.append(self.value)
+
+    def stop(self):
+        self.playing = False
+
+    def getDuration(self):
+        return self.stopTime
+
+
+# Cue sounds (orient / feedback)
+def readWav(fpath):
+    # Decodes a PCM wav file (8, 16 or 32 bit) with the standard library wave module
+
+    # Returns
+    # data ... float32 array in [-1, 1]. (n_frames,) for mono files, (n_frames, n_channels) otherwise
+    # sampleRate ... sample rate of the file
+    import wave
+    with wave.open(fpath,'rb') as w:
+        n_channels = w.getnchannels()
+        sampwidth = w.getsampwidth()
+        sampleRate = w.getframerate()
+        raw = w.readframes(w.getnframes())
+
+    if sampwidth == 1:
+        # 8 bit wav files are unsigned
+        data = (np.frombuffer(raw,dtype='uint8').astype('float32')-128)/128
+    elif sampwidth == 2:
+        data = np.frombuffer(raw,dtype='<i2').astype('float32')/2**15
+    elif sampwidth == 4:
+        data = np.frombuffer(raw,dtype='<i4').astype('float32')/2**31
+    else:
+        raise ValueError('Unsupported sample width ({} bytes) in {}'.format(sampwidth,fpath))
+
+    if n_channels > 1:
+        data = data.reshape(-1,n_channels)
+
+    return data,sampleRate
+
+
+def writeWav(fpath, data, sampleRate = 44100):
+    # Writes a float array in [-1, 1] ((n_frames,) or (n_frames, n_channels)) as a 16 bit PCM wav file
+    import wave
+    data = np.asarray(data)
+    n_channels = 1 if data.ndim == 1 else data.shape[1]
+    pcm = (np.clip(data,-1,1)*(2**15-1)).astype('<i2')
+    with wave.open(fpath,'wb') as w:
+        w.setnchannels(n_channels)
+        w.setsampwidth(2)
+        w.setframerate(sampleRate)
+        w.writeframes(pcm.tobytes())
+
+
+def resample(data, sampleRate_in, sampleRate_out):
+    # Linear interpolation resampling along the first axis (cue sounds are short, so this is only done once at load time)
+    if sampleRate_in == sampleRate_out:
+        return data
+    n_out = int(np.round(data.shape[0]*sampleRate_out/sampleRate_in))
+    t_in = np.arange(data.shape[0])/sampleRate_in
+    t_out = np.arange(n_out)/sampleRate_out
+    if data.ndim == 1:
+        return np.interp(t_out,t_in,data).astype('float32')
+    return np.stack([np.interp(t_out,t_in,data[:,c]) for c in np.arange(data.shape[1])],axis = 1).astype('float32')
+
+
+class CueBank:
+    # Cue sounds (orient.wav, correct.wav, wrong.wav) decoded once at session start. Each cue is resampled to the task sample rate, trimmed to its play duration and ramped with the same Hamming envelope as the sound clouds, then turned into a sound object once (with makeSound), so playing a cue during a trial does no disk reads, decoding or allocation.
+
+    # Load time (load_s) and onset latency (time from the play request until the driver call returns) are recorded and summarized by report().
+
+    def __init__(self, sampleRate = 44100, makeSound = None, clock = time.perf_counter):
+        # sampleRate ... all cues are resampled to this rate
+        # makeSound ... function (value, volume) -> object with play() and stop() (e.g. a psychopy sound.Sound). If None, cues are only held as arrays and play() just returns timestamps (headless use)
+        # clock ... function returning the current time
+        self.sampleRate = sampleRate
+        self.makeSound = makeSound
+        self.clock = clock
+        self.cues = {}
+        self.load_s = 0.
+        self.n_played = 0
+        self.latency_sum_s = 0.
+        self.latency_max_s = 0.
+
+    def load(self, name, fpath, dur = None, volume = 1, hamming = True, ramp_s = 0.005):
+        # Decodes fpath and stores it under name
+
+        # Inputs
+        # dur ... play duration in seconds. The cue is trimmed to this length (None keeps the whole file)
+        # volume ... playback volume (0-1)
+        t0 = time.perf_counter()
+
+        data,sampleRate = readWav(fpath)
+        data = resample(data,sampleRate,self.sampleRate)
+        if dur is not None:
+            data = data[:int(np.round(dur*self.sampleRate))]
+        data = np.ascontiguousarray(data)
+        if hamming == True:
+            win = hammingWindow(data.shape[0],sampleRate = self.sampleRate,ramp_s = ramp_s)
+            data *= win if data.ndim == 1 else win[:,None]
+
+        cue = {'data':data,'volume':volume,'dur_s':data.shape[0]/self.sampleRate,'sound':None,'played':False}
+        if self.makeSound is not None:
+            cue['sound'] = self.makeSound(data,volume)
+        self.cues[name] = cue
+
+        self.load_s += time.perf_counter()-t0
+        return cue
+
+    def play(self, name):
+        # Plays a preloaded cue (does not wait for it to finish)
+
+        # Returns
+        # onTime_s ... time just before the driver call
+        # offTime_s ... onTime_s + cue duration
+        t_request = self.clock()
+        cue = self.cues[name]
+
+        # rewind sounds that have played before
+        if (cue['sound'] is not None) & cue['played']:
+            cue['sound'].stop()
+
+        onTime_s = self.clock()
+        if cue['sound'] is not None:
+            cue['sound'].play()
+        cue['played'] = True
+
+        # onset latency
+        latency_s = self.clock()-t_request
+        self.n_played+=1
+        self.latency_sum_s+=latency_s
+        self.latency_max_s = max(self.latency_max_s,latency_s)
+
+        return onTime_s,onTime_s+cue['dur_s']
+
+    def report(self):
+        # Print load time and onset latency summary
+        print('Cue bank: loaded {} cues in {:.1f} ms'.format(len(self.cues),self.load_s*1000))
+        if self.n_played > 0:
+            print('Cue bank: {} cues played, onset latency mean = {:.2f} ms, max = {:.2f} ms'.format(self.n_played,self.latency_sum_s/self.n_played*1000,self.latency_max_s*1000))
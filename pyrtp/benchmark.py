@@ -0,0 +1,283 @@
+# pyrtp.benchmark. Benchmarks the stimulus loop of a trial by running the task's own trial function (pyrtp.task.runTrial) against a null audio core, so it runs on a headless machine without psychopy and times the code that runs in sessions.
+
+# psychopy's core, sound and keyboard modules are replaced in pyrtp.task by stand-ins (NullCore on time.perf_counter, pyrtp.audio.NullSound, a keyboard that never reports a key press) and the session audio objects are built with pyrtp.task.setupAudio. Each configuration runs one trial of n_steps steps through runTrial (no response, so every step of the response window plays) and reads the step onsets back from the trial's step log. For each configuration it reports:
+#   - setup latency: time from the runTrial call to stimulus onset (trajectory, step log, keyboard, listener / producer start, and for the pre-rendered path the render of the stream)
+#   - step period percentiles: interval between consecutive step onsets, and the overhead of each step (period minus dur_tonestep)
+#   - onset jitter: period minus dur_tonestep (mean, sd, p99 of its absolute value) and the drift of the last onset from its schedule
+# Configurations vary num_tones, the output path of runTrial ('step': per-step psychopy path with the response listener, 'prerender': pre-rendered stream, 'null': ring buffer with the null callback output) and, for the per-step path, how clouds are synthesized ('bank': ToneBank, 'synth': synthCloud on every step). Step onsets are not measured on the pre-rendered path (steps follow each other in one buffer), so it only reports setup latency.
+
+# It also measures the import time of each pyrtp tool (and of the heavy dependencies they import lazily) in a fresh interpreter.
+
+# Results are saved as json (one file per commit by default) and can be compared against a saved baseline:
+# $ python -m pyrtp.benchmark
+# $ python -m pyrtp.benchmark --compare benchmarks/bench_<commit>.json
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+from pyrtp.params import getParams
+from pyrtp.trials import generateTrialList,loadStepLog
+from pyrtp.audio import NullSound
+
+
+class NullClock:
+    # Stand-in for psychopy.core.Clock / MonotonicClock on time.perf_counter
+    def __init__(self):
+        self.t0 = time.perf_counter()
+
+    def getTime(self):
+        return time.perf_counter()-self.t0
+
+    def reset(self):
+        self.t0 = time.perf_counter()
+
+    def getLastResetTime(self):
+        return self.t0
+
+
+class NullCore:
+    # Stand-in for psychopy.core. wait(secs, hogCPUperiod) sleeps and then spins on the clock for the last hogCPUperiod seconds, as core.wait does
+    def __init__(self):
+        self.monotonicClock = NullClock()
+
+    def getTime(self):
+        return self.monotonicClock.getTime()
+
+    def wait(self, secs, hogCPUperiod = 0.2):
+        t_end = time.perf_counter()+secs
+        if secs > hogCPUperiod:
+            time.sleep(secs-hogCPUperiod)
+        while time.perf_counter() < t_end:
+            pass
+
+    def getAbsTime(self):
+        return int(time.time())
+
+    def quit(self):
+        raise SystemExit
+
+
+class NullKeyboard:
+    # Stand-in for psychopy.hardware.keyboard.Keyboard that never reports a key press
+    def __init__(self, device = -1, waitForStart = True, **kwargs):
+        self.clock = NullClock()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def clearEvents(self):
+        pass
+
+    def getKeys(self, keyList = None, waitRelease = False, clear = True):
+        return []
+
+
+class NullKeyboardModule:
+    # Stands in for the psychopy.hardware.keyboard module (runTrial calls keyboard.Keyboard(...))
+    Keyboard = NullKeyboard
+
+
+class NullSoundModule:
+    # Stands in for the psychopy.sound module (the task calls sound.Sound(...))
+    Sound = NullSound
+
+
+def installNullCore():
+    # Replaces psychopy's core, sound and keyboard modules in pyrtp.task with the null stand-ins. Returns the task module
+    import pyrtp.task as task
+    task.core = NullCore()
+    task.sound = NullSoundModule()
+    task.keyboard = NullKeyboardModule()
+    task.visual = None
+    task.traceOut = None
+    return task
+
+
+def benchParams(params, n_steps, num_tones, path = 'step'):
+    # Returns a copy of params set up to run one trial of n_steps steps on the given output path without a response, feedback wait, sync pulses or printing
+    params = dict(params)
+    params['num_tones'] = num_tones
+    params['num_trials'] = 1
+    params['block_list'] = list(params['block_list'])
+    params['responseTimeLimit_s'] = {b:n_steps*params['dur_tonestep'] for b in params['block_list']}
+    params['audio_output'] = 'null' if path == 'null' else 'psychopy'
+    params['options_preRenderTrial'] = path == 'prerender'
+    params['options_playOrientOnEachTrial'] = False
+    params['options_sendSYNC'] = False
+    params['options_verbose'] = False
+    params['dur_fb'] = 0.
+    return params
+
+
+def percentiles(x, scale = 1.):
+    # Summary of a latency sample (x in seconds, reported in seconds*scale)
+    x = np.asarray(x)*scale
+    return {'p50':float(np.percentile(x,50)),'p90':float(np.percentile(x,90)),'p99':float(np.percentile(x,99)),'max':float(x.max())}
+
+
+def runTrialLoop(params, n_steps, num_tones, path = 'step', synth_mode = 'bank', seed = 0):
+    # Runs one trial of n_steps steps through pyrtp.task.runTrial against the null audio core and returns its timings
+
+    # Inputs
+    # path ... 'step' (per-step path), 'prerender' (pre-rendered stream) or 'null' (ring buffer with the null callback output)
+    # synth_mode ... 'bank' (mix from the session's ToneBank) or 'synth' (synthCloud on every step, per-step path only)
+    # seed ... session seed (trial list and trialSeed)
+
+    # Returns
+    # timing ... dictionary with setup_s (runTrial call to stimulus onset), onset (measured step onsets, nan where not measured), stimOn_s and stimSteps
+    task = installNullCore()
+    params = benchParams(params,n_steps,num_tones,path = path)
+    params['rng_seed'] = seed
+    task.setupAudio(params)
+    if synth_mode == 'synth':
+        task.toneBank = None
+
+    trialTable = generateTrialList(params,rng = np.random.default_rng(seed))
+    with tempfile.TemporaryDirectory() as tmpDir:
+        params['stepLogpath'] = os.path.join(tmpDir,'stepLog')
+        t_call = task.core.monotonicClock.getTime()
+        trialDict = task.runTrial(trialTable[0],params,trial = 0)
+        stepLog = loadStepLog(params['stepLogpath'])
+
+    return {'setup_s':trialDict['stimOn_s']-t_call,'onset':stepLog['onset_s'],'stimOn_s':trialDict['stimOn_s'],'stimSteps':trialDict['stimSteps']}
+
+
+def summarize(timing, params):
+    # Turns the timings of one run into the reported statistics
+    res = {}
+    res['setup_ms'] = timing['setup_s']*1e3
+    onset = timing['onset']
+    if np.isnan(onset).any() == False:
+        period = np.diff(onset)
+        jitter = period-params['dur_tonestep']
+        res['step_ms'] = percentiles(period,1e3)
+        res['overhead_us'] = percentiles(jitter,1e6)
+        res['onset_jitter_ms'] = {'mean':float(jitter.mean()*1e3),'sd':float(jitter.std()*1e3),'p99_abs':float(np.percentile(np.abs(jitter),99)*1e3)}
+        res['drift_ms_total'] = float((onset[-1]-onset[0]-(len(onset)-1)*params['dur_tonestep'])*1e3)
+    return res
+
+
+def runBenchmarks(params, num_tones_list = (1,5,10,20,50), n_steps = 60, seed = 0, paths = ('step','prerender','null')):
+    # Runs all configurations (every num_tones on every output path; the per-step path with both synthesis modes)
+
+    # Returns
+    # results ... list of dictionaries (one per configuration)
+    results = []
+    for num_tones in num_tones_list:
+        for path in paths:
+            for synth_mode in (['synth','bank'] if path == 'step' else ['bank']):
+                timing = runTrialLoop(params,n_steps,num_tones,path = path,synth_mode = synth_mode,seed = seed)
+                res = {'num_tones':num_tones,'path':path,'synth_mode':synth_mode,'steps':int(timing['stimSteps'])}
+                res.update(summarize(timing,params))
+                results.append(res)
+                if 'step_ms' in res:
+                    print('{:>4} tones {:>9} {:>5} : setup = {:.2f} ms, step p50 = {:.3f} ms, p99 = {:.3f} ms, jitter sd = {:.3f} ms, drift over {} steps = {:.1f} ms'.format(num_tones,path,synth_mode,res['setup_ms'],res['step_ms']['p50'],res['step_ms']['p99'],res['onset_jitter_ms']['sd'],res['steps'],res['drift_ms_total']))
+                else:
+                    print('{:>4} tones {:>9} {:>5} : setup = {:.2f} ms'.format(num_tones,path,synth_mode,res['setup_ms']))
+
+    return results
+
+
+def measureImports(modules, repeats = 3):
+    # Import time (seconds, best of repeats) of each module in a fresh interpreter. Modules that cannot be imported are reported as None
+    import_s = {}
+    code = 'import time; t0 = time.perf_counter(); import {}; print(time.perf_counter()-t0)'
+    for m in modules:
+        times = []
+        for r in np.arange(0,repeats):
+            proc = subprocess.run([sys.executable,'-c',code.format(m)],cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__))),stdout = subprocess.PIPE,stderr = subprocess.DEVNULL)
+            if proc.returncode != 0:
+                break
+            times.append(float(proc.stdout.decode().strip()))
+        import_s[m] = min(times) if len(times) > 0 else None
+    return import_s
+
+
+def gitCommit():
+    # short hash of the current commit ('unknown' outside a git checkout)
+    try:
+        return subprocess.check_output(['git','rev-parse','--short','HEAD'],cwd = os.path.dirname(os.path.abspath(__file__)),stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError,subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compareResults(base, new, tolerance = 0.2, min_ms = 0.5):
+    # Prints the change in setup latency and p50/p99 step period for every configuration found in both result sets. Returns the list of configurations that are slower than base by more than tolerance (fraction) and by more than min_ms (setup latency is a single sample per configuration, so small absolute changes are noise)
+    def key(r):
+        return (r['num_tones'],r.get('path'),r['synth_mode'])
+    base_dict = {key(r):r for r in base['results']}
+
+    regressions = []
+    print('Comparing against {} ({})'.format(base['meta']['commit'],base['meta']['date']))
+    for r in new['results']:
+        if key(r) not in base_dict:
+            continue
+        b = base_dict[key(r)]
+        pairs = {'setup':(r['setup_ms'],b['setup_ms'])}
+        if ('step_ms' in r) & ('step_ms' in b):
+            pairs['step p50'] = (r['step_ms']['p50'],b['step_ms']['p50'])
+            pairs['step p99'] = (r['step_ms']['p99'],b['step_ms']['p99'])
+        flag = ''
+        if any([(x_new > x_base*(1+tolerance)) & (x_new-x_base > min_ms) for x_new,x_base in pairs.values()]):
+            flag = '  <-- REGRESSION'
+            regressions.append(key(r))
+        print('{:>4} tones {:>9} {:>5}: {}{}'.format(r['num_tones'],r['path'],r['synth_mode'],', '.join(['{} x{:.2f}'.format(k,x_new/x_base) for k,(x_new,x_base) in pairs.items()]),flag))
+    return regressions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark the pyRTP trial loop (pyrtp.task.runTrial) with a null audio core')
+    parser.add_argument('--num-tones',type = int,nargs = '+',default = [1,5,10,20,50],help = 'num_tones values to test')
+    parser.add_argument('--steps',type = int,default = 60,help = 'steps per trial (trials run in real time)')
+    parser.add_argument('--paths',nargs = '+',choices = ['step','prerender','null'],default = ['step','prerender','null'],help = 'output paths of runTrial to test')
+    parser.add_argument('--seed',type = int,default = 0)
+    parser.add_argument('--save',default = None,help = 'output json (default: benchmarks/bench_<commit>.json)')
+    parser.add_argument('--compare',default = None,help = 'baseline json to compare against')
+    parser.add_argument('--tolerance',type = float,default = 0.2,help = 'allowed slowdown before flagging a regression (fraction, default 0.2)')
+    parser.add_argument('--min-ms',type = float,default = 0.5,help = 'smallest slowdown (ms) flagged as a regression (default 0.5)')
+    parser.add_argument('--skip-imports',action = 'store_true',help = 'do not measure import times')
+    args = parser.parse_args(argv)
+
+    params = getParams()
+    results = runBenchmarks(params,num_tones_list = args.num_tones,n_steps = args.steps,seed = args.seed,paths = args.paths)
+
+    # import times of the pyrtp tools and of the heavy modules they import lazily
+    import_s = {}
+    if args.skip_imports == False:
+        import_s = measureImports(['pyrtp.task','pyrtp.analysis','pyrtp.pickle2csv','pyrtp.render','pyrtp.benchmark','numpy','pandas','psychopy','matplotlib.pyplot','scipy.stats'])
+        for m in import_s:
+            print('import {:<18}: {}'.format(m,'not installed' if import_s[m] is None else '{:.1f} ms'.format(import_s[m]*1e3)))
+
+    out = {'meta':{'commit':gitCommit(),'date':time.strftime('%Y-%m-%d %H:%M:%S'),'python':platform.python_version(),'numpy':np.__version__,'platform':platform.platform(),'dur_tonestep':params['dur_tonestep'],'audio_sampleRate':params['audio_sampleRate'],'steps':args.steps},'results':results,'import_s':import_s}
+
+    # save
+    fpath = args.save
+    if fpath is None:
+        fpath = os.path.join(os.getcwd(),'benchmarks','bench_{}.json'.format(out['meta']['commit']))
+    if os.path.exists(os.path.dirname(os.path.abspath(fpath)))==False:
+        os.makedirs(os.path.dirname(os.path.abspath(fpath)))
+    with open(fpath,'w') as f:
+        json.dump(out,f,indent = 1)
+    print('Saved {}'.format(fpath))
+
+    # compare
+    if args.compare is not None:
+        with open(args.compare) as f:
+            base = json.load(f)
+        regressions = compareResults(base,out,tolerance = args.tolerance,min_ms = args.min_ms)
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# pyrtp.cache. Content-addressed cache of analysis results (pickled objects) and rendered files (e.g. report PDFs). An entry is stored under the hash of everything it was computed from (see cacheKey), so a changed session, config or analysis version simply misses and stale entries are never read. The cache folder is kept under max_bytes by removing the least recently used entries.
+
+# Layout: <root>/<key[:2]>/<key><ext>, one file per entry. Reading an entry updates its modification time, which is the recency used for eviction.
+
+import hashlib
+import os
+import pickle
+import shutil
+
+
+def cacheKey(*parts):
+    # sha256 of the parts (strings, bytes, numbers or None), in order
+    h = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part,bytes) else repr(part).encode()
+        h.update(len(data).to_bytes(8,'little'))
+        h.update(data)
+    return h.hexdigest()
+
+
+def frameHash(df):
+    # content hash of a DataFrame (column names, dtypes, index and values)
+    import pandas as pd
+    h = hashlib.sha256()
+    h.update(repr([(str(c),str(t)) for c,t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df,index = True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class ResultCache:
+    # root ... cache folder (created if needed)
+    # max_bytes ... size bound of the folder
+
+    def __init__(self, root, max_bytes = 256*2**20):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root,exist_ok = True)
+
+    def path(self, key, ext = ''):
+        return os.path.join(self.root,key[:2],key+ext)
+
+    def getFile(self, key, ext = ''):
+        # path of the entry, or None if it is not cached
+        fpath = self.path(key,ext)
+        try:
+            os.utime(fpath)
+        except FileNotFoundError:
+            return None
+        return fpath
+
+    def putFile(self, key, src, ext = ''):
+        # stores a copy of the file src. Returns the path of the entry
+        fpath = self.path(key,ext)
+        os.makedirs(os.path.dirname(fpath),exist_ok = True)
+        shutil.copyfile(src,fpath+'.tmp')
+        os.replace(fpath+'.tmp',fpath)
+        self.evict(keep = fpath)
+        return fpath
+
+    def get(self, key):
+        # cached object, or None if it is not cached
+        fpath = self.getFile(key,'.pkl')
+        if fpath is None:
+            return None
+        with open(fpath,'rb') as f:
+            return pickle.load(f)
+
+    def put(self, key, obj):
+        # stores obj (pickled). Returns obj
+        fpath = self.path(key,'.pkl')
+        os.makedirs(os.path.dirname(fpath),exist_ok = True)
+        with open(fpath+'.tmp','wb') as f:
+            pickle.dump(obj,f,pickle.HIGHEST_PROTOCOL)
+        os.replace(fpath+'.tmp',fpath)
+        self.evict(keep = fpath)
+        return obj
+
+    def entries(self):
+        # (path, size, modification time) of every entry
+        out = []
+        for sub in os.scandir(self.root):
+            if sub.is_dir() == False:
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.tmp') == False:
+                    st = entry.stat()
+                    out.append((entry.path,st.st_size,st.st_mtime_ns))
+        return out
+
+    def evict(self, keep = None):
+        # removes least recently used entries until the folder is within max_bytes (never the entry keep, which was just written)
+        entries = self.entries()
+        total = sum([e[1] for e in entries])
+        for fpath,size,mtime in sorted(entries,key = lambda e: e[2]):
+            if total <= self.max_bytes:
+                break
+            if fpath == keep:
+                continue
+            os.remove(fpath)
+            total-=size
+        return total
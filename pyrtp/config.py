@@ -0,0 +1,138 @@
+# pyrtp.config. Typed session configuration. SessionConfig holds the task parameters that define a session's experiment (params without the session's identity, paths, device objects and the options that only change how the task runs), converted to json types and checked against the types of the defaults in pyrtp.params. It is saved as config.json with a content hash of the configuration, so sessions can be grouped by exact configuration by comparing hashes.
+
+import ast
+import hashlib
+import json
+import os
+import numpy as np
+
+from pyrtp.params import getParams
+
+CONFIG_VERSION = 1
+
+# recorded with each session, not part of the configuration (block_list is also in the configuration, sorted; the session keeps the order it ran in)
+SESSION_KEYS = ['subj','sess','rng_seed','block_list','fixOn_s','SYNC_pulse_val','SYNC_zero_val']
+
+# not recorded (paths, device objects and options that do not change the experiment)
+RUNTIME_KEYS = ['saveDir','subjDir','sessDir','savefilepath','stepLogpath','journalpath','tracepath','checkpointpath','SYNC_deviceObj','options_verbose','options_promptBlockStart','journal_fsync','data_formats','audio_toneBankBytes']
+
+
+def toJson(value):
+    # value converted to json types (numpy scalars and arrays, tuples and SeedSequences included)
+    if isinstance(value,np.random.SeedSequence):
+        return {'entropy':value.entropy,'spawn_key':list(value.spawn_key)}
+    if isinstance(value,np.generic):
+        return value.item()
+    if isinstance(value,(list,tuple,np.ndarray)):
+        return [toJson(v) for v in value]
+    if isinstance(value,dict):
+        return {str(k):toJson(v) for k,v in value.items()}
+    return value
+
+
+def checkType(key, value, default):
+    # Returns value with the type of the default of key. ints and floats convert into each other (an int field only takes whole numbers); None is allowed for any field. Raises TypeError otherwise
+    if (value is None) or (default is None):
+        return value
+    if isinstance(default,bool) or isinstance(value,bool):
+        if isinstance(default,bool) & isinstance(value,bool):
+            return value
+    elif isinstance(default,float) & isinstance(value,(int,float)):
+        return float(value)
+    elif isinstance(default,int) & isinstance(value,(int,float)):
+        if float(value).is_integer():
+            return int(value)
+    elif isinstance(default,(list,dict,str)) & isinstance(value,type(default)):
+        return value
+    raise TypeError('{} must be of type {} (got {!r})'.format(key,type(default).__name__,value))
+
+
+class SessionConfig:
+    # config ... configuration (json types; see fromParams)
+    # session ... session record (subj, sess, rng_seed, block order, ...), not part of the hash
+
+    def __init__(self, config, session = None):
+        self.config = config
+        self.session = {} if session is None else session
+        self._hash = None
+
+    @classmethod
+    def fromParams(cls, params):
+        # SessionConfig of a params dictionary (see SESSION_KEYS and RUNTIME_KEYS for what is left out of the configuration)
+        defaults = getParams()
+        config = {}
+        session = {}
+        for key,value in params.items():
+            if key in RUNTIME_KEYS:
+                continue
+            value = toJson(value)
+            if key in SESSION_KEYS:
+                session[key] = value
+                if key != 'block_list':
+                    continue
+                value = sorted(value)
+            config[key] = checkType(key,value,toJson(defaults[key])) if key in defaults else value
+        return cls(config,session)
+
+    @property
+    def hash(self):
+        # sha256 of the configuration as canonical json (sorted keys, no whitespace)
+        if self._hash is None:
+            self._hash = hashlib.sha256(json.dumps(self.config,sort_keys = True,separators = (',',':')).encode()).hexdigest()
+        return self._hash
+
+    def __getitem__(self, key):
+        return self.config[key]
+
+    def __contains__(self, key):
+        return key in self.config
+
+    def keys(self):
+        return self.config.keys()
+
+    def __eq__(self, other):
+        return isinstance(other,SessionConfig) and (self.hash == other.hash)
+
+    def __hash__(self):
+        return int(self.hash[:16],16)
+
+    def __repr__(self):
+        return 'SessionConfig({}, {} parameters)'.format(self.hash[:12],len(self.config))
+
+    def diff(self, other):
+        # parameters that differ from other: {key: (value here, value in other)} (None for a missing parameter)
+        keys = sorted(set(self.config)|set(other.config))
+        return {k:(self.config.get(k),other.config.get(k)) for k in keys if self.config.get(k) != other.config.get(k)}
+
+    def save(self, fpath):
+        # Writes config.json (version, hash, configuration and session record), to a temporary file first and then renamed
+        with open(fpath+'.tmp','w') as f:
+            json.dump({'version':CONFIG_VERSION,'hash':self.hash,'config':self.config,'session':self.session},f,sort_keys = True,indent = 1)
+        os.replace(fpath+'.tmp',fpath)
+
+    @classmethod
+    def load(cls, fpath):
+        # Reads a config.json. Raises ValueError if the file was written by another version or its configuration does not match its hash
+        with open(fpath,'r') as f:
+            saved = json.load(f)
+        if saved['version'] != CONFIG_VERSION:
+            raise ValueError('{} has config version {} (expected {})'.format(fpath,saved['version'],CONFIG_VERSION))
+        config = cls(saved['config'],saved['session'])
+        if config.hash != saved['hash']:
+            raise ValueError('{} does not match its hash (edited by hand?)'.format(fpath))
+        return config
+
+
+def loadSessionConfig(sessDir):
+    # SessionConfig of a session folder: config.json, or for sessions saved before it, the params dump in config.csv (values are parsed as python literals where possible)
+    if os.path.exists(os.path.join(sessDir,'config.json')):
+        return SessionConfig.load(os.path.join(sessDir,'config.json'))
+    import pandas as pd
+    dump = pd.read_csv(os.path.join(sessDir,'config.csv'),index_col = 'parameter',keep_default_na = False)['value']
+    params = {}
+    for key,text in dump.items():
+        try:
+            params[key] = ast.literal_eval(text)
+        except (ValueError,SyntaxError):
+            params[key] = None if text == '' else text
+    return SessionConfig.fromParams(params)
@@ -0,0 +1,194 @@
+# pyrtp.datastore. Consolidated store of the trials of every subject and session, for group analysis. Update the store with main() ($ python -m pyrtp.datastore --data data --store data/store) and query it with TrialStore.
+
+# Layout of a store folder:
+#   catalog.json ... one entry per session: subject, session, config hash (see pyrtp.config.SessionConfig), source signature (size and modification time of its taskData and trialJournal), number of trials, categories of the categorical fields and the row range of every block
+#   <subj>/session<N>-<stamp>/<field>.npy ... one array per field (trial index first), rows sorted by block and trial. Categorical fields are stored as their int8 codes
+# ingest() only reads sessions that are new or whose task data changed since they were ingested. Queries memory-map the column files of the sessions they select and read only the blocks and columns asked for, so a query over every session holds no more than its result in memory.
+
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+from pyrtp.trials import asTrialTable,loadTaskData
+from pyrtp.pickle2csv import findSessions
+from pyrtp.config import loadSessionConfig
+
+CATALOG_FILE = 'catalog.json'
+STORE_VERSION = 1
+
+
+def sourceSignature(sessDir):
+    # size and modification time of the saved task data of a session folder (changes whenever a session is run, resumed or re-saved)
+    sig = []
+    for fname in ['taskData','trialJournal']:
+        fpath = os.path.join(sessDir,fname)
+        if os.path.exists(fpath):
+            st = os.stat(fpath)
+            sig.append([fname,st.st_size,st.st_mtime_ns])
+    return sig
+
+
+def _asList(x):
+    # None, one value or a sequence of values as a list (None stays None)
+    if (x is None) or isinstance(x,(list,tuple,set,np.ndarray)):
+        return None if x is None else list(x)
+    return [x]
+
+
+class TrialStore:
+    # Store of the trials of many sessions in the folder root (created if needed). See the layout at the top of this module
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root,exist_ok = True)
+        fpath = os.path.join(root,CATALOG_FILE)
+        if os.path.exists(fpath):
+            with open(fpath,'r') as f:
+                self.catalog = json.load(f)
+            if self.catalog['version'] != STORE_VERSION:
+                raise ValueError('{} has store version {} (expected {})'.format(root,self.catalog['version'],STORE_VERSION))
+        else:
+            self.catalog = {'version':STORE_VERSION,'sessions':{}}
+
+    def _writeCatalog(self):
+        # written to a temporary file first and then renamed, so the catalog on disk is always complete
+        fpath = os.path.join(self.root,CATALOG_FILE)
+        with open(fpath+'.tmp','w') as f:
+            json.dump(self.catalog,f)
+        os.replace(fpath+'.tmp',fpath)
+
+    def ingest(self, dataDir = 'data', prune = False, verbose = False):
+        # Adds the sessions under dataDir (<dataDir>/<subj>/session<N>) that are new or changed since they were ingested. The catalog is updated after every session, so an interrupted ingest keeps the sessions it finished
+        # prune ... if True, sessions that are no longer in dataDir are removed from the store
+
+        # Returns
+        # ingested ... keys ('<subj>/session<N>') of the sessions that were (re)written
+        ingested = []
+        found = set()
+        for sessDir in findSessions(dataDir):
+            subj = os.path.basename(os.path.dirname(sessDir))
+            sess = os.path.basename(sessDir)[len('session'):]
+            key = subj+'/session'+sess
+            found.add(key)
+            sig = sourceSignature(sessDir)
+            old = self.catalog['sessions'].get(key)
+            if (old is not None) and (old['source'] == sig):
+                continue
+
+            try:
+                table = asTrialTable(loadTaskData(sessDir))
+            except Exception as e:
+                if verbose == True:
+                    print('Skipped {}: {}'.format(sessDir,repr(e)))
+                continue
+
+            try:
+                configHash = loadSessionConfig(sessDir).hash
+            except Exception:
+                configHash = None
+
+            # rows sorted by block (then trial), so every block is one contiguous row range
+            rec = table.toArray()
+            rec = rec[np.lexsort((rec['trial'],rec['block']))]
+            blocks = {}
+            for code,block in enumerate(table.categories['block']):
+                start,stop = np.searchsorted(rec['block'],[code,code+1])
+                if stop > start:
+                    blocks[block] = [int(start),int(stop)]
+
+            # write the columns to a new folder, then switch the catalog to it
+            sessPath = subj+'/session'+sess+'-'+str(time.time_ns())
+            os.makedirs(os.path.join(self.root,sessPath))
+            for field in rec.dtype.names:
+                np.save(os.path.join(self.root,sessPath,field+'.npy'),np.ascontiguousarray(rec[field]))
+            self.catalog['sessions'][key] = {'subj':subj,'sess':int(sess) if sess.isdigit() else sess,'path':sessPath,'configHash':configHash,'source':sig,'n_trials':len(rec),'fields':list(rec.dtype.names),'categories':table.categories,'blocks':blocks}
+            self._writeCatalog()
+            if old is not None:
+                shutil.rmtree(os.path.join(self.root,old['path']),ignore_errors = True)
+            ingested.append(key)
+            if verbose == True:
+                print('Ingested {} ({} trials)'.format(key,len(rec)))
+
+        if prune == True:
+            for key in [k for k in self.catalog['sessions'] if k not in found]:
+                old = self.catalog['sessions'].pop(key)
+                self._writeCatalog()
+                shutil.rmtree(os.path.join(self.root,old['path']),ignore_errors = True)
+        return ingested
+
+    def sessions(self, subj = None, sess = None, configHash = None):
+        # DataFrame of the sessions in the store (subj, sess, configHash, n_trials and the blocks of each session)
+        import pandas as pd
+        rows = [{'subj':e['subj'],'sess':e['sess'],'configHash':e.get('configHash'),'n_trials':e['n_trials'],'blocks':list(e['blocks'].keys())} for e in self._select(subj,sess,configHash)]
+        return pd.DataFrame(rows,columns = ['subj','sess','configHash','n_trials','blocks'])
+
+    def _select(self, subj = None, sess = None, configHash = None):
+        # catalog entries of the selected subjects, sessions and configurations, sorted by subject and session
+        subjs = _asList(subj)
+        sesss = _asList(sess)
+        hashes = _asList(configHash)
+        entries = []
+        for e in self.catalog['sessions'].values():
+            if ((subjs is None) or (e['subj'] in subjs)) and ((sesss is None) or (e['sess'] in sesss)) and ((hashes is None) or (e.get('configHash') in hashes)):
+                entries.append(e)
+        return sorted(entries,key = lambda e: (e['subj'],str(e['sess'])))
+
+    def iterQuery(self, subj = None, sess = None, block = None, columns = None, where = None, configHash = None):
+        # Yields one DataFrame per selected session (columns subj, sess, trial and the requested columns; categorical fields are pandas categoricals). Memory holds one session's selection at a time
+        # subj, sess, block, configHash ... one value or a list of values to select (None selects all). configHash selects sessions run with the same configuration (see pyrtp.config.SessionConfig.hash)
+        # columns ... fields to read (default: all fields of the session)
+        # where ... optional pandas query string applied to each session's rows (e.g. 'RT > 0.2 & coherence >= 0.5'); its fields must be in columns
+        import pandas as pd
+        blocks = _asList(block)
+        for e in self._select(subj,sess,configHash):
+            if blocks is None:
+                ranges = [[0,e['n_trials']]]
+            else:
+                ranges = [e['blocks'][b] for b in blocks if b in e['blocks']]
+                if len(ranges) == 0:
+                    continue
+            fields = [f for f in e['fields'] if f != 'trial'] if columns is None else [f for f in columns if f != 'trial']
+
+            data = {}
+            for field in ['trial']+fields:
+                col = np.load(os.path.join(self.root,e['path'],field+'.npy'),mmap_mode = 'r')
+                values = np.concatenate([col[start:stop] for start,stop in ranges])
+                if field in e['categories']:
+                    values = pd.Categorical.from_codes(values,dtype = pd.CategoricalDtype(e['categories'][field]),validate = False)
+                data[field] = values
+            df = pd.DataFrame(data,copy = False)
+            df.insert(0,'sess',e['sess'])
+            df.insert(0,'subj',e['subj'])
+            if where is not None:
+                df = df.query(where)
+            yield df
+
+    def query(self, subj = None, sess = None, block = None, columns = None, where = None, configHash = None):
+        # Returns the selected trials of every selected session in one DataFrame (see iterQuery). subj is a categorical column
+        import pandas as pd
+        frames = list(self.iterQuery(subj = subj,sess = sess,block = block,columns = columns,where = where,configHash = configHash))
+        if len(frames) == 0:
+            return pd.DataFrame(columns = ['subj','sess','trial']+([] if columns is None else [c for c in columns if c != 'trial']))
+        df = pd.concat(frames,ignore_index = True)
+        df['subj'] = df['subj'].astype('category')
+        return df
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Add new and changed sessions to the consolidated trial store')
+    parser.add_argument('--data',default = 'data',help = 'data folder (default: data)')
+    parser.add_argument('--store',default = os.path.join('data','store'),help = 'store folder (default: data/store)')
+    parser.add_argument('--prune',action = 'store_true',help = 'remove sessions that are no longer in the data folder')
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    store = TrialStore(args.store)
+    ingested = store.ingest(args.data,prune = args.prune,verbose = True)
+    print('Ingested {} sessions in {:.2f} s; the store holds {} sessions'.format(len(ingested),time.perf_counter()-t0,len(store.catalog['sessions'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# pyrtp.params. Default configuration of the random tone pitch task. Kept separate from the task (pyrtp.task) so that tools which do not run the task (offline rendering, benchmarks, simulation) can build the same params without importing psychopy.
+
+
+def getParams():
+    # Returns a new params dictionary with the default task configuration. The task (pyrtp.task) adds session-specific fields (subj, sess, directories, sync device) to it.
+    params = {}
+
+    # options
+    params['options_sendSYNC'] = True
+
+    params['SYNC_useDigitalOut'] = True
+    #params['SYNC_digitalOut_chan'] = 'FI02' # These are hard coded 
+    #params['SYNC_analogOut_chan'] = 'DAC0'
+    params['SYNC_volt'] = 1.5 # 1.5 V pulse (only matters for analog out)
+    # these are populated after getting calibration data
+    params['SYNC_pulse_val'] = None  
+    params['SYNC_zero_val'] = None 
+    params['SYNC_deviceObj'] = None
+    params['SYNC_device'] = 'u3' # 'u3' sends pulses through a LabJack U3. 'fake' records them in process (no hardware, see pyrtp.sync.FakeU3), 'null' does the same without emulating USB latency and without a worker thread (simulated sessions)
+    params['SYNC_width_s'] = 0.1 # pulse width in seconds
+
+    params['options_playOrientOnEachTrial'] = False # show orientation sound on each trial
+    params['options_showFixation'] = False # show fixation cross 
+    params['options_preRenderTrial'] = False # if True, pre-renders the whole trajectory for the response window before stimulus onset and plays it as one gapless stream that is cut off at the first key press. If False, each time step is synthesized and played separately
+    params['options_promptBlockStart'] = True # wait for ENTER before each block
+    params['options_verbose'] = True # print the block and the outcome of each trial
+    params['options_shuffleTrialsAcrossBlocks'] = False # sets whether or not to shuffle trials across blocks. If set to true, it will randomly present trials and lose the block design. Set to FALSE by default
+
+    # trial parameters (will create appropriate combinations of these parameters 
+    params['num_trials'] = 25 #25; this is the number of trials for each condition (total trials is this value x 8 )
+
+    # sound cloud parameters
+    #Base note. #C4 = 261, A4 = 440
+    #https://pages.mtu.edu/~suits/notefreqs.html
+    params['baseNote'] = 440 
+    params['change_range'] = (2,8) # range of change per time step, in half steps. Coherent sounds will change between one and four notes on each step 
+    params['num_tones'] = 10 # number of tones to play simultaneously. Tones are mixed into a single buffer, so there is no hard limit. The mix is scaled by 1/num_tones (see pyrtp.synth.synthCloud), so each tone gets quieter as num_tones grows
+    params['toneRange_low'] = -9 # num half steps below baseNote, (-9, with base note of 440 corresponds to C4, 260 Hz)
+    params['toneRange_high'] = 63 # num half steps above baseNote(63, with base note of 440 corresponds to C10, 16744 Hz)
+
+
+    # timing parameters
+    params['dur_tonestep'] = 0.05 # time to play each sound cloud in sec (default = 50 ms)
+    params['dur_orient'] = .5 # time in seconds to play orientation sound
+    params['dur_fb'] = 1.5 # time in seconds to play feedback
+    params['dur_waitforsync'] = .5 # minimum time in seconds between consecutive sync pulses (kept by the sync worker, the trial does not wait)
+    params['dur_pollResponse'] = 0.001 # time in seconds between keyboard polls of the response listener (pyrtp.response.ResponseListener)
+
+    # storage parameters
+    params['journal_fsync'] = 'trial' # when trial journal records are forced to disk: 'trial' (after every trial), 'block' (at the end of each block) or 'off' (at the end of the session). Also applies to the checkpoint manifest (checkpoint.json) and the stimulus traces (stimTraces). See pyrtp.storage.TrialJournal
+    params['data_formats'] = ['csv'] # formats the trial table is written in at the end of the session: 'csv' (data.csv), 'parquet' (data.parquet) and/or 'feather' (data.feather). parquet and feather need pyarrow (skipped with a warning if it is not installed; the tables can also be written later with pyRTP_pickle2csv.py --formats). See pyrtp.storage.writeSessionTable
+
+    # audio parameters
+    params['audio_sampleRate'] = 44100 # sample rate (Hz) used to synthesize each sound cloud
+    params['audio_output'] = 'psychopy' # 'psychopy' plays each step (or pre-rendered stream) through psychopy.sound. 'callback' streams from a ring buffer filled by a producer thread through a sounddevice callback (requires sounddevice), 'null' does the same without an audio device (for headless testing), and 'sim' plays nothing and lets a simulated subject respond (see pyrtp.simulate)
+    params['audio_ringSteps'] = 4 # number of steps the producer may run ahead of the audio callback ('callback' and 'null' output)
+    params['audio_blocksize'] = 256 # frames per audio callback ('callback' and 'null' output)
+    params['audio_toneBankBytes'] = 16*2**20 # memory budget (bytes) for cached tone wavetables (see pyrtp.synth.ToneBank). The full tone range at default settings takes < 1 MB
+
+    # simulated subject (pyrtp.simulate). Drift-diffusion agent: evidence accumulates the median pitch change of the tones in each step (half steps) times sim_driftGain plus gaussian noise (sim_noise per sqrt(s)), until it reaches +/- sim_bound (per block)
+    params['sim_driftGain'] = 1.
+    params['sim_noise'] = 60.
+    params['sim_bound'] = {'fast':20., 'slow':60.}
+    params['sim_nonDecision_s'] = 0.3 # time from the decision to the key press
+
+    # button list
+    # (return, up) are (right and left) for the button box
+    params['buttonList_inc'] = ['rshift','return']
+    params['buttonList_dec'] = ['lshift','up']
+    params['buttonList_any'] = params['buttonList_inc'][:]
+    params['buttonList_any'].extend(params['buttonList_dec'] )
+
+    # responseTime limit varies by block (as a method to implement SAT)
+    params['responseTimeLimit_s']={'fast':10, 'slow':10} 
+
+    # block list
+    params['block_list'] = ['fast','slow'] 
+
+    params['coherence_list'] = [0.8,0.4] # [0.1 - 1]; % of tones that change pitch coherently on each time step. Remainder of tones are randomly resampled from the tone range
+    params['change_tones_together'] = True # if true, on each time step, it randomly draws a change value and applies it to all tones that are changing coherently. If False, it randomly generates a change value for each tone that is changing. 
+    params['rng_seed'] = None # session seed. Seeds the trial list shuffles and the per-trial seeds (trialSeed) that draw each trial's pitch trajectory. If None, a fresh seed is drawn from the OS
+    params['direction_list'] = ['increase','decrease']
+
+    # trial dictionary fields (rt is also in sec)
+    params['trial_fields'] = ['block','trialInBlock','trialSeed','coherence','direction','orientOn_s','orientOff_s','stimOn_s','stimOff_s','buttonPress','choice','correct','error','buttonPress_s','RT','fbOn_s','fbOff_s','wasShown','stimSteps','stimCutoff_s','stimCutoff_step','stimUnderruns','stimOffLag_s','TTL1sent_s','TTL1ack_s','TTL2sent_s','TTL3sent_s']
+
+    return params
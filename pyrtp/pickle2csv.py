@@ -0,0 +1,156 @@
+# This function will convert an incomplete session to a csv file by loading the task data dataframe and writing a csv file. Run with main() ($ python pyRTP_pickle2csv.py)
+
+# With --all, every session under the data folder (data/<subj>/session<N>) whose session tables are missing or out of date is converted, in parallel across a process pool. A session is out of date when its taskData or trialJournal is newer than its tables (--check mtime) or when their content hash differs from the one recorded at the last conversion (--check hash; the hash is kept in export.json in the session folder). --formats also writes the columnar tables (data.parquet, data.feather; see pyrtp.storage.writeSessionTable)
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from pyrtp.trials import asTrialTable,loadTaskData,trialFrame
+from pyrtp.storage import writeSessionTable,SESSION_TABLE_FILES
+
+EXPORT_MANIFEST = 'export.json'
+
+
+def sessionSources(sessDir):
+    # saved task data of a session folder (taskData and, if there is one, trialJournal)
+    return [os.path.join(sessDir,f) for f in ['taskData','trialJournal'] if os.path.exists(os.path.join(sessDir,f))]
+
+
+def sourceHash(sessDir):
+    # content hash of the saved task data of a session folder
+    h = hashlib.blake2b(digest_size = 16)
+    for fpath in sessionSources(sessDir):
+        with open(fpath,'rb') as f:
+            for chunk in iter(lambda: f.read(1<<20),b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def readManifest(sessDir):
+    # export manifest of a session folder (formats and source hash of the last conversion), or an empty dictionary
+    fpath = os.path.join(sessDir,EXPORT_MANIFEST)
+    if os.path.exists(fpath) == False:
+        return {}
+    with open(fpath,'r') as f:
+        return json.load(f)
+
+
+def isStale(sessDir, formats, check = 'mtime', source_hash = None):
+    # True if a session table of formats is missing or older than the saved task data
+    # check ... 'mtime' (compare modification times) or 'hash' (compare the content hash with the export manifest)
+    outputs = [os.path.join(sessDir,SESSION_TABLE_FILES[fmt]) for fmt in formats]
+    if any([os.path.exists(fpath) == False for fpath in outputs]):
+        return True
+    if check == 'mtime':
+        return max([os.path.getmtime(fpath) for fpath in sessionSources(sessDir)]) > min([os.path.getmtime(fpath) for fpath in outputs])
+    if check == 'hash':
+        manifest = readManifest(sessDir)
+        if source_hash is None:
+            source_hash = sourceHash(sessDir)
+        return (manifest.get('source') != source_hash) or any([fmt not in manifest.get('formats',[]) for fmt in formats])
+    raise ValueError('check must be mtime or hash (got {})'.format(check))
+
+
+def convertSession(sessDir, formats = ['csv'], check = 'mtime', force = False):
+    # Writes the session tables of formats for one session folder, unless they are up to date (force = True always converts)
+
+    # Returns
+    # result ... dictionary with sessDir, converted (True if tables were written), n_trials, wall_s and error (message if the conversion failed, None otherwise)
+    t0 = time.perf_counter()
+    result = {'sessDir':sessDir,'converted':False,'n_trials':None,'wall_s':None,'error':None}
+    try:
+        source_hash = sourceHash(sessDir) if check == 'hash' else None
+        if (force == True) or isStale(sessDir,formats,check = check,source_hash = source_hash):
+            # trial table with the trials of the journal replayed (an incomplete session only has them in the journal)
+            taskData = loadTaskData(sessDir)
+            for fmt in formats:
+                if fmt == 'csv':
+                    # convert to dataframe (taskData is a trial table, or a list of trial dictionaries for older sessions)
+                    writeSessionTable(trialFrame(taskData),os.path.join(sessDir,SESSION_TABLE_FILES[fmt]))
+                else:
+                    table = asTrialTable(taskData)
+                    writeSessionTable(table.toDataFrame(),os.path.join(sessDir,SESSION_TABLE_FILES[fmt]),schema = table.schema())
+
+            # record what was converted from which task data
+            with open(os.path.join(sessDir,EXPORT_MANIFEST),'w') as f:
+                json.dump({'formats':list(formats),'source':sourceHash(sessDir) if source_hash is None else source_hash},f)
+            result['converted'] = True
+            result['n_trials'] = len(taskData)
+    except Exception as e:
+        result['error'] = repr(e)
+    result['wall_s'] = time.perf_counter()-t0
+    return result
+
+
+def _convertJob(job):
+    # Pool worker (job is a tuple of convertSession arguments)
+    return convertSession(*job)
+
+
+def findSessions(dataDir = 'data'):
+    # Returns the session folders (<dataDir>/<subj>/session<N>) that hold a taskData file, sorted
+    sessions = []
+    for subj in sorted(os.listdir(dataDir)):
+        subjDir = os.path.join(dataDir,subj)
+        if os.path.isdir(subjDir) == False:
+            continue
+        for sess in sorted(os.listdir(subjDir)):
+            if sess.startswith('session') & os.path.exists(os.path.join(subjDir,sess,'taskData')):
+                sessions.append(os.path.join(subjDir,sess))
+    return sessions
+
+
+def convertSessions(dataDir = 'data', formats = ['csv'], check = 'mtime', force = False, n_jobs = None):
+    # Converts every session under dataDir whose tables are missing or out of date, across a process pool (n_jobs workers, default: all cores)
+
+    # Returns
+    # results ... list of convertSession results, in the order of findSessions
+    # wall_s ... time the whole batch took
+    import multiprocessing
+
+    jobs = [(sessDir,formats,check,force) for sessDir in findSessions(dataDir)]
+    t0 = time.perf_counter()
+    if (n_jobs == 1) or (len(jobs) <= 1):
+        results = [_convertJob(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(n_jobs) as pool:
+            results = pool.map(_convertJob,jobs,chunksize = 1)
+    return results,time.perf_counter()-t0
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Convert saved task data (taskData, trialJournal) to session tables')
+    parser.add_argument('--all',action = 'store_true',help = 'convert every session under --data whose tables are missing or out of date (no prompts)')
+    parser.add_argument('--data',default = 'data',help = 'data folder (default: data)')
+    parser.add_argument('--formats',nargs = '+',choices = list(SESSION_TABLE_FILES.keys()),default = ['csv'],help = 'session tables to write (default: csv)')
+    parser.add_argument('--check',choices = ['mtime','hash'],default = 'mtime',help = 'how out of date tables are found (default: mtime)')
+    parser.add_argument('--force',action = 'store_true',help = 'convert every session, even if its tables are up to date')
+    parser.add_argument('--jobs',type = int,default = None,help = 'number of worker processes (default: all cores)')
+    args = parser.parse_args(argv)
+
+    if args.all == False:
+        # Prompt ask for subj and session ID. This will overwrite default subj ID created during initialization
+        subj = input ("Enter Subject ID :")
+        sess = input ("Enter Session number:")
+
+        #  Sess directory
+        sessdir = os.path.join(os.getcwd(),args.data,subj,'session'+str(sess))
+
+        result = convertSession(sessdir,formats = args.formats,check = args.check,force = True)
+        if result['error'] is not None:
+            raise RuntimeError('Could not convert {}: {}'.format(sessdir,result['error']))
+        return
+
+    results,wall_s = convertSessions(args.data,formats = args.formats,check = args.check,force = args.force,n_jobs = args.jobs)
+    converted = [r for r in results if r['converted'] == True]
+    failed = [r for r in results if r['error'] is not None]
+    for r in failed:
+        print('FAILED {}: {}'.format(r['sessDir'],r['error']))
+    print('Converted {} of {} sessions ({} up to date, {} failed) in {:.2f} s with {} workers'.format(len(converted),len(results),len(results)-len(converted)-len(failed),len(failed),wall_s,args.jobs or os.cpu_count()))
+
+
+if __name__ == '__main__':
+    main()
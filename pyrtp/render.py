@@ -0,0 +1,130 @@
+# pyrtp.render. Renders the stimuli of a session offline (no psychopy, no audio device). Builds a trial list with generateTrialList, draws each trial's pitch trajectory (makeTrajectory, the batched changePitch) and synthesizes it from the tone wavetables, then writes one file per trial. Trials are rendered in parallel across cores.
+
+# Each trial is rendered from its trialSeed (pyrtp.trials.trialSeeds of the session seed), so a rendered trial is the trajectory the same trial plays in a session with the same rng_seed (see pyrtp.trials.trialTrajectories). A manifest (trials.csv) lists the trial conditions, seeds, files and a few summary statistics for auditing the stimulus set.
+
+# usage:
+# $ python -m pyrtp.render --out renders/set1 --seed 1 --format npz
+# $ python -m pyrtp.render --out renders/set1 --format wav --num-trials 5 --jobs 4
+
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+import numpy as np
+
+from pyrtp.params import getParams
+from pyrtp.trials import generateTrialList
+from pyrtp.stimulus import makeTrajectory
+from pyrtp.synth import synthStream,ToneBank
+from pyrtp.audio import writeWav
+
+
+# per-process tone bank (built by initWorker)
+_bank = None
+
+def initWorker(params):
+    # build the wavetables once per worker process
+    global _bank
+    _bank = ToneBank(max_bytes = params['audio_toneBankBytes'])
+    _bank.prebuild(np.arange(params['toneRange_low'],params['toneRange_high']+1),dur = params['dur_tonestep'],baseNote = params['baseNote'],sampleRate = params['audio_sampleRate'])
+
+
+def renderTrial(task):
+    # Renders one trial and writes it to disk. task is (trial index, trialDict, trial seed, n_steps, params, out dir, format)
+
+    # Returns
+    # row ... dictionary for the manifest
+    t,trialDict,seed,n_steps,params,outDir,fmt = task
+
+    # pitch trajectory and audio
+    traj = makeTrajectory(n_steps,params['num_tones'],direction = trialDict['direction'],coherence = trialDict['coherence'],change_range = params['change_range'],toneRange = (params['toneRange_low'],params['toneRange_high']),change_tones_together = params['change_tones_together'],rng = np.random.default_rng(seed))
+    buf,samples_per_step = synthStream(traj,dur = params['dur_tonestep'],baseNote = params['baseNote'],sampleRate = params['audio_sampleRate'],bank = _bank)
+
+    # write file
+    fname = 'trial{:04d}.{}'.format(t,fmt)
+    if fmt == 'wav':
+        writeWav(os.path.join(outDir,fname),buf,sampleRate = params['audio_sampleRate'])
+    else:
+        np.savez_compressed(os.path.join(outDir,fname),audio = (buf*(2**15-1)).astype('int16'),traj = traj.astype('int8'),sampleRate = params['audio_sampleRate'],dur_tonestep = params['dur_tonestep'],baseNote = params['baseNote'])
+
+    # summary statistics: mean pitch change per step of the coherent tones and of the whole cloud
+    num_coherent = int(np.round(trialDict['coherence']*params['num_tones']))
+    row = {'trial':t,'block':trialDict['block'],'trialInBlock':trialDict['trialInBlock'],'coherence':trialDict['coherence'],'direction':trialDict['direction'],'seed':seed,'n_steps':n_steps,'file':fname}
+    row['meanStep_coherent'] = np.diff(traj[:,:num_coherent],axis = 0).mean() if num_coherent > 0 else np.nan
+    row['meanStep_cloud'] = np.diff(traj.mean(axis = 1)).mean()
+    row['meanPitch'] = traj.mean()
+
+    return row
+
+
+def renderSession(params, outDir, fmt = 'npz', seed = None, n_jobs = None, dur_s = None):
+    # Renders every trial of a session and writes the manifest
+
+    # Inputs
+    # params ... task params (see pyrtp.params.getParams)
+    # outDir ... output folder (created if needed)
+    # fmt ... 'wav' (audio only) or 'npz' (compressed int16 audio, int8 trajectory and synthesis settings)
+    # seed ... session seed (default: params['rng_seed'], or a fresh seed). Trial list shuffles and per trial seeds are derived from it as in a session (see pyrtp.trials.trialSeeds)
+    # n_jobs ... number of worker processes (default: all cores)
+    # dur_s ... stimulus duration for every trial. Default is the block's responseTimeLimit_s (the draws of a trajectory depend on its length, so only the default matches the session's trajectories)
+
+    # Returns
+    # rows ... list of manifest rows
+    if os.path.exists(outDir)==False:
+        os.makedirs(outDir)
+
+    # trial list and per trial seeds (trialSeed column) from the session seed, derived as in a session (pyrtp.task.runSession), so trial t renders the trajectory trial t of a session with rng_seed = seed plays
+    if seed is not None:
+        params['rng_seed'] = seed
+    if params['rng_seed'] is None:
+        params['rng_seed'] = np.random.SeedSequence().entropy
+    trialTable = generateTrialList(params,rng = np.random.default_rng(params['rng_seed']))
+    trial_seeds = trialTable.columns['trialSeed']
+
+    tasks = []
+    for t in np.arange(0,len(trialTable)):
+        trialDict = trialTable[t].toDict()
+        limit_s = params['responseTimeLimit_s'][trialDict['block']] if dur_s is None else dur_s
+        n_steps = int(np.ceil(limit_s/params['dur_tonestep']))
+        tasks.append((int(t),trialDict,int(trial_seeds[t]),n_steps,params,outDir,fmt))
+
+    # render in parallel
+    with multiprocessing.Pool(n_jobs,initializer = initWorker,initargs = (params,)) as pool:
+        rows = pool.map(renderTrial,tasks,chunksize = max(1,len(tasks)//(4*(n_jobs or os.cpu_count()))))
+
+    # write manifest
+    with open(os.path.join(outDir,'trials.csv'),'w',newline = '') as f:
+        writer = csv.DictWriter(f,fieldnames = list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return rows
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Render the stimuli of a pyRTP session offline')
+    parser.add_argument('--out',required = True,help = 'output folder')
+    parser.add_argument('--format',choices = ['npz','wav'],default = 'npz',help = 'file format for each trial (default: npz)')
+    parser.add_argument('--seed',type = int,default = None,help = 'session seed (default: random)')
+    parser.add_argument('--jobs',type = int,default = None,help = 'number of worker processes (default: all cores)')
+    parser.add_argument('--num-trials',type = int,default = None,help = 'trials per condition (overrides params num_trials)')
+    parser.add_argument('--dur',type = float,default = None,help = 'stimulus duration in seconds (default: block response time limit)')
+    parser.add_argument('--sample-rate',type = int,default = None,help = 'sample rate in Hz (overrides params audio_sampleRate)')
+    args = parser.parse_args(argv)
+
+    params = getParams()
+    if args.num_trials is not None:
+        params['num_trials'] = args.num_trials
+    if args.sample_rate is not None:
+        params['audio_sampleRate'] = args.sample_rate
+
+    t0 = time.perf_counter()
+    rows = renderSession(params,args.out,fmt = args.format,seed = args.seed,n_jobs = args.jobs,dur_s = args.dur)
+    elapsed = time.perf_counter()-t0
+
+    print('Rendered {} trials to {} in {:.2f} s ({:.1f} trials/s)'.format(len(rows),args.out,elapsed,len(rows)/elapsed))
+
+
+if __name__ == '__main__':
+    main()
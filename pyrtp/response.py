@@ -0,0 +1,60 @@
+# pyrtp.response. Event-driven response capture for the random tone pitch task. A listener thread polls the keyboard while the stimulus plays and, at the first response key, stops the audio right away (from the listener thread), so stimulus offset after a response is not quantized to the step duration and the main thread does not have to poll.
+
+import threading
+import time
+
+
+class ResponseListener(threading.Thread):
+    # Background keyboard listener. Polls kb.getKeys every poll_s seconds; at the first key press it stores the keys, takes the detection time, calls onPress (e.g. audioOut.stop or stream.stop), takes the offset time and sets the pressed event. Other threads wait on the press with wait(timeout).
+
+    # Attributes (set once a key was pressed)
+    # keys ... keys returned by kb.getKeys (empty list until a key is pressed)
+    # detect_s ... time at which the listener saw the key press
+    # offTime_s ... time at which onPress returned (stimulus offset)
+
+    def __init__(self, kb, keyList, onPress = None, clock = time.perf_counter, poll_s = 0.001):
+        # kb ... keyboard object with getKeys(keyList) (psychopy.hardware.keyboard.Keyboard, already started)
+        # keyList ... keys that count as a response
+        # onPress ... function called (in the listener thread) at the first key press. Can be replaced while the listener runs (the per-step path points it at the step currently playing)
+        # clock ... function returning the current time (pass core.monotonicClock.getTime to share the task clock)
+        # poll_s ... time between keyboard polls
+        threading.Thread.__init__(self,daemon = True)
+        self.kb = kb
+        self.keyList = keyList
+        self.onPress = onPress
+        self.clock = clock
+        self.poll_s = poll_s
+        self.keys = []
+        self.detect_s = None
+        self.offTime_s = None
+        self.pressed = threading.Event()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while self._stop_event.is_set() == False:
+            keys = self.kb.getKeys(self.keyList)
+            if len(keys) > 0:
+                self.detect_s = self.clock()
+                self.keys = keys
+                with self._lock:
+                    if self.onPress is not None:
+                        self.onPress()
+                    self.offTime_s = self.clock()
+                self.pressed.set()
+                return
+            self._stop_event.wait(self.poll_s)
+
+    def setOnPress(self, onPress):
+        # Replace the stop function. Returns True if a key was already pressed (onPress will not be called, the caller should stop its sound itself)
+        with self._lock:
+            self.onPress = onPress
+            return self.offTime_s is not None
+
+    def wait(self, timeout = None):
+        # Block until a key is pressed or timeout seconds have passed. Returns True if a key was pressed
+        return self.pressed.wait(timeout)
+
+    def stop(self):
+        # stop listening (the thread exits within poll_s)
+        self._stop_event.set()
@@ -0,0 +1,320 @@
+# pyrtp.simulate. Simulated-subject mode. Runs the task's own session loop (pyrtp.task.runSession -> runTrial) headless, with a drift-diffusion agent in place of the keyboard, no audio ('sim' audio output) and a null sync device. Time is simulated: core.wait advances a clock instead of sleeping, so a session of a few hundred trials runs in well under a second. Use it to load-test the whole pipeline (trial list, trajectories, step log, persistence, analysis) over many synthetic sessions.
+
+# $ python -m pyrtp.simulate --out data --subjects 50 --sessions 4 --seed 1 --jobs 8
+# Sessions are spread across a process pool and written to the usual <out>/sim<i>/session<N> layout (same files as a real session). --store also collects the trials of all sessions into one csv file. With --report, the analysis report (sess_results.pdf) is written for every session (requires matplotlib and scipy).
+
+import argparse
+import os
+import time
+import numpy as np
+
+from pyrtp.params import getParams
+
+
+class SimClock:
+    # Relative clock on simulated time (stands in for psychopy.core.Clock / the keyboard clock)
+    def __init__(self, core):
+        self.core = core
+        self.t0 = core.t
+
+    def getTime(self):
+        return self.core.t-self.t0
+
+    def reset(self):
+        self.t0 = self.core.t
+
+    def getLastResetTime(self):
+        return self.t0
+
+
+class SimCore:
+    # Stands in for psychopy.core. Time only moves when the task waits: wait(secs) advances the clock by secs and returns immediately
+    def __init__(self):
+        self.t = 0.
+        self.monotonicClock = self
+        self.n_waits = 0
+
+    def getTime(self):
+        return self.t
+
+    def getLastResetTime(self):
+        # the simulated monotonic clock starts at 0 and is never reset, so key press times (tDown) are already on it
+        return 0.
+
+    def wait(self, secs, hogCPUperiod = 0.2):
+        self.n_waits+=1
+        self.t+=max(0.,secs)
+
+    def getAbsTime(self):
+        return int(time.time())
+
+    def quit(self):
+        raise SystemExit
+
+
+class SimKey:
+    # Stands in for psychopy's KeyPress. Compares equal to its name, so `key in params['buttonList_inc']` works as for a real key press
+    def __init__(self, name, rt, tDown):
+        self.name = name
+        self.rt = rt
+        self.tDown = tDown
+
+    def __eq__(self, other):
+        if isinstance(other,SimKey):
+            return self.name == other.name
+        return self.name == other
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __repr__(self):
+        return 'SimKey({}, rt = {:.3f})'.format(self.name,self.rt)
+
+
+class DDMAgent:
+    # Drift-diffusion observer that listens to the pitch trajectory. After each step the agent adds the median pitch change of the tones in the cloud (half steps; the median follows the coherent tones and ignores resampled or reset tones) times driftGain, plus gaussian noise of noise*sqrt(dur) (internal noise, per sqrt(s)), to its decision variable. It responds 'increase' when the decision variable reaches +bound and 'decrease' at -bound, nonDecision_s after the crossing. If the bound is never reached within the response window, it does not respond.
+
+    def __init__(self, driftGain = 1., noise = 60., bound = 20., nonDecision_s = 0.3, rng = None):
+        # bound ... decision bound, either one value or a dictionary with one value per block (e.g. {'fast':20., 'slow':60.} to model the speed-accuracy tradeoff)
+        # rng ... np.random.Generator for the internal noise
+        self.driftGain = driftGain
+        self.noise = noise
+        self.bound = bound
+        self.nonDecision_s = nonDecision_s
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    @classmethod
+    def fromParams(cls, params, rng = None):
+        # agent with the sim_ parameters of params
+        return cls(driftGain = params['sim_driftGain'],noise = params['sim_noise'],bound = params['sim_bound'],nonDecision_s = params['sim_nonDecision_s'],rng = rng)
+
+    def respond(self, traj, dur = 0.05, block = None):
+        # Returns (choice, t) where choice is 'increase', 'decrease' or None (no response) and t is the key press time relative to stimulus onset (inf if no response)
+        bound = self.bound[block] if isinstance(self.bound,dict) else self.bound
+
+        # evidence of each step (the change from step k to k+1 is heard at the end of step k+1)
+        evidence = np.median(np.diff(traj,axis = 0),axis = 1)*self.driftGain+self.rng.standard_normal(traj.shape[0]-1)*self.noise*np.sqrt(dur)
+        dv = np.cumsum(evidence)
+
+        crossed = np.nonzero(np.abs(dv) >= bound)[0]
+        if len(crossed) == 0:
+            return None,np.inf
+        k = crossed[0]
+        choice = 'increase' if dv[k] > 0 else 'decrease'
+        return choice,(k+2)*dur+self.nonDecision_s
+
+
+class AgentKeyboard:
+    # Stands in for psychopy.hardware.keyboard.Keyboard. simTrial hands the trajectory to present(); the agent's response is then returned by getKeys once the simulated clock has reached the key press
+
+    def __init__(self, agent, core, params):
+        self.agent = agent
+        self.core = core
+        self.clock = SimClock(core)
+        self.keyMap = {'increase':params['buttonList_inc'][0],'decrease':params['buttonList_dec'][0]}
+        self._key = None
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def clearEvents(self):
+        self._key = None
+
+    def present(self, traj, dur = 0.05, block = None):
+        # Let the agent listen to the trajectory, starting now. Returns the key press time relative to now (inf if the agent does not respond)
+        choice,t = self.agent.respond(traj,dur = dur,block = block)
+        if choice is not None:
+            tDown = self.core.t+t
+            self._key = SimKey(self.keyMap[choice],rt = tDown-self.clock.t0,tDown = tDown)
+        return t
+
+    def getKeys(self, keyList = None, waitRelease = False, clear = True):
+        if (self._key is None) or (self._key.tDown > self.core.t):
+            return []
+        if (keyList is not None) and (self._key not in keyList):
+            return []
+        keys = [self._key]
+        if clear == True:
+            self._key = None
+        return keys
+
+
+class SimKeyboardModule:
+    # Stands in for the psychopy.hardware.keyboard module (runTrial calls keyboard.Keyboard(...))
+    def __init__(self, agent, core, params):
+        self.agent = agent
+        self.core = core
+        self.params = params
+
+    def Keyboard(self, device = -1, waitForStart = True, **kwargs):
+        return AgentKeyboard(self.agent,self.core,self.params)
+
+
+def simParams(params = None):
+    # Returns params set up for a simulated session: 'sim' audio output, null sync device, no prompts or printing
+    if params is None:
+        params = getParams()
+    params['audio_output'] = 'sim'
+    params['SYNC_device'] = 'null'
+    params['SYNC_width_s'] = 0.
+    params['dur_waitforsync'] = 0.
+    params['options_promptBlockStart'] = False
+    params['options_verbose'] = False
+    params['options_showFixation'] = False
+    return params
+
+
+def simulateSession(params, subj, sess, saveDir = 'data', agent = None, report = False):
+    # Runs one simulated session into <saveDir>/<subj>/session<sess> with pyrtp.task's session loop
+
+    # Inputs
+    # params ... task params (see simParams). params['rng_seed'] seeds the trial list and trajectories
+    # agent ... DDMAgent (default: DDMAgent.fromParams(params))
+    # report ... if True, writes the analysis report into the session folder
+
+    # Returns
+    # task_df ... trial table of the session
+    # sim_s ... simulated session duration in seconds
+    import pyrtp.task as task
+
+    if agent is None:
+        agent = DDMAgent.fromParams(params)
+
+    # install simulated psychopy objects in the task module
+    core = SimCore()
+    task.core = core
+    task.keyboard = SimKeyboardModule(agent,core,params)
+    task.sound = None
+    task.visual = None
+
+    params = task.mkDirs(params,subj = subj,sess = sess,saveDir = saveDir,prompt = False)
+    params = task.initializeLabjack(params)
+    task.setupAudio(params)
+    task_df = task.runSession(params)
+
+    if report == True:
+        from pyrtp.analysis import writeReport
+        writeReport(task_df,params['sessDir']+'/',close = True)
+
+    return task_df,core.t
+
+
+def runSimulation(run):
+    # Pool worker: runs one simulated session. run is a dictionary with subj, sess, seed (np.random.SeedSequence of this run), saveDir (None to run in a temporary folder that is removed afterwards), overrides (params to change), report and keepTrials (return the trial table)
+
+    # Returns
+    # result ... dictionary with subj, sess, n_trials, sim_s (simulated duration), wall_s (time the run took) and trials (trial table with subj and sess columns, or None)
+    import tempfile
+    t0 = time.perf_counter()
+
+    params = simParams()
+    for key,value in run['overrides'].items():
+        params[key] = value
+
+    # independent streams for the task (trial list, trajectories) and the agent (internal noise)
+    task_seed,agent_seed = run['seed'].spawn(2)
+    params['rng_seed'] = task_seed
+    agent = DDMAgent.fromParams(params,rng = np.random.default_rng(agent_seed))
+
+    if run['saveDir'] is None:
+        with tempfile.TemporaryDirectory() as saveDir:
+            task_df,sim_s = simulateSession(params,run['subj'],run['sess'],saveDir = saveDir,agent = agent,report = run['report'])
+    else:
+        task_df,sim_s = simulateSession(params,run['subj'],run['sess'],saveDir = run['saveDir'],agent = agent,report = run['report'])
+
+    trials = None
+    if run['keepTrials'] == True:
+        trials = task_df.reset_index()
+        trials.insert(0,'sess',run['sess'])
+        trials.insert(0,'subj',run['subj'])
+
+    return {'subj':run['subj'],'sess':run['sess'],'n_trials':len(task_df),'sim_s':sim_s,'wall_s':time.perf_counter()-t0,'trials':trials}
+
+
+def runSimulations(n_subj, n_sess = 1, seed = None, saveDir = 'data', overrides = None, n_jobs = None, store = None, report = False):
+    # Runs n_subj x n_sess simulated sessions (subjects sim0, sim1, ..., sessions 0 ... n_sess-1) across a process pool
+
+    # Inputs
+    # seed ... root seed. Every run gets its own stream (spawned from the root seed in run order), so results do not depend on n_jobs or on which worker ran what
+    # saveDir ... folder for the usual <subj>/session<N> layout. If None, sessions run in temporary folders (use with store)
+    # overrides ... dictionary of params to change in every session (e.g. {'num_trials':10,'sim_bound':{'fast':10.,'slow':40.}})
+    # n_jobs ... worker processes (default: all cores)
+    # store ... optional csv file that receives the trials of every session in one table (with subj and sess columns)
+
+    # Returns
+    # results ... list of per-run results (see runSimulation), in run order
+    # wall_s ... time the whole batch took
+    import multiprocessing
+
+    seeds = np.random.SeedSequence(seed).spawn(n_subj*n_sess)
+    runs = []
+    for s in np.arange(0,n_subj):
+        for n in np.arange(0,n_sess):
+            runs.append({'subj':'sim'+str(s),'sess':int(n),'seed':seeds[len(runs)],'saveDir':saveDir,'overrides':{} if overrides is None else overrides,'report':report,'keepTrials':store is not None})
+
+    t0 = time.perf_counter()
+    if n_jobs == 1:
+        results = [runSimulation(run) for run in runs]
+    else:
+        with multiprocessing.Pool(n_jobs) as pool:
+            results = pool.map(runSimulation,runs,chunksize = 1)
+    wall_s = time.perf_counter()-t0
+
+    if store is not None:
+        import pandas as pd
+        pd.concat([r['trials'] for r in results],ignore_index = True).to_csv(store,index = False)
+
+    return results,wall_s
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Run simulated sessions of the random tone pitch task with a drift-diffusion agent')
+    parser.add_argument('--out',default = 'data',help = 'save folder (sessions are written to <out>/sim<i>/session<N>, default: data)')
+    parser.add_argument('--subjects',type = int,default = 1,help = 'number of simulated subjects')
+    parser.add_argument('--sessions',type = int,default = 1,help = 'sessions per subject')
+    parser.add_argument('--jobs',type = int,default = None,help = 'number of worker processes (default: all cores)')
+    parser.add_argument('--seed',type = int,default = None,help = 'root seed for trial lists, trajectories and agent noise')
+    parser.add_argument('--store',default = None,help = 'also write the trials of all sessions to this csv file')
+    parser.add_argument('--no-session-files',action = 'store_true',help = 'do not keep the session folders (use with --store)')
+    parser.add_argument('--num-trials',type = int,default = None,help = 'trials per condition (default: params num_trials)')
+    parser.add_argument('--drift-gain',type = float,default = None)
+    parser.add_argument('--noise',type = float,default = None)
+    parser.add_argument('--bound-fast',type = float,default = None)
+    parser.add_argument('--bound-slow',type = float,default = None)
+    parser.add_argument('--report',action = 'store_true',help = 'write the analysis report of each session')
+    args = parser.parse_args(argv)
+
+    if args.no_session_files & (args.store is None):
+        parser.error('--no-session-files needs --store')
+
+    overrides = {}
+    if args.num_trials is not None:
+        overrides['num_trials'] = args.num_trials
+    if args.drift_gain is not None:
+        overrides['sim_driftGain'] = args.drift_gain
+    if args.noise is not None:
+        overrides['sim_noise'] = args.noise
+    if (args.bound_fast is not None) | (args.bound_slow is not None):
+        overrides['sim_bound'] = getParams()['sim_bound']
+        if args.bound_fast is not None:
+            overrides['sim_bound']['fast'] = args.bound_fast
+        if args.bound_slow is not None:
+            overrides['sim_bound']['slow'] = args.bound_slow
+
+    results,wall_s = runSimulations(args.subjects,args.sessions,seed = args.seed,saveDir = None if args.no_session_files else args.out,overrides = overrides,n_jobs = args.jobs,store = args.store,report = args.report)
+
+    # throughput
+    n_runs = len(results)
+    n_trials = sum([r['n_trials'] for r in results])
+    sim_s = sum([r['sim_s'] for r in results])
+    run_s = np.array([r['wall_s'] for r in results])
+    print('Simulated {} sessions ({} trials) in {:.2f} s with {} workers'.format(n_runs,n_trials,wall_s,args.jobs or os.cpu_count()))
+    print('Throughput: {:.1f} sessions/s, {:.0f} trials/s, {:.0f}x faster than real time'.format(n_runs/wall_s,n_trials/wall_s,sim_s/wall_s))
+    print('Session run time: median = {:.3f} s, max = {:.3f} s'.format(np.median(run_s),run_s.max()))
+
+
+if __name__ == '__main__':
+    main()
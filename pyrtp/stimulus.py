@@ -0,0 +1,123 @@
+# pyrtp.stimulus. Pitch trajectory generation for the random tone pitch task. Nothing in here reads the task's global params dict, so trajectories can be generated (and benchmarked) without starting a session.
+
+import numpy as np
+
+
+def makeTrajectory(n_steps, num_tones, direction = 'increase', coherence = 0.9, change_range = (0,6), toneRange = (-9,63), change_tones_together = True, rng = None, arr0 = None):
+    # Generates the full pitch trajectory of a trial in one vectorized call. Row 0 is the initial sound cloud (drawn uniformly from the tone range, as at stimulus onset in runTrial) and each following row is one application of the changePitch rule:
+    #   - the first num_coherent = round(coherence*num_tones) tones move by a random change (in half steps) in the trial direction. If change_tones_together is True, one change value is drawn per step and applied to all coherent tones; otherwise each tone gets its own change value
+    #   - the remaining tones are resampled uniformly from the tone range on every step
+    #   - coherent tones that leave the tone range are resampled uniformly from the tone range, and keep moving from the new value on the next step
+
+    # The coherent tones are a random walk with resets, so they are computed as a cumulative sum of all changes and then corrected once per reset (the loop runs once per reset of the most frequently reset tone, not once per step).
+
+    # Inputs
+    # n_steps ... number of rows (time steps, including the initial cloud)
+    # num_tones ... number of tones in each cloud
+    # direction ... 'increase' or 'decrease'. Sets the overall direction of change
+    # coherence ... proportion of tones that are changing in the concordance with the direction (increase or decrease)
+    # change_range ... tuple, range from which to draw change values (high value excluded, as in np.random.randint). The sign of both values should be positive (e.g (0,6))
+    # toneRange ... tuple (toneRange_low,toneRange_high) in half steps from the base note
+    # change_tones_together ... see above
+    # rng ... np.random.Generator. A fresh unseeded generator is used if None
+    # arr0 ... optional initial sound cloud (row 0). Drawn from the tone range if None
+
+    # Returns
+    # traj ... int array (n_steps x num_tones) of freq indices
+    if rng is None:
+        rng = np.random.default_rng()
+    low,high = toneRange
+
+    traj = np.empty((n_steps,num_tones),dtype='int')
+    if n_steps == 0:
+        return traj
+
+    # initial cloud
+    if arr0 is None:
+        traj[0] = rng.integers(low,high,size = num_tones)
+    else:
+        traj[0] = arr0
+    n_changes = n_steps-1
+
+    # select coherent indices
+    num_coherent = np.round(coherence*num_tones).astype('int')
+
+    # sign of the change
+    if direction == 'increase':
+        sign = 1
+    elif direction == 'decrease':
+        sign = -1
+    else:
+        sign = 0
+
+    # draw all change values at once. Absolute value is to ensure that we only are calculating the size of change, not the direction here.
+    if change_tones_together == True:
+        change_array = np.absolute(rng.integers(change_range[0],change_range[1],size = (n_changes,1)))
+        change_array = np.broadcast_to(change_array,(n_changes,num_coherent))
+    else:
+        change_array = np.absolute(rng.integers(change_range[0],change_range[1],size = (n_changes,num_coherent)))
+
+    # coherent tones: cumulative change from the initial cloud
+    walk = traj[0,:num_coherent] + sign*np.cumsum(change_array,axis = 0)
+
+    # reset values used when a coherent tone overflows the tone range
+    reset_vals = rng.integers(low,high,size = (n_changes,num_coherent))
+    step_idx = np.arange(n_changes)[:,None]
+
+    # deal with values > toneRange_high or < toneRange_low. Each pass resets the first overflow of each tone and shifts the rest of that tone's walk by the same amount
+    overflow_idx = (walk > high) | (walk < low)
+    while overflow_idx.any():
+        tones = overflow_idx.any(axis = 0)
+        first = np.argmax(overflow_idx,axis = 0)
+        delta = np.where(tones,reset_vals[first,np.arange(num_coherent)]-walk[first,np.arange(num_coherent)],0)
+        walk += (step_idx >= first[None,:])*delta[None,:]
+        overflow_idx = (walk > high) | (walk < low)
+    traj[1:,:num_coherent] = walk
+
+    # resample the rest of the tones from a random distribution
+    traj[1:,num_coherent:] = rng.integers(low,high,size = (n_changes,num_tones-num_coherent))
+
+    return traj
+
+
+# adjust pitch for a time step
+def changePitch(arr,direction = 'increase',change_range = (0,6),coherence = 0.9,toneRange = (-9,63),change_tones_together = True,rng = None):
+    # this function takes a array of freq indices (describing a sound cloud) and adds some unit change of pitch to each tone. 1 unit change = 1 half note. 12 half notes is an octave. Single step version of makeTrajectory (same rule and statistics). Tone range and change_tones_together are passed in explicitly rather than read from the task params.
+
+    # Inputs
+    # arr ... array of freq indices
+    # direction ... 'increase' or 'decrease'. Sets the overall direction of change
+    # change_range ... tuple, sets range from which to draw values. The sign of both values should be positive (e.g (0,6)). It implements increases and decreases by reading the "direction" input
+    # coherence ... proportion of tones that are changing in the concordance with the direction (increase or decrease)
+    # toneRange ... tuple (toneRange_low,toneRange_high)
+    # change_tones_together ... if True, one change value is applied to all coherent tones
+    # rng ... np.random.Generator (fresh unseeded generator if None)
+
+    # Returns
+    # arr ... modified array (updated in place)
+    arr[:] = makeTrajectory(2,len(arr),direction = direction,coherence = coherence,change_range = change_range,toneRange = toneRange,change_tones_together = change_tones_together,rng = rng,arr0 = arr)[1]
+
+    return arr
+
+
+def makeTrajectories(seeds, n_steps, num_tones, directions, coherences, change_range = (0,6), toneRange = (-9,63), change_tones_together = True, n_keep = None):
+    # Generates the trajectories of many trials, each from its own seed (trial i uses np.random.default_rng(seeds[i]), as runTrial does with the trial's trialSeed), into one preallocated int8 array. Each trial is one vectorized makeTrajectory call
+
+    # This stays a loop over trials: every trial draws from its own generator, in the order runTrial draws from it, so a trajectory is reproducible from its trialSeed alone. Batching the draws of several trials would need one shared stream and give different trajectories. The loop costs one generator and one makeTrajectory call per trial (steps and tones of a trial are vectorized)
+
+    # Inputs
+    # seeds ... per-trial seeds (see pyrtp.trials.trialSeeds)
+    # n_steps, directions, coherences ... per-trial number of rows, direction and coherence
+    # other inputs as in makeTrajectory
+    # n_keep ... optional per-trial number of leading rows to keep (e.g. the steps that were played). The draws of a trajectory depend on its length, so n_steps must be the length it was generated with
+
+    # Returns
+    # traces ... int8 array (total steps x num_tones)
+    # offsets ... first row of each trial in traces (len(seeds)+1 entries; trial i is traces[offsets[i]:offsets[i+1]])
+    n_steps = np.asarray(n_steps,dtype = int)
+    n_keep = n_steps if n_keep is None else np.minimum(np.asarray(n_keep,dtype = int),n_steps)
+    offsets = np.concatenate([[0],np.cumsum(n_keep)])
+    traces = np.empty((offsets[-1],num_tones),dtype = 'i1')
+    for i in np.arange(0,len(n_steps)):
+        traces[offsets[i]:offsets[i+1]] = makeTrajectory(n_steps[i],num_tones,direction = directions[i],coherence = coherences[i],change_range = change_range,toneRange = toneRange,change_tones_together = change_tones_together,rng = np.random.default_rng(int(seeds[i])))[:n_keep[i]]
+    return traces,offsets
@@ -0,0 +1,322 @@
+# pyrtp.storage. Reading and writing session files.
+
+import json
+import os
+import pickle
+import struct
+import zlib
+import numpy as np
+
+
+# Pickle functions courtesy of Daniel Schonhaut
+def save_pickle(obj, fpath, verbose=True):
+    """Save object as a pickle file (written to a temporary file first, so a crash never leaves a partly written file)."""
+    with open(fpath+'.tmp', 'wb') as f:
+        pickle.dump(obj, f, pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(fpath+'.tmp', fpath)
+    if verbose:
+        print('Saved {}'.format(fpath))
+
+def load_pickle(fpath):
+    """Return object."""
+    with open(fpath, 'rb') as f:
+        obj = pickle.load(f)
+    return obj
+
+
+# Append-only journal of fixed-size records (one per trial). The file starts with a header (magic, version, header length and the record dtype as json), followed by frames of one record and its crc32. A frame that was only partly written (or fails its checksum) marks the end of the journal, so a crash during a write loses at most that record and never the records before it.
+JOURNAL_MAGIC = b'RTPJ'
+JOURNAL_VERSION = 1
+
+
+def _journalHeader(dtype):
+    descr = json.dumps(np.lib.format.dtype_to_descr(dtype)).encode()
+    return JOURNAL_MAGIC+struct.pack('<HI',JOURNAL_VERSION,len(descr))+descr
+
+
+def _readJournalHeader(f):
+    # returns (dtype, header length in bytes)
+    head = f.read(10)
+    if (len(head) < 10) or (head[:4] != JOURNAL_MAGIC):
+        raise ValueError('{} is not a trial journal'.format(f.name))
+    version,n = struct.unpack('<HI',head[4:])
+    if version != JOURNAL_VERSION:
+        raise ValueError('{} has journal version {} (expected {})'.format(f.name,version,JOURNAL_VERSION))
+    descr = json.loads(f.read(n).decode())
+    dtype = np.lib.format.descr_to_dtype([tuple(d) for d in descr] if isinstance(descr,list) else descr)
+    return dtype,10+n
+
+
+def readJournal(fpath, tail = None, trusted = 0):
+    # Returns the valid records of a journal as a structured array (frames after the first torn or corrupt frame are dropped)
+    # tail ... if given, only the last tail records are read (constant time, e.g. tail = 1 to find where a session stopped)
+    # trusted ... number of leading records whose checksums are not checked (e.g. the journal records counted by the checkpoint manifest, which were checked when the session last resumed or written before the manifest). Only the frames after them are checked, so the checksum work of a resume does not grow with the length of the session. Torn frames are always dropped (the file size sets the number of whole frames)
+    with open(fpath,'rb') as f:
+        dtype,header_n = _readJournalHeader(f)
+        frame_n = dtype.itemsize+4
+        n_frames = (os.fstat(f.fileno()).st_size-header_n)//frame_n
+        first = 0 if tail is None else max(0,n_frames-tail)
+        f.seek(header_n+first*frame_n)
+        frames = np.frombuffer(f.read((n_frames-first)*frame_n),dtype = np.dtype([('record',dtype),('crc','<u4')]))
+
+    # keep frames up to the first bad checksum
+    n_valid = len(frames)
+    for i in range(max(0,trusted-first),len(frames)):
+        if zlib.crc32(frames['record'][i:i+1].tobytes()) != frames['crc'][i]:
+            n_valid = i
+            break
+    return frames['record'][:n_valid].copy()
+
+
+class TrialJournal:
+    # Appends one fixed-size record per trial to a journal file (see readJournal). Each record is written with one write call and flushed to the OS; fsync sets when it is also forced to disk:
+    #   'trial' ... after every record (safe against power loss, costs a disk sync per trial)
+    #   'block' ... when sync() is called (the task calls it at the end of each block) and on close
+    #   'off' ... only on close (safe against crashes of the task, not of the machine)
+    # Opening an existing journal checks that it holds records of the same dtype and cuts off a torn or corrupt tail (or everything after n_records), so appending continues after the last valid record.
+
+    def __init__(self, fpath, dtype, fsync = 'trial', n_records = None):
+        # n_records ... if given, the journal is cut back to its first n_records records without reading them (e.g. the number of records in the session's checkpoint manifest)
+        if fsync not in ['trial','block','off']:
+            raise ValueError('fsync must be trial, block or off (got {})'.format(fsync))
+        self.fpath = fpath
+        self.dtype = np.dtype(dtype)
+        self.fsync = fsync
+        self.n_records = 0
+
+        if os.path.exists(fpath) and (os.path.getsize(fpath) > 0):
+            with open(fpath,'rb') as f:
+                dtype_file,header_n = _readJournalHeader(f)
+            if dtype_file != self.dtype:
+                raise ValueError('{} holds records of a different dtype'.format(fpath))
+            if n_records is None:
+                self.n_records = len(readJournal(fpath))
+            else:
+                if os.path.getsize(fpath) < header_n+n_records*(self.dtype.itemsize+4):
+                    raise ValueError('{} holds fewer than {} records'.format(fpath,n_records))
+                self.n_records = n_records
+            self._f = open(fpath,'r+b')
+            self._f.truncate(header_n+self.n_records*(self.dtype.itemsize+4))
+            self._f.seek(0,os.SEEK_END)
+        else:
+            self._f = open(fpath,'wb')
+            self._f.write(_journalHeader(self.dtype))
+            self.sync()
+
+    def append(self, record):
+        # record ... structured array of one record (or a numpy void) of the journal dtype
+        data = np.asarray(record,dtype = self.dtype).tobytes()
+        self._f.write(data+zlib.crc32(data).to_bytes(4,'little'))
+        self._f.flush()
+        if self.fsync == 'trial':
+            os.fsync(self._f.fileno())
+        self.n_records+=1
+
+    def sync(self):
+        # force the journal to disk
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        if self._f.closed == False:
+            self.sync()
+            self._f.close()
+
+
+# Checkpoint manifest. A small json file rewritten after every trial with what is needed to resume the session exactly (next trial index, rng state, number of journal records and block position)
+def writeCheckpoint(fpath, checkpoint, fsync = True):
+    # Writes the manifest atomically: to a temporary file first, then renamed over the old manifest, so the manifest on disk is always complete
+    # fsync ... if True, the manifest is forced to disk before the rename. If False (journal_fsync 'block' or 'off') the manifest can reach the disk before the journal records it counts, so a reader must check journalRecords against the valid records of the journal (pyrtp.task.runSession falls back to the journal)
+    with open(fpath+'.tmp','w') as f:
+        json.dump(checkpoint,f)
+        if fsync == True:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(fpath+'.tmp',fpath)
+
+
+def readCheckpoint(fpath):
+    # Returns the manifest as a dictionary, or None if there is no (readable) manifest
+    if os.path.exists(fpath) == False:
+        return None
+    try:
+        with open(fpath,'r') as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+# Session tables. The trial table of a session is written as data.csv and/or as a columnar file (data.parquet or data.feather) with an explicit schema: trial (int32) followed by the trial table's columns with their dtypes, categorical fields as dictionary columns (int8 codes into their string categories). Columnar files load as typed columns without parsing text. pyarrow is only imported when a columnar file is read or written
+SESSION_TABLE_FILES = {'parquet':'data.parquet','feather':'data.feather','csv':'data.csv'}
+SESSION_SCHEMA_VERSION = 1
+
+
+def sessionSchema(dtype, categories):
+    # Returns the arrow schema of a session table
+    # dtype ... structured dtype of one trial record (see pyrtp.trials.TrialTable.recordDtype)
+    # categories ... categories of the categorical fields (see pyrtp.trials.trialCategories)
+    import pyarrow as pa
+    fields = []
+    for name in dtype.names:
+        if name in categories:
+            fields.append(pa.field(name,pa.dictionary(pa.int8(),pa.string())))
+        else:
+            fields.append(pa.field(name,pa.from_numpy_dtype(dtype[name]),nullable = name != 'trial'))
+    return pa.schema(fields,metadata = {'pyrtp_schema':str(SESSION_SCHEMA_VERSION),'categories':json.dumps(categories)})
+
+
+def writeSessionTable(task_df, fpath, schema = None, require = True):
+    # Writes a session DataFrame (index 'trial', see pyrtp.trials.TrialTable.toDataFrame). The format is set by the file extension (.csv, .parquet or .feather); columnar files are written with schema (see sessionSchema) to a temporary file first and then renamed
+    # schema ... arrow schema of columnar files, or a function that returns it (e.g. TrialTable.schema, called once pyarrow has been imported)
+    # require ... if False, a columnar file is skipped with a warning when pyarrow is not installed (the end of a session should not fail on an optional format)
+
+    # Returns
+    # written ... False if the file was skipped, True otherwise
+    fmt = os.path.splitext(fpath)[1][1:]
+    if fmt == 'csv':
+        task_df.to_csv(path_or_buf = fpath)
+        return True
+    if fmt not in ['parquet','feather']:
+        raise ValueError('{} is not a csv, parquet or feather file'.format(fpath))
+    if schema is None:
+        raise ValueError('a schema is required to write {}'.format(fpath))
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        if require == True:
+            raise
+        import warnings
+        warnings.warn('pyarrow is not installed, {} was not written'.format(fpath))
+        return False
+    if callable(schema):
+        schema = schema()
+    table = pa.Table.from_pandas(task_df.reset_index(),schema = schema,preserve_index = False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),**schema.metadata})
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table,fpath+'.tmp')
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table,fpath+'.tmp')
+    os.replace(fpath+'.tmp',fpath)
+    return True
+
+
+def readSessionTable(fpath, columns = None):
+    # Returns the session DataFrame (index 'trial') in a .csv, .parquet or .feather file. Categorical fields of columnar files are pandas categoricals
+    # columns ... if given, only these columns are read (columnar files only read their bytes)
+    import pandas as pd
+    fmt = os.path.splitext(fpath)[1][1:]
+    if fmt == 'csv':
+        task_df = pd.read_csv(fpath,index_col = 'trial')
+        return task_df if columns is None else task_df[list(columns)]
+    if fmt not in ['parquet','feather']:
+        raise ValueError('{} is not a csv, parquet or feather file'.format(fpath))
+
+    cols = None if columns is None else ['trial']+[c for c in columns if c != 'trial']
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(fpath,columns = cols)
+    else:
+        import pyarrow.feather as feather
+        table = feather.read_table(fpath,columns = cols)
+    version = (table.schema.metadata or {}).get(b'pyrtp_schema')
+    if version != str(SESSION_SCHEMA_VERSION).encode():
+        raise ValueError('{} has session schema {} (expected {})'.format(fpath,version,SESSION_SCHEMA_VERSION))
+    task_df = table.to_pandas().set_index('trial')
+
+    # parquet rebuilds dictionaries from the stored values (unused categories dropped, in order of appearance), so categoricals are recoded onto the categories of the schema
+    for field,cats in json.loads(table.schema.metadata[b'categories']).items():
+        if field in task_df.columns:
+            task_df[field] = task_df[field].astype(pd.CategoricalDtype(cats))
+    return task_df
+
+
+def findSessionTable(sessDir):
+    # Returns the path of the session table in sessDir, preferring columnar files (data.parquet, data.feather, data.csv), or None if there is none
+    for fname in SESSION_TABLE_FILES.values():
+        if os.path.exists(os.path.join(sessDir,fname)):
+            return os.path.join(sessDir,fname)
+    return None
+
+
+# Stimulus traces. Every cloud played in a session (the first cloud of each trial and every changePitch step after it) as the rows of one int8 matrix (step x tone) in a raw file, memory-mapped and grown ahead in chunks. The first row, number of steps and number of tones of every trial are records of a trial journal next to it (<fpath>.index, see TrialJournal), so a torn write loses at most the last trial
+TRACE_INDEX_DTYPE = np.dtype([('trial','<i4'),('start','<i8'),('n_steps','<i4'),('num_tones','<i2')])
+
+
+class TraceWriter:
+    # Appends the played steps of each trial to a trace file. A trial costs one copy of its steps into the memory map and one index record (no allocation per step); the file grows by doubling (at least chunk_steps rows) and is cut back to the written rows on close
+    # fsync, n_records ... as for the index journal (see TrialJournal). With fsync = 'trial' the map is flushed before each index record is written, so an index record never points at rows that are not on disk
+
+    def __init__(self, fpath, num_tones, chunk_steps = 65536, fsync = 'trial', n_records = None):
+        self.fpath = fpath
+        self.num_tones = num_tones
+        self.chunk_steps = chunk_steps
+        self.index = TrialJournal(fpath+'.index',TRACE_INDEX_DTYPE,fsync = fsync,n_records = n_records)
+        self.n_rows = 0
+        if self.index.n_records > 0:
+            last = readJournal(fpath+'.index',tail = 1)
+            if last['num_tones'][-1] != num_tones:
+                raise ValueError('{} holds traces of {} tones (expected {})'.format(fpath,last['num_tones'][-1],num_tones))
+            self.n_rows = int(last['start'][-1]+last['n_steps'][-1])
+        self._f = open(fpath,'r+b' if os.path.exists(fpath) else 'w+b')
+        self._mm = None
+        self._map(self.n_rows+chunk_steps)
+
+    def _map(self, capacity):
+        # (re)maps the file with room for capacity rows
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm = None
+        self._f.truncate(capacity*self.num_tones)
+        self._mm = np.memmap(self._f,dtype = 'i1',mode = 'r+',shape = (capacity,self.num_tones))
+        self.capacity = capacity
+
+    def write(self, trial, steps):
+        # steps ... clouds played in the trial (n_steps x num_tones)
+        n = len(steps)
+        if self.n_rows+n > self.capacity:
+            self._map(max(2*self.capacity,self.n_rows+n+self.chunk_steps))
+        self._mm[self.n_rows:self.n_rows+n] = steps
+        if self.index.fsync == 'trial':
+            self._mm.flush()
+        self.index.append(np.array([(trial,self.n_rows,n,self.num_tones)],dtype = TRACE_INDEX_DTYPE))
+        self.n_rows+=n
+
+    def sync(self):
+        # force the traces and the index to disk
+        self._mm.flush()
+        self.index.sync()
+
+    def close(self):
+        if self._f.closed == False:
+            self._mm.flush()
+            self._mm = None
+            self._f.truncate(self.n_rows*self.num_tones)
+            self._f.close()
+            self.index.close()
+
+
+def readTraces(fpath):
+    # Returns (traces, index)
+    # traces ... read-only memory map of the trace file (rows x num_tones)
+    # index ... index records sorted by trial, one per trial (a trial written more than once, e.g. re-run after resuming a session, keeps its last record). Steps of trial index['trial'][i] are traces[index['start'][i]:index['start'][i]+index['n_steps'][i]]
+    index = readJournal(fpath+'.index')
+    if len(index) == 0:
+        return np.zeros((0,0),dtype = 'i1'),index
+    n_rows = int((index['start']+index['n_steps']).max())
+    traces = np.memmap(fpath,dtype = 'i1',mode = 'r',shape = (n_rows,int(index['num_tones'][0])))
+    index = index[np.argsort(index['trial'],kind = 'stable')]
+    last = np.concatenate([index['trial'][1:] != index['trial'][:-1],[True]])
+    return traces,index[last]
+
+
+def trialTrace(traces, index, t):
+    # steps played in trial t (n_steps x num_tones view into traces, see readTraces)
+    i = np.searchsorted(index['trial'],t)
+    if (i == len(index)) or (index['trial'][i] != t):
+        raise KeyError('no trace of trial {}'.format(t))
+    return traces[index['start'][i]:index['start'][i]+index['n_steps'][i]]
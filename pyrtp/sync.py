@@ -0,0 +1,168 @@
+# pyrtp.sync. Sync pulses for the random tone pitch task. Pulses are queued to a worker thread (SyncDispatcher), so the USB round trips to the LabJack and the pulse width never block the main thread. Every pulse is recorded with the time it was scheduled and the times the device acknowledged its onset and offset.
+
+# Sync devices (all share pulseOn(), pulseOff(), close() and a describe() message):
+#   U3Sync ... LabJack U3, digital (FI02) or analog (DAC0) output. labjack is only imported when this device is opened
+#   FakeU3 ... in-process stand-in that records every state change, so the task runs without hardware (with latency_s = 0 it is the null device of simulated sessions)
+
+import queue
+import threading
+import time
+
+
+class U3Sync:
+    # Sync pulses from a LabJack U3 (https://github.com/labjack/LabJackPython)
+
+    def __init__(self, digital = True, volt = 1.5):
+        # digital ... if True, pulses are sent from the FI02 channel, otherwise from the DAC0 channel
+        # volt ... pulse amplitude in volts (only matters for analog out)
+        from labjack import u3
+        self._u3 = u3
+        self.digital = digital
+        self.dev = u3.U3()
+        self.dev.getCalibrationData()
+
+        if digital == True:
+            # set FI02 direcection to output
+            self.dev.getFeedback(u3.BitDirWrite(2,1))
+            self.pulse_val = None
+            self.zero_val = None
+        else:
+            self.pulse_val = self.dev.voltageToDACBits(volt, dacNumber = 0, is16Bits = False)
+            self.zero_val = self.dev.voltageToDACBits(0, dacNumber = 0, is16Bits = False)
+
+    def pulseOn(self):
+        if self.digital == True:
+            # Empirically this order seems to lead to a nice positive deflection
+            self.dev.getFeedback(self._u3.BitStateWrite(2,0))# FI02 to output low
+        else:
+            self.dev.getFeedback(self._u3.DAC0_8(self.pulse_val))
+
+    def pulseOff(self):
+        if self.digital == True:
+            self.dev.getFeedback(self._u3.BitStateWrite(2,1))# FI02 to output high
+        else:
+            self.dev.getFeedback(self._u3.DAC0_8(self.zero_val))
+
+    def describe(self):
+        if self.digital == True:
+            return 'Sync pulses are sent from the FI02 channel. Connect cathode (red wire) to FI02 and annode (black wire) to ground.'
+        return 'Sync pulses are sent from the DAC0 channel. Connect cathode (red wire) to DAC0 and annode (black wire) to ground.'
+
+    def close(self):
+        self.dev.close()
+
+
+class FakeU3:
+    # Stand-in for U3Sync with no hardware. Each pulseOn/pulseOff takes latency_s (emulating the USB round trip of getFeedback) and appends (time, 'on'/'off') to self.log
+
+    def __init__(self, digital = True, volt = 1.5, latency_s = 0.001, clock = time.perf_counter):
+        self.digital = digital
+        self.pulse_val = None
+        self.zero_val = None
+        self.latency_s = latency_s
+        self.clock = clock
+        self.log = []
+
+    def pulseOn(self):
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+        self.log.append((self.clock(),'on'))
+
+    def pulseOff(self):
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+        self.log.append((self.clock(),'off'))
+
+    def describe(self):
+        return 'Sync pulses are sent to a fake U3 (no hardware).'
+
+    def close(self):
+        pass
+
+
+def openSyncDevice(params):
+    # Opens the sync device selected by params['SYNC_device'] ('u3', 'fake' or 'null')
+    if params['SYNC_device'] == 'fake':
+        return FakeU3(digital = params['SYNC_useDigitalOut'],volt = params['SYNC_volt'])
+    if params['SYNC_device'] == 'null':
+        return FakeU3(digital = params['SYNC_useDigitalOut'],volt = params['SYNC_volt'],latency_s = 0)
+    return U3Sync(digital = params['SYNC_useDigitalOut'],volt = params['SYNC_volt'])
+
+
+class SyncDispatcher:
+    # Sends sync pulses from a worker thread. send() only puts the pulse on a queue and returns. The worker raises the line, holds it for width_s, lowers it, and waits at least gap_s before the next pulse, so pulses of consecutive trials stay separate.
+
+    # Each pulse is a record (dictionary) in self.pulses:
+    # label ... label passed to send()
+    # scheduled_s ... time send() was called
+    # on_s, off_s ... time the device acknowledged the onset / offset (pulseOn / pulseOff returned)
+    # error ... error message if the device call failed (None otherwise)
+
+    def __init__(self, device, width_s = 0.1, gap_s = 0.5, clock = time.perf_counter, threaded = True):
+        # device ... sync device (U3Sync or FakeU3)
+        # clock ... function returning the current time (pass core.monotonicClock.getTime to share the task clock)
+        # threaded ... if False, send() sends the pulse itself (no worker). Used for the null device of simulated sessions, where pulses take no time and ack times must not depend on thread scheduling
+        self.device = device
+        self.width_s = width_s
+        self.gap_s = gap_s
+        self.clock = clock
+        self.threaded = threaded
+        self.pulses = []
+        self._last_off = None
+        self._queue = queue.Queue()
+        self._thread = None
+        if threaded == True:
+            self._thread = threading.Thread(target = self._run,daemon = True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            pulse = self._queue.get()
+            if pulse is None:
+                self._queue.task_done()
+                return
+            self._pulse(pulse)
+            self._queue.task_done()
+
+    def _pulse(self, pulse):
+        target,field = pulse.pop('_target')
+
+        # keep pulses apart
+        if (self._last_off is not None) & (self.gap_s > 0):
+            time.sleep(max(0,self.gap_s-(time.perf_counter()-self._last_off)))
+
+        try:
+            self.device.pulseOn()
+            pulse['on_s'] = self.clock()
+            if self.width_s > 0:
+                time.sleep(self.width_s)
+            self.device.pulseOff()
+            pulse['off_s'] = self.clock()
+        except Exception as e:
+            pulse['error'] = repr(e)
+        self._last_off = time.perf_counter()
+
+        if target is not None:
+            target[field] = pulse['on_s']
+
+    def send(self, label = None, target = None, field = None):
+        # Queues a pulse and returns its scheduled time
+        # target, field ... optional dictionary (e.g. a trialDict) that receives the acknowledged onset time under field once the pulse was sent
+        pulse = {'label':label,'scheduled_s':self.clock(),'on_s':float('nan'),'off_s':float('nan'),'error':None,'_target':(target,field)}
+        self.pulses.append(pulse)
+        if self.threaded == True:
+            self._queue.put(pulse)
+        else:
+            self._pulse(pulse)
+        return pulse['scheduled_s']
+
+    def flush(self):
+        # Block until every queued pulse has been sent
+        self._queue.join()
+
+    def close(self):
+        # Sends the pulses still queued, stops the worker and closes the device
+        if self.threaded == True:
+            self._queue.put(None)
+            self._thread.join()
+        self.device.close()
@@ -0,0 +1,203 @@
+# pyrtp.synth. Sound cloud synthesis for the random tone pitch task. Mixes all the tones of a sound cloud into a single buffer so that each time step is played with one call to the audio driver, no matter how many tones are in the cloud.
+
+import numpy as np
+from collections import OrderedDict
+
+
+# index (-1 to 1) to frequency
+def ind2freq(x,baseNote = 440):
+    # Generate frequencies of the equal tempered scale based on an index value that corresponds to half notes. 12 half notes is an octave
+
+    #https://pages.mtu.edu/~suits/NoteFreqCalcs.html
+
+    # newNote = baseNote * (a)^x
+
+    #baseNote is the reference note
+    #x is the number of halfsteps away from the reference note. Negative notes are lower frequencies and positive ns are higher frequencies
+    #a is a constant. a = 2**(1/12) ~ 1.05...
+
+    # Inputs
+    #baseNote is the reference note (baseNote = 440 is A note, octave 4)
+
+    # input:
+    #x .. number of half notes from the base note (integer, including negative values). Can also be an array of indices
+
+    # Returns:
+    # y ... freq value associated with index
+    a = 2**(1/12)
+    y = baseNote * a**np.asarray(x,dtype='float')
+
+    return y
+
+
+def hammingWindow(n_samples, sampleRate = 44100, ramp_s = 0.005):
+    # Returns an amplitude envelope of length n_samples that ramps up and down with the rising and falling halves of a Hamming window (ramp_s long each). The middle of the envelope is flat at 1. Applying it to each cloud avoids clicks at the tone onset and offset
+
+    # Inputs
+    # n_samples ... length of the envelope in samples
+    # sampleRate ... samples per second
+    # ramp_s ... duration of the onset (and offset) ramp in seconds. Capped at half the length of the envelope
+
+    # Returns
+    # win ... float32 array (n_samples,)
+    n_ramp = int(min(np.round(ramp_s*sampleRate), n_samples//2))
+
+    win = np.ones(n_samples,dtype='float32')
+    if n_ramp > 0:
+        ham = np.hamming(2*n_ramp).astype('float32')
+        win[:n_ramp] = ham[:n_ramp]
+        win[n_samples-n_ramp:] = ham[n_ramp:]
+
+    return win
+
+
+def synthCloud(arr, dur = 0.05, baseNote = 440, sampleRate = 44100, hamming = True, ramp_s = 0.005, bank = None, out = None):
+    # Synthesizes a sound cloud into a single mono buffer. Each element of arr is a sine tone; all tones are computed at once (tones x samples) and summed, then the Hamming envelope is applied to the mix.
+
+    # Inputs
+    # arr ... array of freq indices (half steps from baseNote) to play simultaneously. There is no limit on the number of tones
+    # dur ... duration of the cloud in seconds
+    # baseNote ... reference note (Hz)
+    # sampleRate ... samples per second
+    # hamming ... if True, applies onset/offset ramps (see hammingWindow)
+    # ramp_s ... duration of the onset/offset ramp in seconds
+    # bank ... optional ToneBank. If given, the cloud is mixed from cached tone rows instead of being synthesized
+    # out ... optional float32 array (n_samples,) to write the mix into (only used with a bank)
+
+    # Returns
+    # buf ... float32 array (n_samples,) with values in [-1, 1]. The mix is scaled by 1/num_tones so that it never clips: each tone has amplitude 1/num_tones and a cloud of identical tones peaks at 1. The original task played every tone as its own full scale sound (volume = 1), so the driver's sum of a cloud could reach num_tones and clipped; clouds are now num_tones times quieter per tone than that, and the loudness of a cloud no longer grows with num_tones
+    if bank is not None:
+        return bank.mixCloud(arr,dur=dur,baseNote=baseNote,sampleRate=sampleRate,hamming=hamming,ramp_s=ramp_s,out=out)
+
+    arr = np.atleast_1d(arr)
+    n_samples = int(np.round(dur*sampleRate))
+
+    # phase of every tone at every sample (tones x samples)
+    t = np.arange(n_samples)/sampleRate
+    phase = np.outer(2*np.pi*ind2freq(arr,baseNote=baseNote),t)
+
+    # sum across tones and normalize so that the mix stays in range
+    buf = np.sin(phase).sum(axis=0).astype('float32')
+    if len(arr) > 0:
+        buf /= len(arr)
+
+    # apply onset/offset ramps
+    if hamming == True:
+        buf *= hammingWindow(n_samples,sampleRate=sampleRate,ramp_s=ramp_s)
+
+    return buf
+
+
+def synthStream(traj, dur = 0.05, baseNote = 440, sampleRate = 44100, hamming = True, ramp_s = 0.005, bank = None):
+    # Renders a whole trajectory of sound clouds into one continuous buffer. Each row of traj is one time step; steps are written back to back into a preallocated buffer, so playing the buffer reproduces the step sequence without gaps between clouds.
+
+    # Inputs
+    # traj ... array (n_steps x num_tones) of freq indices, one sound cloud per row
+    # dur ... duration of each step in seconds
+    # (remaining inputs as in synthCloud). With a bank, each step is mixed straight into the stream buffer
+
+    # Returns
+    # buf ... float32 array (n_steps*samples_per_step,)
+    # samples_per_step ... number of samples in each step. Step k occupies buf[k*samples_per_step:(k+1)*samples_per_step]
+    traj = np.atleast_2d(traj)
+    samples_per_step = int(np.round(dur*sampleRate))
+
+    buf = np.empty(traj.shape[0]*samples_per_step,dtype='float32')
+    for k in np.arange(0,traj.shape[0]):
+        if bank is not None:
+            bank.mixCloud(traj[k],dur=dur,baseNote=baseNote,sampleRate=sampleRate,hamming=hamming,ramp_s=ramp_s,out=buf[k*samples_per_step:(k+1)*samples_per_step])
+        else:
+            buf[k*samples_per_step:(k+1)*samples_per_step] = synthCloud(traj[k],dur=dur,baseNote=baseNote,sampleRate=sampleRate,hamming=hamming,ramp_s=ramp_s)
+
+    return buf,samples_per_step
+
+
+class ToneBank:
+    # Cache of windowed single-tone wavetables. For each synthesis setting (baseNote, dur, sampleRate, window) the bank holds one table: a contiguous range of half-step indices, one sine tone of one step duration per row with the onset/offset ramps already applied. A sound cloud is mixed by gathering its rows with one fancy index and summing them along the tone axis, instead of synthesizing sines on every step. Memory is bounded by max_bytes; the least recently used tables are evicted first.
+
+    def __init__(self, max_bytes = 16*2**20):
+        # max_bytes ... upper bound on the memory held by cached tables
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0 # tones found in the cache
+        self.misses = 0 # rows synthesized
+        self.evictions = 0 # tables evicted
+        self._tables = OrderedDict()
+
+    def __len__(self):
+        # number of cached rows
+        return sum([len(table) for low,table in self._tables.values()])
+
+    def getTable(self, arr, dur = 0.05, baseNote = 440, sampleRate = 44100, hamming = True, ramp_s = 0.005):
+        # Returns (low, table) for the setting, where table[x-low] is the (read only) wavetable row of half-step index x. The table is extended (missing rows synthesized in one vectorized call) if it does not cover every index in arr
+        window = ('hamming',ramp_s) if hamming == True else None
+        key = (baseNote,dur,sampleRate,window)
+        arr = np.atleast_1d(arr)
+
+        entry = self._tables.get(key)
+        lo,hi = int(arr.min()),int(arr.max())
+        if (entry is not None) and (entry[0] <= lo) and (entry[0]+len(entry[1]) > hi):
+            self.hits+=len(arr)
+            self._tables.move_to_end(key)
+            return entry
+
+        # synthesize the missing rows and extend the table to cover lo ... hi
+        n_samples = int(np.round(dur*sampleRate))
+        if entry is not None:
+            lo,hi = min(lo,entry[0]),max(hi,entry[0]+len(entry[1])-1)
+        table = np.empty((hi-lo+1,n_samples),dtype='float32')
+        missing = np.ones(hi-lo+1,dtype=bool)
+        if entry is not None:
+            table[entry[0]-lo:entry[0]-lo+len(entry[1])] = entry[1]
+            missing[entry[0]-lo:entry[0]-lo+len(entry[1])] = False
+            self.nbytes -= entry[1].nbytes
+        x = np.nonzero(missing)[0]+lo
+        t = np.arange(n_samples)/sampleRate
+        table[x-lo] = np.sin(2*np.pi*np.outer(ind2freq(x,baseNote=baseNote),t))
+        if hamming == True:
+            table[x-lo] *= hammingWindow(n_samples,sampleRate=sampleRate,ramp_s=ramp_s)
+        table.flags.writeable = False
+        self.misses+=len(x)
+        self.hits+=int(len(arr)-np.isin(arr,x).sum())
+
+        # store it and evict the least recently used tables if we are over budget
+        self._tables[key] = (lo,table)
+        self._tables.move_to_end(key)
+        self.nbytes += table.nbytes
+        while (self.nbytes > self.max_bytes) & (len(self._tables) > 1):
+            old_key,(old_lo,old_table) = self._tables.popitem(last = False)
+            self.nbytes -= old_table.nbytes
+            self.evictions+=1
+
+        return lo,table
+
+    def getRow(self, x, dur = 0.05, baseNote = 440, sampleRate = 44100, hamming = True, ramp_s = 0.005):
+        # Returns the (read only) wavetable row for half-step index x, synthesizing and caching it on a miss
+        lo,table = self.getTable(x,dur=dur,baseNote=baseNote,sampleRate=sampleRate,hamming=hamming,ramp_s=ramp_s)
+        return table[int(x)-lo]
+
+    def prebuild(self, indices, dur = 0.05, baseNote = 440, sampleRate = 44100, hamming = True, ramp_s = 0.005):
+        # Builds the rows for all indices up front (e.g. np.arange(toneRange_low,toneRange_high+1)) so that no synthesis happens during a trial
+        self.getTable(indices,dur=dur,baseNote=baseNote,sampleRate=sampleRate,hamming=hamming,ramp_s=ramp_s)
+
+    def mixCloud(self, arr, dur = 0.05, baseNote = 440, sampleRate = 44100, hamming = True, ramp_s = 0.005, out = None):
+        # Mixes a sound cloud from cached rows: gathers the rows of all tones with one fancy index and sums them along the tone axis. Same output as synthCloud (mix scaled by 1/num_tones)
+
+        # Inputs
+        # arr ... array of freq indices to play simultaneously
+        # out ... optional float32 array (n_samples,) to write the mix into. A new array is allocated if None
+
+        # Returns
+        # out ... float32 array (n_samples,)
+        arr = np.atleast_1d(arr)
+        if out is None:
+            out = np.empty(int(np.round(dur*sampleRate)),dtype='float32')
+        if len(arr) == 0:
+            out[:] = 0
+            return out
+
+        lo,table = self.getTable(arr,dur=dur,baseNote=baseNote,sampleRate=sampleRate,hamming=hamming,ramp_s=ramp_s)
+        np.sum(table[arr-lo],axis=0,out=out)
+        out *= 1/len(arr)
+
+        return out
@@ -0,0 +1,791 @@
+#pyRTP. Random Tone Pitch Task as described
+#Mulder, M. J., Keuken, M. C., van Maanen, L., Boekel, W., Forstmann, B. U., & Wagenmakers, E. J. (2013). The speed and accuracy of perceptual decisions in a random-tone pitch task. Attention, Perception, & Psychophysics, 75(5), 1048-1058.
+
+#written by Ashwin Ramayya (ashwinramayya@gmail.com)
+# Random Tone. Run a session with main() ($ python pyRTP.py). psychopy, psychtoolbox, labjack (pyrtp.sync) and pandas are imported when a session starts (importPsychopy, initializeLabjack, main), so the task functions can be imported without starting a session or opening an audio device.
+import numpy as np
+import os
+import time
+
+# sound cloud synthesis
+from pyrtp.synth import synthCloud,synthStream,ToneBank
+
+# pitch trajectories
+from pyrtp.stimulus import makeTrajectory
+
+# default task configuration and trial list
+from pyrtp.params import getParams
+from pyrtp.trials import TrialTable,generateTrialList,emptyStepLog,openStepLog,appendStepLog
+
+# callback audio output
+from pyrtp.audio import RingBuffer,CloudProducer,CallbackOutput,NullOutput,CueBank
+
+# pickle functions, the trial journal, the checkpoint manifest, session tables and stimulus traces
+from pyrtp.storage import save_pickle,load_pickle,TrialJournal,readJournal,writeCheckpoint,readCheckpoint,writeSessionTable,SESSION_TABLE_FILES,TraceWriter
+
+# background response listener
+from pyrtp.response import ResponseListener
+
+# typed session config
+from pyrtp.config import SessionConfig
+
+# sync pulse devices and dispatcher
+from pyrtp.sync import openSyncDevice,SyncDispatcher
+
+# psychopy modules (imported by importPsychopy)
+core = None
+sound = None
+visual = None
+keyboard = None
+
+# session objects (created by main)
+toneBank = None
+cueBank = None
+audioRing = None
+audioOut = None
+syncOut = None
+traceOut = None
+
+# folder holding the cue sounds (orient.wav, correct.wav, wrong.wav)
+cueDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importPsychopy():
+    # import psychopy with the psychtoolbox audio driver (monotonicClock starts when we import this). Returns the time it took in seconds
+    global core,sound,visual,keyboard
+    t0 = time.perf_counter()
+
+    import psychtoolbox as ptb
+
+    # import sound
+    import psychopy
+    psychopy.prefs.hardware['audioLib'] = ['PTB']
+    from psychopy import visual,core,sound
+
+    # import keyboard
+    import psychopy.hardware.keyboard as keyboard
+
+    return time.perf_counter()-t0
+
+
+### Define functions
+def mkDirs(params, subj = None, sess = None, saveDir = None, prompt = True):
+    # Makes the save, subject and session directories and sets params['subj'], params['sess'], params['subjDir'] and params['sessDir']
+    # subj, sess ... subject and session ids. If None (and prompt is True) they are asked for at the prompt. An empty subject id keeps a unique id based on the time, an empty session id picks the next session number
+    # saveDir ... folder that holds the subject folders (default: ./data)
+    # prompt ... if False, never prompts (for scripted and batch runs)
+
+    #  Save directory
+    params['saveDir'] = os.getcwd()+'/data' if saveDir is None else saveDir
+    # make the save folder if it doesnt exist
+    os.makedirs(params['saveDir'],exist_ok = True)
+
+    # generate unique subj ID - this will be overwritten by prompt
+    params['subj'] = str(core.getAbsTime())
+
+    # Prompt ask for subj and session ID. This will overwrite default subj ID created during initialization
+    if subj is None:
+        subj = input ("Enter Subject ID :") if prompt == True else ''
+    if sess is None:
+        sess = input ("Enter Session number:") if prompt == True else ''
+    subj = str(subj)
+    sess = str(sess)
+
+    # parse subj id 
+    if len(subj) > 0: 
+        # this means we entered a new subj ID. If empty, it will use the unique code generated at the beginning of the tast.
+        params['subj'] = subj
+
+    # check if we have a subject directory already, if not, create  a subject directory 
+    params['subjDir'] = params['saveDir']+'/'+params['subj']
+    os.makedirs(params['subjDir'],exist_ok = True)
+
+    # parse sess id
+    if len(sess) > 0: 
+        # this means we entered a session ID. If empty, it will create a new session based on the folders already in the subjDir
+        params['sess'] = sess
+    else:
+        # look for folders in the subjDir
+        fold_list = os.listdir(params['subjDir'])
+
+        # find session folders
+        sess_fold_list = [i for i in fold_list if 'session' in i]
+
+        # infer session id based on folders in the subject directory
+        params['sess'] = len(sess_fold_list) # zero indexed
+
+    # sess dir 
+    params['sessDir'] = params['subjDir']+'/session'+str(params['sess'])
+
+    # make session directory
+    os.makedirs(params['sessDir'],exist_ok = True)
+
+    # return updated params
+    return params
+
+# play a sound cloud
+def playSoundCloud(arr, dur = 0.5,baseNote = 440,sampleRate = 44100,bank = None,listener = None):
+    # Simultaneously plays n tones. n is set by the length of the array thats provided as input. The tones are mixed into a single buffer (see pyrtp.synth.synthCloud) and played with one call to the audio driver, so the cost of each time step does not grow with the number of tones
+    #Inputs
+    # arr ... array (of length n integers (positive and negative) selecting tones to play siultaneously. arr = [1] would play a single tone one half step up from the baseNote. arr = -1 woudl play a tone half step lower.
+    # sampleRate ... sample rate of the mixed buffer
+    # bank ... optional ToneBank. If given, the cloud is mixed from cached wavetables instead of being synthesized
+    # listener ... optional ResponseListener. If given, the listener stops the cloud as soon as a response key is pressed and we stop waiting, so the step is cut short
+
+    # mix sound cloud (hamming window is applied to the mix)
+    buf = synthCloud(arr,dur = dur,baseNote = baseNote,sampleRate = sampleRate,hamming = True,bank = bank)
+
+    # create a single sound stimulus from the buffer
+    cloud = sound.Sound(value=buf, secs=dur, sampleRate = sampleRate, volume = 1,hamming = False)
+
+    #get onset time
+    onTime_s = core.monotonicClock.getTime()
+
+    # play sound cloud
+    cloud.play()
+
+    if listener is None:
+        # wait for time step to finish playing
+        core.wait(dur, hogCPUperiod=dur)
+
+        # get off time
+        offTime_s = onTime_s+cloud.stopTime
+    else:
+        # let the listener stop this cloud. If the key was pressed before the cloud started, stop it here
+        if listener.setOnPress(cloud.stop) == True:
+            cloud.stop()
+
+        # wait for the time step to finish playing or for a response
+        if listener.wait(dur) == True:
+            offTime_s = listener.offTime_s if listener.offTime_s > onTime_s else core.monotonicClock.getTime()
+        else:
+            offTime_s = onTime_s+cloud.stopTime
+
+    return onTime_s, offTime_s
+# Sounds from file. Cues are decoded once at session start (see cueBank below), so these only call the driver
+def playOrient(dur = 0.5):
+    # play from buffer
+    onTime_s,offTime_s = cueBank.play('orient')
+    # wait so sound finishes
+    core.wait(dur)
+
+    return onTime_s,offTime_s
+
+
+
+def playCorrect(dur = 0.5):
+    # play from buffer
+    onTime_s,offTime_s = cueBank.play('correct')
+    core.wait(dur)
+
+    return onTime_s,offTime_s
+
+
+def playWrong(dur = 0.5):
+    # play from buffer
+    onTime_s,offTime_s = cueBank.play('wrong')
+    core.wait(dur)
+
+    return onTime_s,offTime_s
+
+
+def pressTime(key):
+    # Time of a key press on core.monotonicClock (the clock of stimOn_s and offTime_s). The keyboard timestamps each press when it happens (tDown, absolute time), so this does not depend on when the keyboard clock was reset or on when the press was polled
+    return key.tDown-core.monotonicClock.getLastResetTime()
+
+
+# Pre-render and stream a trial
+def streamTrial(trialDict, params, kb, traj, stepLog):
+    # Pre-renders the pitch trajectory for the full response window of the block (responseTimeLimit_s) into one continuous buffer before stimulus onset, then plays it as a single stream. A ResponseListener thread polls the keyboard while the stream plays and stops the stream as soon as a response key is pressed, so the step period is set by the audio clock rather than by python overhead.
+
+    # inputs:
+    # trialDict ... trial dictionary (stimOn_s, stimCutoff_s and stimCutoff_step are filled in here)
+    # kb ... keyboard object (already started). Its clock is reset at stimulus onset, so key press rt is relative to the start of the stream and not to the start of rendering
+    # traj ... pitch trajectory (n_steps x num_tones) covering the response window (see pyrtp.stimulus.makeTrajectory)
+    # stepLog ... preallocated step log of the trial. Step onsets are not measured here (steps follow each other in one buffer), so onset_s is left as nan
+
+    # output:
+    # keys_pressed ... keys returned by kb.getKeys (empty if we timed out)
+    # offTime_s ... time at which the stream stopped
+
+    # number of steps that fill the response window
+    n_steps = traj.shape[0]
+
+    # render the stream
+    buf,samples_per_step = synthStream(traj,dur = params['dur_tonestep'],baseNote = params['baseNote'],sampleRate = params['audio_sampleRate'],hamming = True,bank = toneBank)
+    stream = sound.Sound(value=buf, sampleRate = params['audio_sampleRate'], volume = 1,hamming = False)
+    dur_stream = n_steps*params['dur_tonestep']
+
+    # listen for a response (the listener stops the stream at the key press)
+    listener = ResponseListener(kb,params['buttonList_any'],onPress = stream.stop,clock = core.monotonicClock.getTime,poll_s = params['dur_pollResponse'])
+    listener.start()
+
+    # STIM ON: the RT clock starts with the stream, after it has been rendered
+    trialDict['stimOn_s'] = core.monotonicClock.getTime()
+    kb.clock.reset()
+    stream.play()
+
+    # wait for a response until the stream has finished playing
+    listener.wait(dur_stream)
+    listener.stop()
+    listener.join()
+    keys_pressed = listener.keys
+
+    # STIM OFF: cut the stream off if we timed out (no effect if it already finished)
+    if len(keys_pressed) > 0:
+        offTime_s = listener.offTime_s
+    else:
+        stream.stop()
+        offTime_s = min(core.monotonicClock.getTime(),trialDict['stimOn_s']+dur_stream)
+
+    # log where the stream was cut off (time and step index within the trajectory)
+    trialDict['stimCutoff_s'] = offTime_s
+    trialDict['stimCutoff_step'] = min(int((offTime_s-trialDict['stimOn_s'])/params['dur_tonestep']),n_steps-1)
+    trialDict['stimSteps'] = trialDict['stimCutoff_step']+1
+
+    return keys_pressed,offTime_s
+
+
+# Stream a trial through the ring buffer
+def ringTrial(trialDict, params, kb, traj, stepLog):
+    # Plays the trajectory through the callback audio output (params['audio_output'] is 'callback' or 'null'). A producer thread mixes steps into a ring buffer a few steps ahead of the audio callback, and a ResponseListener thread stops the output at the first key press, so the main thread only waits. Underruns (steps the producer did not deliver in time) are logged in stimUnderruns.
+
+    # inputs:
+    # trialDict ... trial dictionary (stimOn_s, stimCutoff_s, stimCutoff_step and stimUnderruns are filled in here)
+    # kb ... keyboard object (already started)
+    # traj ... pitch trajectory (n_steps x num_tones) covering the response window
+    # stepLog ... preallocated step log of the trial. The audio output writes each step's onset into it as the step starts playing
+
+    # output:
+    # keys_pressed ... keys returned by kb.getKeys (empty if we timed out)
+    # offTime_s ... time at which the output stopped
+    n_steps = traj.shape[0]
+
+    # start the producer and let it fill the ring before stimulus onset
+    audioRing.reset(onset_log = stepLog['onset_s'])
+    producer = CloudProducer(audioRing,traj,toneBank,dur = params['dur_tonestep'],baseNote = params['baseNote'],sampleRate = params['audio_sampleRate'])
+    producer.start()
+    producer.waitPrimed(min(params['audio_ringSteps'],n_steps))
+
+    # listen for a response (the listener stops the output at the key press)
+    listener = ResponseListener(kb,params['buttonList_any'],onPress = audioOut.stop,clock = core.monotonicClock.getTime,poll_s = params['dur_pollResponse'])
+
+    # STIM ON
+    audioOut.start(audioRing)
+    listener.start()
+    trialDict['stimOn_s'] = audioOut.onTime_s
+
+    # wait for a response until the output has played the whole trajectory
+    while (listener.wait(params['dur_tonestep']) == False) & (audioOut.isFinished() == False):
+        pass
+    listener.stop()
+    listener.join()
+    keys_pressed = listener.keys
+
+    # STIM OFF (no effect if the listener already stopped the output)
+    audioOut.stop()
+    producer.stop()
+    producer.join()
+    offTime_s = audioOut.offTime_s
+
+    # log where the stream was cut off and how often the producer fell behind
+    trialDict['stimCutoff_s'] = offTime_s
+    trialDict['stimCutoff_step'] = min(audioRing.stepsPlayed(),n_steps-1)
+    trialDict['stimSteps'] = audioRing.stepsStarted()
+    trialDict['stimUnderruns'] = audioRing.underruns
+
+    return keys_pressed,offTime_s
+
+
+# Present a trial to a simulated subject
+def simTrial(trialDict, params, kb, traj, stepLog):
+    # Headless path for simulated sessions (params['audio_output'] is 'sim'). Nothing is played: the trajectory is handed to the agent behind kb (pyrtp.simulate.AgentKeyboard), steps are logged at their scheduled onsets, and core.wait moves the (simulated) clock to the agent's response or to the end of the response window. Stimulus offset is the response time, as if the response listener had stopped the audio instantly.
+
+    # inputs:
+    # trialDict ... trial dictionary (stimOn_s, stimCutoff_s and stimCutoff_step are filled in here)
+    # kb ... AgentKeyboard (already started)
+    # traj ... pitch trajectory (n_steps x num_tones) covering the response window
+    # stepLog ... preallocated step log of the trial
+
+    # output:
+    # keys_pressed ... keys returned by kb.getKeys (empty if we timed out)
+    # offTime_s ... time at which the stimulus stopped
+    n_steps = traj.shape[0]
+    dur_stream = n_steps*params['dur_tonestep']
+
+    # STIM ON: the agent starts listening to the trajectory
+    trialDict['stimOn_s'] = core.monotonicClock.getTime()
+    stepLog['onset_s'] = trialDict['stimOn_s']+stepLog['step']*params['dur_tonestep']
+    press_s = kb.present(traj,dur = params['dur_tonestep'],block = trialDict['block'])
+
+    # wait for the response or the end of the stream
+    core.wait(min(press_s,dur_stream))
+    keys_pressed = kb.getKeys(params['buttonList_any'])
+
+    # STIM OFF
+    offTime_s = core.monotonicClock.getTime()
+    trialDict['stimCutoff_s'] = offTime_s
+    trialDict['stimCutoff_step'] = min(int((offTime_s-trialDict['stimOn_s'])/params['dur_tonestep']),n_steps-1)
+    trialDict['stimSteps'] = trialDict['stimCutoff_step']+1
+
+    return keys_pressed,offTime_s
+
+
+# Run a Trial
+def runTrial(trialDict, params, rng = None, trial = 0):
+    # inputs:
+    #t_direction ... trial direction ('increase' or 'decrease'
+    #coherence ... ranging from 0.5 to 1
+    #rng ... np.random.Generator used to draw the pitch trajectory if the trial has no trialSeed (older trial tables)
+    #trial ... index of the trial in the session (written to the step log)
+
+    # output:
+    # return updated trialDict
+
+    # parse inputs
+    direction = trialDict['direction']
+    coherence = trialDict['coherence']
+
+    if params['options_playOrientOnEachTrial'] == True:
+        
+        #play orient sound
+        trialDict['orientOn_s'],trialDict['orientOff_s'] = playOrient(dur = params['dur_orient'])
+
+
+    # clear container for keys
+    keys_pressed = []
+
+    # generate the pitch trajectory for the whole response window in one call. First row is a random sound cloud, each following row is one changePitch step
+    # Each trial draws from its own generator seeded by trialSeed, so any trajectory can be regenerated later (see pyrtp.trials.trialTrajectories). Trials without a seed (trialSeed missing or 0, older sessions) draw from the session rng
+    if ('trialSeed' in trialDict) and (trialDict['trialSeed'] != 0):
+        rng = np.random.default_rng(trialDict['trialSeed'])
+    n_steps = int(np.ceil(params['responseTimeLimit_s'][trialDict['block']]/params['dur_tonestep']))
+    traj = makeTrajectory(n_steps,params['num_tones'],direction = direction,coherence = coherence,change_range = params['change_range'],toneRange = (params['toneRange_low'],params['toneRange_high']),change_tones_together = params['change_tones_together'],rng = rng)
+
+    # preallocate the step log (onsets are filled in during the trial)
+    stepLog = emptyStepLog(traj,trial = trial)
+    onset_log = stepLog['onset_s']
+
+    # initialize keyboard buffer. The trajectory and step log are ready, so the RT timer does not include their setup
+    kb = keyboard.Keyboard(device = -1,waitForStart=True)# start clock
+    kb.clock.reset()  # when you want to start RT timer from
+    kb.clearEvents()
+    kb.start() # start polling keyboard
+
+    if params['audio_output'] == 'sim':
+        # simulated subject: no audio, the agent behind kb responds to the trajectory (see pyrtp.simulate)
+        keys_pressed,offTime_s = simTrial(trialDict,params,kb,traj,stepLog)
+    elif params['audio_output'] in ['callback','null']:
+        # stream the trajectory through the ring buffer until a response key is pressed
+        keys_pressed,offTime_s = ringTrial(trialDict,params,kb,traj,stepLog)
+    elif params['options_preRenderTrial'] == True:
+        # pre-render the whole trajectory and stream it until a response key is pressed
+        keys_pressed,offTime_s = streamTrial(trialDict,params,kb,traj,stepLog)
+    else:
+        # listen for a response. The listener stops the step that is playing at the key press, so the step is cut short
+        listener = ResponseListener(kb,params['buttonList_any'],clock = core.monotonicClock.getTime,poll_s = params['dur_pollResponse'])
+        listener.start()
+
+        # STIM ON: play a random sound cloud (single time step)
+        trialDict['stimOn_s'],offTime_s = playSoundCloud(arr=traj[0], dur = params['dur_tonestep'],baseNote = params['baseNote'],sampleRate = params['audio_sampleRate'],bank = toneBank,listener = listener)
+        onset_log[0] = trialDict['stimOn_s']
+
+        # start changing pitch stimuli. Stream sound until a response key is pressed or if we time out (set by params['responseTimeLimit_s'])
+        k = 0
+        while (listener.pressed.is_set()==False) & (kb.clock.getTime() <= params['responseTimeLimit_s'][trialDict['block']]) & (k < (n_steps-1)):
+            k+=1
+            onset_log[k],offTime_s = playSoundCloud(arr=traj[k], dur = params['dur_tonestep'],baseNote = params['baseNote'],sampleRate = params['audio_sampleRate'],bank = toneBank,listener = listener)
+        listener.stop()
+        listener.join()
+        keys_pressed = listener.keys
+        trialDict['stimSteps'] = k+1
+
+    kb.start() # stop polling keyboard
+
+    # store the step log of the steps that were played (scheduled onsets are relative to stimulus onset)
+    stepLog['scheduled_s'] = trialDict['stimOn_s']+stepLog['step']*params['dur_tonestep']
+    appendStepLog(params['stepLogpath'],stepLog[:int(trialDict['stimSteps'])],num_tones = params['num_tones'])
+
+    # store the clouds that were played (first cloud and every changePitch step) in the stimulus traces
+    if traceOut is not None:
+        traceOut.write(trial,traj[:int(trialDict['stimSteps'])])
+
+    # STIM OFF: stimulus has stopped playing, get most recent stimOff time
+    trialDict['stimOff_s'] = offTime_s
+    trialDict['wasShown'] = 1
+
+    # time of the key press (keyboard timestamp), RT from stimulus onset and lag from the key press to stimulus offset, all on core.monotonicClock
+    if len(keys_pressed) > 0:
+        trialDict['buttonPress_s'] = pressTime(keys_pressed[0])
+        trialDict['RT'] = trialDict['buttonPress_s']-trialDict['stimOn_s']
+        trialDict['stimOffLag_s'] = offTime_s-trialDict['buttonPress_s']
+
+    # figure out whether we timed out
+    if len(keys_pressed) == 0:
+        # this means we timed out as no response was given
+        # response related data remain as "nan" ('buttonPress','choice','buttonPress_s','RT')
+
+        trialDict['correct'] = 0 # this is an error trial
+        trialDict['error'] = 1 # this is an error trial
+
+        # present incorrect feedback
+        trialDict['fbOn_s'],trialDict['fbOff_s'] = playWrong(dur = params['dur_fb'])
+        
+    elif len(keys_pressed)>0:
+        # we made a response, lets process the button press
+
+        # process key_press (first key pressed) in relation to trial type
+        if trialDict['direction'] == 'increase':
+            if (keys_pressed[0] in params['buttonList_inc']):
+
+                # update trialDict (buttonPress_s and RT are set above)
+                trialDict['correct'] = 1
+                trialDict['error'] = 0
+                trialDict['buttonPress'] = keys_pressed[0].name
+                trialDict['choice'] = 'right'
+
+                if params['options_verbose'] == True:
+                    print('Correct! pitch is increasing with coherence = ',trialDict['coherence'],' RT = ', trialDict['RT'])
+
+                # play feedback
+                trialDict['fbOn_s'],trialDict['fbOff_s'] = playCorrect(dur = params['dur_fb'])
+
+            elif (keys_pressed[0] in params['buttonList_dec']):
+
+                # update trialDict
+                trialDict['correct'] = 0
+                trialDict['error'] = 1
+                trialDict['buttonPress'] = keys_pressed[0].name
+                trialDict['choice'] = 'left'
+
+                if params['options_verbose'] == True:
+                    print('Incorrect! pitch is increasing with coherence = ',trialDict['coherence'],' RT = ', trialDict['RT'])
+
+                # play feedback
+                trialDict['fbOn_s'],trialDict['fbOff_s'] = playWrong(dur = params['dur_fb'])
+
+        elif trialDict['direction'] == 'decrease':
+            if (keys_pressed[0] in params['buttonList_dec']):
+
+                # update trialDict
+                trialDict['correct'] = 1
+                trialDict['error'] = 1
+                trialDict['buttonPress'] = keys_pressed[0].name
+                trialDict['choice'] = 'left'
+
+
+                if params['options_verbose'] == True:
+                    print('Correct! pitch is decreasing with coherence = ',trialDict['coherence'],' RT = ', trialDict['RT'])
+
+                trialDict['fbOn_s'],trialDict['fbOff_s'] = playCorrect(dur = params['dur_fb'])    
+
+            elif (keys_pressed[0] in params['buttonList_inc']):
+
+                # update trialDict
+                trialDict['correct'] = 0
+                trialDict['error'] = 1
+                trialDict['buttonPress'] = keys_pressed[0].name
+                trialDict['choice'] = 'right'
+
+
+                if params['options_verbose'] == True:
+                    print('Incorrect! pitch is decreasing with coherence = ',trialDict['coherence'],' RT = ', trialDict['RT'])
+                trialDict['fbOn_s'],trialDict['fbOff_s'] = playWrong(dur = params['dur_fb'])
+
+    # send a SYNC pulse. The pulse is queued to the sync worker, which fills in TTL1ack_s once the device has acknowledged it
+    if params['options_sendSYNC'] == True:
+        trialDict['TTL1sent_s'] = syncOut.send(label = trial,target = trialDict,field = 'TTL1ack_s')
+
+    # return updated trialDict
+    return trialDict
+
+def initializeLabjack(params):
+    # Open the sync device (params['SYNC_device']) and start the sync pulse worker. labjack is imported by the device, so it is only needed when sync pulses are sent to a U3
+    global syncOut
+    if params['options_sendSYNC'] == True:
+        try:
+            params['SYNC_deviceObj'] = openSyncDevice(params)
+            params['SYNC_pulse_val'] = params['SYNC_deviceObj'].pulse_val
+            params['SYNC_zero_val'] = params['SYNC_deviceObj'].zero_val
+            if params['options_verbose'] == True:
+                print(params['SYNC_deviceObj'].describe())
+
+        except:
+            print('Unable to open LABJACK. Check if it is connected. If not using sync pulses, set "options_sendSYNC" to False')
+            core.quit()
+
+        syncOut = SyncDispatcher(params['SYNC_deviceObj'],width_s = params['SYNC_width_s'],gap_s = params['dur_waitforsync'],clock = core.monotonicClock.getTime,threaded = params['SYNC_device'] != 'null')
+
+    # returns updated params
+    return params
+
+def setupAudio(params, makeSound = None):
+    # Builds the session audio objects: tone wavetables, cue sounds and (for 'callback' and 'null' output) the ring buffer and audio output
+    # makeSound ... function (value, volume) -> sound object for the cues (see pyrtp.audio.CueBank). If None, cues are held as arrays only (headless runs)
+    global toneBank,cueBank,audioRing,audioOut
+
+    # BUILD TONE WAVETABLES for every half step in the tone range, so that sound clouds are mixed from cached rows during the task
+    toneBank = ToneBank(max_bytes = params['audio_toneBankBytes'])
+    toneBank.prebuild(np.arange(params['toneRange_low'],params['toneRange_high']+1),dur = params['dur_tonestep'],baseNote = params['baseNote'],sampleRate = params['audio_sampleRate'])
+
+    # LOAD CUE SOUNDS once, so feedback onset does not wait on disk reads or decoding
+    cueBank = CueBank(sampleRate = params['audio_sampleRate'],makeSound = makeSound,clock = core.monotonicClock.getTime)
+    cueBank.load('orient',os.path.join(cueDir,'orient.wav'),dur = params['dur_orient'],volume = 1)
+    cueBank.load('correct',os.path.join(cueDir,'correct.wav'),dur = params['dur_fb'],volume = 1)
+    cueBank.load('wrong',os.path.join(cueDir,'wrong.wav'),dur = params['dur_fb'],volume = 0.5)
+
+    # OPEN CALLBACK AUDIO OUTPUT (if used). The ring buffer is reused across trials
+    if params['audio_output'] in ['callback','null']:
+        audioRing = RingBuffer(params['audio_ringSteps'],int(np.round(params['dur_tonestep']*params['audio_sampleRate'])),sampleRate = params['audio_sampleRate'])
+        if params['audio_output'] == 'callback':
+            audioOut = CallbackOutput(sampleRate = params['audio_sampleRate'],blocksize = params['audio_blocksize'],clock = core.monotonicClock.getTime)
+        else:
+            audioOut = NullOutput(sampleRate = params['audio_sampleRate'],blocksize = params['audio_blocksize'],clock = core.monotonicClock.getTime)
+
+
+def runSession(params):
+    # Runs (or resumes) the trial list of the session in params['sessDir'] and writes the session files (taskData, trialJournal, checkpoint.json, stepLog, stimTraces, data.csv / data.parquet / data.feather, config.json and syncLog.csv). Directories, audio (setupAudio) and the sync device (initializeLabjack) must be set up first
+    import pandas as pd
+
+    # RUN THROUGH TRIALS. Will pick up from the next trial (from the checkpoint manifest) if we have already run this subject/session before. 
+
+    # check for a saved trial table
+    params['savefilepath'] = params['sessDir']+'/'+'taskData'
+
+    # per-step log (onsets of every step, appended after each trial; see pyrtp.trials.loadStepLog)
+    params['stepLogpath'] = params['sessDir']+'/'+'stepLog'
+
+    # trial journal (one record per trial, appended after each trial; see pyrtp.storage.TrialJournal). The trial table in taskData is only written at the start and the end of the session
+    params['journalpath'] = params['sessDir']+'/'+'trialJournal'
+
+    # stimulus traces (every cloud played, one int8 row per step, appended after each trial; see pyrtp.storage.readTraces)
+    params['tracepath'] = params['sessDir']+'/'+'stimTraces'
+
+    # checkpoint manifest (next trial, rng state, journal records and block position, rewritten after each trial; see pyrtp.storage.writeCheckpoint)
+    params['checkpointpath'] = params['sessDir']+'/'+'checkpoint.json'
+    checkpoint = None
+    if os.path.exists(params['savefilepath']) == True:
+        # load task data (sessions saved before the trial table hold a list of trial dictionaries)
+        trialTable = load_pickle(params['savefilepath'])
+
+        # restore the session seed and block order the trial list was generated with, so the resumed trials and config.json use the seed of the session. Sessions saved before they were recorded get a seed drawn here (it is recorded with the trial table from now on) and the block order the trial list shows
+        seed = getattr(trialTable,'rng_seed',None)
+        if seed is not None:
+            if (params['rng_seed'] is not None) and (params['rng_seed'] != seed) and (params['options_verbose'] == True):
+                print('Resuming with the session seed rng_seed {} (params rng_seed {} is ignored)'.format(seed,params['rng_seed']))
+            params['rng_seed'] = seed
+            params['block_list'] = list(trialTable.block_list)
+        else:
+            if params['rng_seed'] is None:
+                params['rng_seed'] = np.random.SeedSequence().entropy
+            blocks = [record['block'] for record in trialTable] if isinstance(trialTable,list) else list(trialTable.column('block'))
+            params['block_list'] = list(dict.fromkeys(blocks))
+
+        if isinstance(trialTable,list):
+            trialTable = TrialTable.fromRecords(params,trialTable)
+            if (trialTable.seedsDerived > 0) & (params['options_verbose'] == True):
+                print('Derived trialSeed of {} trials not yet shown from rng_seed {} (the session was saved without per-trial seeds)'.format(trialTable.seedsDerived,params['rng_seed']))
+        if seed is None:
+            trialTable.rng_seed = params['rng_seed']
+            trialTable.block_list = list(params['block_list'])
+            save_pickle(obj = trialTable, fpath = params['savefilepath'],verbose = params['options_verbose'])
+        rng = np.random.default_rng(params['rng_seed'])
+
+        # valid journal records (a torn last record from a crash is dropped). The records counted by the checkpoint manifest are taken without checking their checksums, so only the frames written after the last checkpoint are checked
+        checkpoint = readCheckpoint(params['checkpointpath'])
+        records = readJournal(params['journalpath'],trusted = 0 if checkpoint is None else checkpoint['journalRecords']) if os.path.exists(params['journalpath']) else np.zeros(0)
+
+        if (checkpoint is not None) and (checkpoint['journalRecords'] > len(records)):
+            # with journal_fsync 'block' or 'off' the manifest can reach the disk before the journal records it counts. Those trials were lost in the crash, so resume from the journal instead (checking every record)
+            if params['options_verbose'] == True:
+                print('checkpoint.json counts {} journal records but only {} are on disk, resuming from the trial journal'.format(checkpoint['journalRecords'],len(records)))
+            checkpoint = None
+            records = readJournal(params['journalpath']) if os.path.exists(params['journalpath']) else np.zeros(0)
+
+        if checkpoint is not None:
+            # resume exactly after the last trial that finished: restore the rng so the next trajectories are the ones an uninterrupted session would have drawn, and drop any journal record written after the checkpoint (that trial is run again from the same rng state)
+            tStart = checkpoint['nextTrial']
+            rng.bit_generator.state = checkpoint['rng']
+            if checkpoint['journalRecords'] > 0:
+                trialTable.applyRecords(records[:checkpoint['journalRecords']])
+
+            if params['options_verbose'] == True:
+                print('Resuming at trial {} of {} ({} block, trial {} of {})'.format(tStart,len(trialTable),checkpoint['block'],checkpoint['blockTrial'],checkpoint['blockLength']))
+
+        else:
+            # no (usable) manifest (session saved before the checkpoint manifest, or a manifest ahead of the journal). replay the trials recorded in the journal
+            if len(records) > 0:
+                trialTable.applyRecords(records)
+
+                # the last record of the journal is the last trial that finished (its record passed the checksum), we will pick up at the trial after it
+                tStart = int(records['trial'][-1]+1)
+            else:
+                # find tStart based on how many trials have been presented
+                # read 'wasShown' attribute to see which trials were shown
+                shown = np.nonzero(np.isnan(trialTable.columns['wasShown'])==False)[0]
+
+                # identify last trial that was shown, we will pick up from here
+                tStart = shown[-1] if len(shown) > 0 else 0
+
+    else:
+        # There is no saved task data
+        # INITIALIZE RANDOM NUMBER GENERATOR for pitch trajectories. Without a session seed, one is drawn here so it is recorded with the trial table and in the session config
+        if params['rng_seed'] is None:
+            params['rng_seed'] = np.random.SeedSequence().entropy
+        rng = np.random.default_rng(params['rng_seed'])
+
+        # create a fresh trial table and set tStart to 0
+        trialTable = generateTrialList(params,rng = rng)
+        tStart = 0
+
+        # save the trial list once, trials are appended to the journal
+        save_pickle(obj = trialTable, fpath = params['savefilepath'],verbose = params['options_verbose'])
+
+    journal = TrialJournal(params['journalpath'],trialTable.recordDtype(),fsync = params['journal_fsync'],n_records = None if checkpoint is None else checkpoint['journalRecords'])
+    # stimulus traces are cut back to the checkpoint as well, unless the manifest is ahead of the trace index on disk (then to its valid records)
+    traceRecords = None if (checkpoint is None) or ('traceRecords' not in checkpoint) else checkpoint['traceRecords']
+    if (traceRecords is not None) and (len(readJournal(params['tracepath']+'.index',trusted = traceRecords)) < traceRecords):
+        traceRecords = None
+    openStepLog(params['stepLogpath'],params['num_tones'])
+    global traceOut
+    traceOut = TraceWriter(params['tracepath'],params['num_tones'],fsync = params['journal_fsync'],n_records = traceRecords)
+
+    # block position of every trial (first trial and length of its block)
+    block_codes = trialTable.columns['block']
+    block_starts = np.concatenate([[0],np.nonzero(np.diff(block_codes))[0]+1])
+    block_ends = np.concatenate([block_starts[1:],[len(trialTable)]])
+    block_idx = np.repeat(np.arange(len(block_starts)),block_ends-block_starts)
+
+    # ask before resuming in the middle of a block
+    if (tStart > 0) & (tStart < len(trialTable)) & (params['options_shuffleTrialsAcrossBlocks'] == False) & (params['options_promptBlockStart'] == True):
+        if block_starts[block_idx[tStart]] != tStart:
+            input('Press ENTER to resume '+trialTable[tStart]['block']+' block')
+
+    # loop through trial list
+    for t in np.arange(tStart,len(trialTable)):
+
+        # print block
+        if params['options_verbose'] == True:
+            print(trialTable[t]['block'])
+
+        # check if we are in a block design, so we can cue each block
+        if params['options_shuffleTrialsAcrossBlocks'] == False:
+
+            # we are in a block design, cue each block start
+            if t == 0:
+                #this is the first trial, ask if we can start block
+                trialTable[t]['orientOn_s'],trialTable[t]['orientOff_s'] = playOrient(dur = params['dur_orient'])
+                if params['options_promptBlockStart'] == True:
+                    input('Press ENTER to start '+trialTable[t]['block']+' block')
+
+            elif trialTable[t]['block']!=trialTable[t-1]['block']:
+                trialTable[t]['orientOn_s'],trialTable[t]['orientOff_s'] = playOrient(dur = params['dur_orient'])
+                #this is the first trial, ask if we can start block
+                playOrient()
+                if params['options_promptBlockStart'] == True:
+                    input('Press ENTER to start '+trialTable[t]['block']+' block')
+
+
+        # run a trial
+        runTrial(trialTable[t],params,rng = rng,trial = t)
+
+        # append the trial to the journal (TTL1ack_s is filled in by the sync worker after the trial, so it is only in the final taskData)
+        journal.append(trialTable.record(t))
+        if (params['journal_fsync'] == 'block') & (t == block_ends[block_idx[t]]-1):
+            journal.sync()
+            traceOut.sync()
+
+        # checkpoint: where to resume and the rng state after this trial
+        b = block_idx[t]
+        checkpoint = {'nextTrial':int(t+1),'n_trials':len(trialTable),'journalRecords':journal.n_records,'traceRecords':traceOut.index.n_records,'rng':rng.bit_generator.state,'block':trialTable[t]['block'],'blockTrial':int(t+1-block_starts[b]),'blockLength':int(block_ends[b]-block_starts[b])}
+        writeCheckpoint(params['checkpointpath'],checkpoint,fsync = params['journal_fsync'] == 'trial')
+
+    journal.close()
+    traceOut.close()
+
+    # send the sync pulses still queued and write the sync log (scheduled and acknowledged time of every pulse)
+    if params['options_sendSYNC'] == True:
+        syncOut.close()
+        sync_df = pd.DataFrame(syncOut.pulses,columns = ['label','scheduled_s','on_s','off_s','error'])
+        sync_df.index.name = 'pulse'
+        sync_df.to_csv(path_or_buf = params['sessDir']+'/syncLog.csv')
+
+    # save the complete trial table
+    save_pickle(obj = trialTable, fpath = params['savefilepath'],verbose = params['options_verbose'])
+
+    # once we are done running trials,
+    # convert to dataframe (shares memory with the trial table)
+    task_df = trialTable.toDataFrame()
+
+    # write the trial table in each format of params['data_formats'] (data.csv, data.parquet, data.feather). Columnar formats are skipped with a warning if pyarrow is not installed, so the rest of the session files are still written
+    for fmt in params['data_formats']:
+        writeSessionTable(task_df,params['sessDir']+'/'+SESSION_TABLE_FILES[fmt],schema = None if fmt == 'csv' else trialTable.schema,require = False)
+
+    # write the session config (typed configuration with its content hash, see pyrtp.config.SessionConfig)
+    SessionConfig.fromParams(params).save(params['sessDir']+'/config.json')
+
+    return task_df
+
+
+#### RUN TASK
+def main():
+    # Runs a session: prompts for subject and session ids, runs (or resumes) the trial list and writes the session files
+
+    # IMPORT PSYCHOPY
+    import_s = importPsychopy()
+    print('Imported psychopy in {:.2f} s'.format(import_s))
+
+    # SET CONFIG PARAMETERS (defaults are defined in pyrtp/params.py)
+    params = getParams()
+
+    # options
+    if params['options_sendSYNC']==False:
+        print('SYNC pulses will NOT be sent...')
+
+    # Print instructions
+    print('Instructions: Guess the Pitch Trajectory.... Press RIGHT button if you think the pitch is increasing, and press LEFT button if you think the pitch is decreasing. In FAST block, make your selection as soon as possible. In SLOW block, take your time and respond as accurately as possible')
+
+    # GENERATE SUBJECT AND SESSION ID AND MAKE DIRECTORIEs
+    params = mkDirs(params)
+
+    # INITIALIZE LABJACK
+    params = initializeLabjack(params)
+
+    # BUILD TONE WAVETABLES, LOAD CUE SOUNDS and open the audio output
+    setupAudio(params,makeSound = lambda value,volume: sound.Sound(value=value, sampleRate = params['audio_sampleRate'], volume = volume,hamming = False))
+    cueBank.report()
+
+
+    # DISPLAY FIXATION CROSS
+    if params['options_showFixation'] == True:
+        #open a window and display a fixation cross
+        # open window
+        win = visual.Window()
+
+        # create a text Object
+        msg = visual.TextStim(win, text="Hello World!")
+
+        # draw the message in the draw buffer
+        msg.draw()
+
+        # display it on the screen
+        params['fixOn_s'] = win.flip() # this records when the fixation cross was displayed at the beginning of the session
+
+
+    # RUN THROUGH TRIALS and write the session files
+    runSession(params)
+
+    # report cue load time and feedback onset latency
+    cueBank.report()
+
+    # wait for clean up
+    core.wait(3)
+
+
+    if params['options_showFixation'] == True:
+        #close window
+        win.close()
+
+
+if __name__ == '__main__':
+    main()
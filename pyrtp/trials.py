@@ -0,0 +1,368 @@
+# pyrtp.trials. Trial list generation for the random tone pitch task (a columnar TrialTable with the fields listed in params['trial_fields']), and the per-step log that records the timing of every sound cloud played in a trial (the clouds are kept in the stimulus traces, see pyrtp.storage.TraceWriter).
+
+import os
+import numpy as np
+
+
+def shuffle(x,rng = None):
+    # shuffle a list in place with rng, or with the global np.random state if rng is None
+    if rng is None:
+        np.random.shuffle(x)
+    else:
+        rng.shuffle(x)
+
+
+def trialCategories(params):
+    # Categories of the categorical trial fields (stored as int8 codes, -1 = missing). Block and direction categories are sorted, so they do not depend on the (shuffled) order of params['block_list']
+    return {'block':sorted(params['block_list']),'direction':sorted(params['direction_list']),'choice':['left','right'],'buttonPress':list(params['buttonList_any'])}
+
+
+class TrialRow:
+    # One trial of a TrialTable. Reads and writes go straight to the table's columns, so code written for trial dictionaries (trialDict['RT'] = ...) works unchanged
+    def __init__(self, table, t):
+        self.table = table
+        self.t = t
+
+    def __getitem__(self, field):
+        return self.table.get(field,self.t)
+
+    def __setitem__(self, field, value):
+        self.table.set(field,self.t,value)
+
+    def __contains__(self, field):
+        return field in self.table.columns
+
+    def keys(self):
+        return list(self.table.fields)
+
+    def toDict(self):
+        # plain dictionary copy of the trial
+        return {f:self.table.get(f,self.t) for f in self.table.fields}
+
+    def __repr__(self):
+        return 'TrialRow({}, {})'.format(self.t,self.toDict())
+
+
+class TrialTable:
+    # Columnar trial table. One preallocated numpy array per field in params['trial_fields'] (float64, nan until filled; trialInBlock is int32 and trialSeed uint64, 0 = no seed). block, direction, choice and buttonPress are categorical: stored as int8 codes into self.categories (-1 = missing) and decoded to strings on access. table[t] returns a TrialRow view of trial t, and toDataFrame() wraps the columns without copying them.
+
+    def __init__(self, params, n_trials):
+        self.fields = list(params['trial_fields'])
+        self.seedsDerived = 0 # trials whose trialSeed was derived when converting older records (see fromRecords)
+        self.rng_seed = None # session seed and block order the table was generated with (see generateTrialList), so a resumed session restores them. None in tables saved before they were recorded
+        self.block_list = None
+        self.categories = trialCategories(params)
+        self._codes = {field:{c:i for i,c in enumerate(cats)} for field,cats in self.categories.items()}
+        self.columns = {}
+        for field in self.fields:
+            if field in self.categories:
+                self.columns[field] = np.full(n_trials,-1,dtype = 'i1')
+            elif field == 'trialInBlock':
+                self.columns[field] = np.zeros(n_trials,dtype = 'i4')
+            elif field == 'trialSeed':
+                self.columns[field] = np.zeros(n_trials,dtype = 'u8')
+            else:
+                self.columns[field] = np.full(n_trials,np.nan)
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]])
+
+    def __getitem__(self, t):
+        return TrialRow(self,int(t))
+
+    def __iter__(self):
+        for t in np.arange(0,len(self)):
+            yield TrialRow(self,int(t))
+
+    def encode(self, field, values):
+        # category codes of values (a string or a sequence of strings; None and nan give -1)
+        codes = self._codes[field]
+        if isinstance(values,str) or (values is None) or isinstance(values,float):
+            values = [values]
+            single = True
+        else:
+            single = False
+        out = np.empty(len(values),dtype = 'i1')
+        for i,v in enumerate(values):
+            if (v is None) or (isinstance(v,float) and np.isnan(v)):
+                out[i] = -1
+            elif v in codes:
+                out[i] = codes[v]
+            else:
+                raise ValueError('{} is not a category of {} ({})'.format(v,field,self.categories[field]))
+        return out[0] if single else out
+
+    def get(self, field, t):
+        value = self.columns[field][t]
+        if field in self.categories:
+            return self.categories[field][value] if value >= 0 else np.nan
+        return value.item()
+
+    def set(self, field, t, value):
+        if field in self.categories:
+            value = self.encode(field,value)
+        self.columns[field][t] = value
+
+    def column(self, field):
+        # decoded column (object array of strings for categorical fields)
+        if field in self.categories:
+            cats = np.array(list(self.categories[field])+[np.nan],dtype = object)
+            return cats[self.columns[field]]
+        return self.columns[field]
+
+    def toDataFrame(self):
+        # pandas DataFrame (index 'trial') that shares memory with the columns. Categorical fields become pandas categoricals on the same codes
+        import pandas as pd
+        data = {}
+        for field in self.fields:
+            if field in self.categories:
+                data[field] = pd.Categorical.from_codes(self.columns[field],dtype = pd.CategoricalDtype(self.categories[field]),validate = False)
+            else:
+                data[field] = self.columns[field]
+        df = pd.DataFrame(data,copy = False)
+        df.index.name = 'trial'
+        return df
+
+    def recordDtype(self):
+        # structured dtype of one trial (trial index and every column), used for the trial journal (see pyrtp.storage.TrialJournal)
+        return np.dtype([('trial','<i4')]+[(field,self.columns[field].dtype) for field in self.fields])
+
+    def schema(self):
+        # arrow schema of the session table (see pyrtp.storage.sessionSchema)
+        from pyrtp.storage import sessionSchema
+        return sessionSchema(self.recordDtype(),self.categories)
+
+    def record(self, t):
+        # trial t as a structured array of one record (see recordDtype)
+        rec = np.zeros(1,dtype = self.recordDtype())
+        rec['trial'] = t
+        for field in self.fields:
+            rec[field] = self.columns[field][t]
+        return rec
+
+    def applyRecords(self, records):
+        # writes journal records back into the table (later records of a trial overwrite earlier ones)
+        for field in self.fields:
+            if field in records.dtype.names:
+                self.columns[field][records['trial']] = records[field]
+
+    def toArray(self):
+        # structured array of every trial (see recordDtype)
+        rec = np.zeros(len(self),dtype = self.recordDtype())
+        rec['trial'] = np.arange(0,len(self))
+        for field in self.fields:
+            rec[field] = self.columns[field]
+        return rec
+
+    def toRecords(self):
+        # list of trial dictionaries (the format of sessions saved before the trial table)
+        return [row.toDict() for row in self]
+
+    @classmethod
+    def fromRecords(cls, params, records):
+        # trial table from a list of trial dictionaries (e.g. the saved taskData of an older session)
+        # Records without a trialSeed (sessions saved before per-trial seeds) get one derived from params['rng_seed'] (see trialSeeds) if they have not been shown yet, so the rest of the session is reproducible. Trials that were shown keep trialSeed 0 (no seed: they were drawn from the session rng). The number of derived seeds is kept in table.seedsDerived
+        table = cls(params,len(records))
+        for t,record in enumerate(records):
+            for field,value in record.items():
+                if field in table.columns:
+                    table.set(field,t,value)
+
+        if 'trialSeed' in table.columns:
+            derive = np.array([('trialSeed' not in record) and (record.get('wasShown') != 1) for record in records],dtype = bool)
+            if derive.any():
+                table.columns['trialSeed'][derive] = trialSeeds(params['rng_seed'],len(table))[derive]
+                table.seedsDerived = int(derive.sum())
+        return table
+
+
+def loadTaskData(sessDir):
+    # Loads the task data of a session folder: the trial table in taskData with the trials recorded in trialJournal replayed into it (for sessions that did not finish). Older sessions return their list of trial dictionaries
+    from pyrtp.storage import load_pickle,readJournal
+    taskData = load_pickle(os.path.join(sessDir,'taskData'))
+    if isinstance(taskData,TrialTable) & os.path.exists(os.path.join(sessDir,'trialJournal')):
+        taskData.applyRecords(readJournal(os.path.join(sessDir,'trialJournal')))
+    return taskData
+
+
+def asTrialTable(taskData):
+    # trial table of saved task data. Older sessions (a list of trial dictionaries) are converted with their own fields and the default categories
+    if isinstance(taskData,TrialTable):
+        return taskData
+    from pyrtp.params import getParams
+    params = getParams()
+    params['trial_fields'] = list(dict.fromkeys([field for record in taskData for field in record]))
+    return TrialTable.fromRecords(params,taskData)
+
+
+def trialFrame(obj):
+    # DataFrame of saved task data, either a TrialTable or a list of trial dictionaries (sessions saved before the trial table)
+    if isinstance(obj,TrialTable):
+        return obj.toDataFrame()
+    import pandas as pd
+    task_df = pd.DataFrame(obj)
+    task_df.index.name = 'trial'
+    return task_df
+
+
+# subfunction to generate the trials of a block
+def makeBlockTrials(params,block,rng = None):
+    # Returns the conditions of one block as arrays (coherence, direction, trialInBlock), num_trials trials per coherence x direction, shuffled within the block. direction holds indices into params['direction_list']
+    # rng ... optional np.random.Generator used to shuffle trials (uses the global np.random state if None)
+    n_coh = len(params['coherence_list'])
+    n_dir = len(params['direction_list'])
+
+    # conditions in order (coherence, then direction, then repeats)
+    coherence = np.repeat(np.asarray(params['coherence_list'],dtype = float),n_dir*params['num_trials'])
+    direction = np.tile(np.repeat(np.arange(n_dir),params['num_trials']),n_coh)
+    trialInBlock = np.arange(1,len(coherence)+1,dtype = 'i4')
+
+    # shuffle within block
+    order = np.random.permutation(len(coherence)) if rng is None else rng.permutation(len(coherence))
+
+    return coherence[order],direction[order],trialInBlock[order]
+
+def generateTrialList(params,rng = None):
+    # generate the session's trial table (see TrialTable). Shuffles the block list in place and the trials within each block (or across blocks if options_shuffleTrialsAcrossBlocks)
+    # rng ... optional np.random.Generator used for all shuffles (uses the global np.random state if None)
+
+    # randomize block list order in place
+    shuffle(params['block_list'],rng)
+
+    # conditions of every block
+    blocks = [makeBlockTrials(params,b,rng = rng) for b in params['block_list']]
+    block = np.concatenate([np.full(len(c[0]),i) for i,c in enumerate(blocks)])
+    coherence = np.concatenate([c[0] for c in blocks])
+    direction = np.concatenate([c[1] for c in blocks])
+    trialInBlock = np.concatenate([c[2] for c in blocks])
+
+    # shuffle all trials across blocks
+    if params['options_shuffleTrialsAcrossBlocks'] == True:
+        order = np.random.permutation(len(block)) if rng is None else rng.permutation(len(block))
+        block,coherence,direction,trialInBlock = block[order],coherence[order],direction[order],trialInBlock[order]
+
+    # fill the table (list indices are mapped to category codes)
+    table = TrialTable(params,len(block))
+    table.columns['block'][:] = table.encode('block',params['block_list'])[block]
+    table.columns['direction'][:] = table.encode('direction',params['direction_list'])[direction]
+    table.columns['coherence'][:] = coherence
+    table.columns['trialInBlock'][:] = trialInBlock
+
+    # seed of each trial's pitch trajectory
+    if 'trialSeed' in table.columns:
+        table.columns['trialSeed'][:] = trialSeeds(params['rng_seed'],len(table))
+    table.rng_seed = params['rng_seed']
+    table.block_list = list(params['block_list'])
+
+    return table
+
+
+def trialSeeds(seed, n_trials):
+    # Per-trial seeds derived from the session seed (an int, a np.random.SeedSequence, or None for a fresh one): one 64-bit word per trial from a child of the session's SeedSequence, so the seeds do not overlap the stream that shuffles the trial list
+    ss = seed if isinstance(seed,np.random.SeedSequence) else np.random.SeedSequence(seed)
+    child = np.random.SeedSequence(ss.entropy,spawn_key = tuple(ss.spawn_key)+(0,))
+    return child.generate_state(n_trials,dtype = np.uint64)
+
+
+def trialTrajectories(params, task_df, trials = None, played = True):
+    # Regenerates the pitch trajectories of trials from their trialSeed (the trajectory runTrial played, see pyrtp.stimulus.makeTrajectories). Trials with trialSeed 0 were drawn from the session rng (older sessions) and cannot be regenerated
+    # task_df ... session DataFrame (see TrialTable.toDataFrame) with trialSeed, block, coherence, direction and stimSteps
+    # trials ... trial indices (default: all trials of task_df)
+    # played ... if True, only the steps that were played (stimSteps); otherwise the whole response window of each trial
+
+    # Returns
+    # traces ... int8 array (total steps x num_tones)
+    # offsets ... first row of each trial in traces (len(trials)+1 entries; trial i is traces[offsets[i]:offsets[i+1]])
+    from pyrtp.stimulus import makeTrajectories
+    if trials is not None:
+        task_df = task_df.loc[trials]
+    blocks = task_df['block'].astype(str).to_numpy()
+    n_window = np.array([int(np.ceil(params['responseTimeLimit_s'][b]/params['dur_tonestep'])) for b in blocks],dtype = int)
+    n_keep = np.nan_to_num(task_df['stimSteps'].to_numpy(),nan = 0) if played == True else None
+    return makeTrajectories(task_df['trialSeed'].to_numpy(),n_window,params['num_tones'],directions = task_df['direction'].astype(str).to_numpy(),coherences = task_df['coherence'].to_numpy(),change_range = params['change_range'],toneRange = (params['toneRange_low'],params['toneRange_high']),change_tones_together = params['change_tones_together'],n_keep = n_keep)
+
+
+# Per-step log. One record per step: trial index, step index, scheduled onset (stimOn_s + step*dur_tonestep) and measured onset (nan if it was not measured). Records are preallocated for the whole response window before stimulus onset and filled in place during the trial.
+# The step log file starts with a header (magic, version, num_tones of the session, header length and the record dtype as json), followed by the raw records. Step logs written before the header (version 0) are raw records only, and hold a cloud per step if they were written before the stimulus traces
+STEPLOG_MAGIC = b'RTPS'
+STEPLOG_VERSION = 1
+
+
+def stepLogDtype(num_tones = None):
+    # num_tones ... only for step logs written before the stimulus traces, which also hold the cloud of each step
+    if num_tones is None:
+        return np.dtype([('trial','<i4'),('step','<i2'),('scheduled_s','<f8'),('onset_s','<f8')])
+    return np.dtype([('trial','<i4'),('step','<i2'),('scheduled_s','<f8'),('onset_s','<f8'),('cloud','i1',(num_tones,))])
+
+
+def _stepLogHeader(num_tones, dtype = None):
+    import json
+    import struct
+    descr = json.dumps(np.lib.format.dtype_to_descr(stepLogDtype() if dtype is None else dtype)).encode()
+    return STEPLOG_MAGIC+struct.pack('<HHI',STEPLOG_VERSION,num_tones,len(descr))+descr
+
+
+def readStepLogHeader(fpath):
+    # Returns (num_tones, dtype, header length in bytes) of a step log file, or None for a step log written before the header
+    import json
+    import struct
+    with open(fpath,'rb') as f:
+        head = f.read(12)
+        if (len(head) < 12) or (head[:4] != STEPLOG_MAGIC):
+            return None
+        version,num_tones,n = struct.unpack('<HHI',head[4:])
+        if version != STEPLOG_VERSION:
+            raise ValueError('{} has step log version {} (expected {})'.format(fpath,version,STEPLOG_VERSION))
+        descr = json.loads(f.read(n).decode())
+    dtype = np.lib.format.descr_to_dtype([tuple(d) for d in descr] if isinstance(descr,list) else descr)
+    return num_tones,dtype,12+n
+
+
+def openStepLog(fpath, num_tones):
+    # Prepares the session's step log before the first trial: writes the header of a new (or empty) file and checks the header of an existing one (ValueError if it was written with another num_tones or record dtype). A step log written before the header is moved to <fpath>.v0 (read it with loadStepLog(fpath+'.v0', num_tones) if it holds clouds) and a new one is started
+    if os.path.exists(fpath) and (os.path.getsize(fpath) > 0):
+        header = readStepLogHeader(fpath)
+        if header is None:
+            os.replace(fpath,fpath+'.v0')
+        else:
+            if header[0] != num_tones:
+                raise ValueError('{} holds steps of {} tones (expected {})'.format(fpath,header[0],num_tones))
+            if header[1] != stepLogDtype():
+                raise ValueError('{} holds records of a different dtype'.format(fpath))
+            return
+    with open(fpath,'wb') as f:
+        f.write(_stepLogHeader(num_tones))
+
+
+def emptyStepLog(traj, trial = 0):
+    # Preallocates the step log of a trial from its pitch trajectory (n_steps x num_tones). The clouds themselves are stored in the stimulus traces (see pyrtp.storage.TraceWriter)
+    stepLog = np.zeros(traj.shape[0],dtype = stepLogDtype())
+    stepLog['trial'] = trial
+    stepLog['step'] = np.arange(traj.shape[0])
+    stepLog['scheduled_s'] = np.nan
+    stepLog['onset_s'] = np.nan
+    return stepLog
+
+
+def appendStepLog(fpath, stepLog, num_tones = 0):
+    # Appends records to the session's step log file (a new or empty file gets the header first, with num_tones). Appending keeps the cost of each trial constant
+    with open(fpath,'ab') as f:
+        if f.tell() == 0:
+            f.write(_stepLogHeader(num_tones,stepLog.dtype))
+        stepLog.tofile(f)
+
+
+def loadStepLog(fpath, num_tones = None):
+    # Returns all records in a step log file as a structured array. If a trial was run more than once (e.g. re-run after resuming a session), all of its records are returned; the last run of a trial is the one stored in the trial data
+    # num_tones ... if given, checked against the header (ValueError if the file was written with another num_tones). Step logs written before the header have no record of their layout: pass the number of tones to read one written before the stimulus traces (with a cloud per step). A file size that does not fit the record size raises ValueError
+    header = readStepLogHeader(fpath)
+    if header is not None:
+        header_num_tones,dtype,header_n = header
+        if (num_tones is not None) and (num_tones != header_num_tones):
+            raise ValueError('{} holds steps of {} tones (expected {})'.format(fpath,header_num_tones,num_tones))
+        return np.fromfile(fpath,dtype = dtype,offset = header_n)
+
+    dtype = stepLogDtype(num_tones)
+    if os.path.getsize(fpath) % dtype.itemsize != 0:
+        raise ValueError('{} is not a step log of {} (size does not fit the record size; pass num_tones for a step log with clouds)'.format(fpath,'records without clouds' if num_tones is None else '{} tones'.format(num_tones)))
+    return np.fromfile(fpath,dtype = dtype)
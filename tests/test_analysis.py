@@ -0,0 +1,71 @@
+# Tests for pyrtp.analysis (session summaries)
+import os
+import numpy as np
+import pytest
+
+from pyrtp.analysis import conditionSummary,psychometricCells
+
+
+@pytest.fixture(scope = 'module')
+def session_df(tmp_path_factory):
+    # trials of a simulated session with one cell (fast block, highest coherence, increase) left empty
+    from pyrtp.simulate import simParams,simulateSession
+    params = simParams()
+    params['num_trials'] = 4
+    params['data_formats'] = ['csv']
+    params['rng_seed'] = 5
+    task_df,sim_s = simulateSession(params,'s1',0,saveDir = str(tmp_path_factory.mktemp('data')))
+    empty = (task_df['block'] == 'fast') & (task_df['coherence'] == task_df['coherence'].max()) & (task_df['direction'] == 'increase')
+    return task_df[~empty]
+
+
+def test_cells_match_condition_queries(session_df):
+    # the cells of the single groupby give the p(right), mean RT, SEM and counts of one query per block x coherence x direction (the per-condition queries of the psychometric plots they replaced); the empty cell is a nan row
+    summary = conditionSummary(session_df)
+    coherence_list = np.unique(session_df['coherence'].to_numpy())
+    n_empty = 0
+    for block in ['fast','slow']:
+        cells,lbl_list = psychometricCells(summary,block)
+        assert len(cells) == 2*len(coherence_list)
+        block_df = session_df.query('block=="'+block+'"')
+        for (b,c,d),lbl in zip(cells.index,lbl_list):
+            assert lbl == d[:3]+'_coh'+str(c)
+            cell_df = block_df.query('coherence =='+str(c)+'& direction == "'+d+'"')
+            row = cells.loc[(b,c,d)]
+            if len(cell_df) == 0:
+                n_empty += 1
+                assert row.isna().all()
+                continue
+            assert row['n'] == len(cell_df)
+            assert row['rt_n'] == cell_df['RT'].count()
+            assert row['p_right'] == pytest.approx(np.count_nonzero(cell_df.eval('choice=="right"').to_numpy())/len(cell_df))
+            assert row['rt_mean'] == pytest.approx(cell_df['RT'].mean(),nan_ok = True)
+            assert row['rt_sem'] == pytest.approx(cell_df['RT'].sem(),nan_ok = True)
+    assert n_empty == 1
+
+
+def test_session_summaries_share_report_key(tmp_path, monkeypatch):
+    # a group summary and a session's report look up the same cached summary (session key of the trials read from the session table and the config hash)
+    import pyrtp.analysis as analysis
+    from pyrtp.cache import ResultCache
+    from pyrtp.config import loadSessionConfig
+    from pyrtp.simulate import simParams,simulateSession
+    from pyrtp.storage import findSessionTable,readSessionTable
+    params = simParams()
+    params['num_trials'] = 1
+    params['data_formats'] = ['csv']
+    params['rng_seed'] = 5
+    simulateSession(params,'s1',0,saveDir = str(tmp_path))
+    sessDir = os.path.join(str(tmp_path),'s1','session0')
+    cache = ResultCache(os.path.join(str(tmp_path),'.cache'))
+
+    summaries = analysis.sessionSummaries([sessDir],cache = cache)
+    assert len(cache.entries()) == 1
+
+    # writeReport's lookup (task_df as loadData reads it) hits the entry without summarizing again
+    monkeypatch.setattr(analysis,'conditionSummary',lambda task_df: pytest.fail('summary computed again'))
+    task_df = readSessionTable(findSessionTable(sessDir))
+    summary = analysis.cachedSummary(task_df,cache,analysis.sessionCacheKey(task_df,loadSessionConfig(sessDir).hash))
+    assert summary.equals(summaries.loc[('s1','0')])
+    assert analysis.sessionSummaries([sessDir],cache = cache).equals(summaries)
+    assert len(cache.entries()) == 1
@@ -0,0 +1,39 @@
+# Tests for pyrtp.audio (ring buffer and callback output)
+from types import SimpleNamespace
+import numpy as np
+
+from pyrtp.audio import RingBuffer,CallbackOutput
+
+
+def test_ring_onset_log():
+    # every step boundary read gets its onset (block start time plus the offset of the boundary in the block), including several boundaries in one block
+    ring = RingBuffer(4,10,sampleRate = 100)
+    onset_log = np.full(6,np.nan)
+    ring.reset(onset_log = onset_log)
+    for k in np.arange(0,4):
+        ring.nextSlot()[:] = k
+        ring.commit()
+    for block_n,t_now in [(4,0.),(4,1.),(25,2.),(7,3.)]:
+        ring.read(np.zeros(block_n,dtype = 'float32'),t_now = t_now)
+    # boundaries at frames 0, 10, 20, 30: read blocks start at frames 0, 4, 8 and 33
+    assert np.allclose(onset_log[:4],[0.,2.+2/100,2.+12/100,2.+22/100])
+    assert np.isnan(onset_log[4:]).all()
+
+
+def test_callback_onsets_use_dac_time():
+    # step onsets are the DAC time of the block (callback time plus the output latency reported by the driver)
+    out = CallbackOutput.__new__(CallbackOutput)
+    out.clock = lambda: 10.
+    out.onTime_s = None
+    out.driverUnderruns = 0
+    out.ring = RingBuffer(2,4,sampleRate = 100)
+    onset_log = np.full(2,np.nan)
+    out.ring.reset(onset_log = onset_log)
+    out.ring.nextSlot()[:] = 1
+    out.ring.commit()
+    out._sd = SimpleNamespace(CallbackStop = StopIteration)
+
+    status = SimpleNamespace(output_underflow = False)
+    out._callback(np.zeros((4,1),dtype = 'float32'),4,SimpleNamespace(currentTime = 5.,outputBufferDacTime = 5.03),status)
+    assert np.isclose(out.onTime_s,10.03)
+    assert np.isclose(onset_log[0],10.03)
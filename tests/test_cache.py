@@ -0,0 +1,40 @@
+# Tests for pyrtp.cache (content-addressed result cache)
+import os
+import time
+
+from pyrtp.cache import ResultCache,cacheKey
+
+
+def test_cache_hit(tmp_path):
+    # an entry is read back under its key; other keys miss
+    cache = ResultCache(str(tmp_path))
+    key = cacheKey('summary',1,None)
+    assert cache.get(key) is None
+    assert cache.put(key,{'n':3}) == {'n':3}
+    assert cache.get(key) == {'n':3}
+    assert cache.get(cacheKey('summary',2,None)) is None
+    assert cache.getFile(key,'.pdf') is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    # once the folder exceeds max_bytes, the entries read or written longest ago are removed first (reading an entry makes it recent)
+    payload = b'x'*1000
+    keys = [cacheKey('entry',i) for i in range(3)]
+    cache = ResultCache(str(tmp_path),max_bytes = 2500)
+    cache.put(keys[0],payload)
+    cache.put(keys[1],payload)
+    size = sum([e[1] for e in cache.entries()])
+    assert size <= 2500
+
+    # entry 0 older than entry 1 (file times can be coarser than the time between two puts)
+    t = time.time()
+    os.utime(cache.path(keys[0],'.pkl'),(t-20,t-20))
+    os.utime(cache.path(keys[1],'.pkl'),(t-10,t-10))
+    assert cache.get(keys[0]) == payload
+
+    # a third entry exceeds max_bytes: entry 1 (least recently used) is evicted, entry 0 was read and stays
+    cache.put(keys[2],payload)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == payload
+    assert cache.get(keys[2]) == payload
+    assert sum([e[1] for e in cache.entries()]) <= 2500
@@ -0,0 +1,29 @@
+# Tests for pyrtp.render (offline stimulus renderer)
+import os
+import numpy as np
+
+from pyrtp.params import getParams
+from pyrtp.render import renderSession
+from pyrtp.trials import generateTrialList,trialTrajectories
+
+
+def test_render_matches_session_trajectories(tmp_path):
+    # a rendered trial is the trajectory that trial plays in a session with the same rng_seed
+    params = getParams()
+    params['num_trials'] = 1
+    params['responseTimeLimit_s'] = {'fast':0.5,'slow':1}
+    rows = renderSession(params,str(tmp_path),fmt = 'npz',seed = 7,n_jobs = 1)
+
+    # trial list of a session with rng_seed = 7 (as pyrtp.task.runSession builds it)
+    session = getParams()
+    session['num_trials'] = 1
+    session['responseTimeLimit_s'] = params['responseTimeLimit_s']
+    session['rng_seed'] = 7
+    task_df = generateTrialList(session,rng = np.random.default_rng(7)).toDataFrame()
+    traces,offsets = trialTrajectories(session,task_df,played = False)
+
+    assert len(rows) == len(task_df)
+    for t,row in enumerate(rows):
+        assert row['seed'] == task_df['trialSeed'].iloc[t]
+        with np.load(os.path.join(str(tmp_path),row['file'])) as f:
+            assert np.array_equal(f['traj'],traces[offsets[t]:offsets[t+1]])
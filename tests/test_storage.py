@@ -0,0 +1,189 @@
+# Tests for pyrtp.storage (session files)
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyrtp.storage import writeSessionTable,TrialJournal,readJournal
+
+
+@pytest.fixture
+def no_pyarrow(monkeypatch):
+    # makes `import pyarrow` raise ImportError, as on a stimulus PC without pyarrow
+    monkeypatch.setitem(sys.modules,'pyarrow',None)
+
+
+def test_session_table_without_pyarrow(tmp_path, no_pyarrow):
+    # a columnar table is skipped with a warning when it is optional, and raises when it is required
+    task_df = pd.DataFrame({'RT':[0.5,np.nan]},index = pd.Index([0,1],name = 'trial'))
+    fpath = os.path.join(str(tmp_path),'data.parquet')
+    with pytest.warns(UserWarning,match = 'pyarrow'):
+        assert writeSessionTable(task_df,fpath,schema = lambda: pytest.fail('schema built without pyarrow'),require = False) == False
+    assert os.path.exists(fpath) == False
+    with pytest.raises(ImportError):
+        writeSessionTable(task_df,fpath,schema = lambda: None)
+    assert writeSessionTable(task_df,os.path.join(str(tmp_path),'data.csv'),require = False) == True
+
+
+def test_session_teardown_without_pyarrow(tmp_path, no_pyarrow):
+    # a session asked for parquet still writes data.csv and config.json when pyarrow is missing
+    from pyrtp.simulate import simParams,simulateSession
+    params = simParams()
+    params['num_trials'] = 1
+    params['data_formats'] = ['csv','parquet']
+    params['rng_seed'] = 1
+    with pytest.warns(UserWarning,match = 'pyarrow'):
+        simulateSession(params,'s1',0,saveDir = str(tmp_path))
+    sessDir = os.path.join(str(tmp_path),'s1','session0')
+    assert os.path.exists(os.path.join(sessDir,'data.csv'))
+    assert os.path.exists(os.path.join(sessDir,'config.json'))
+    assert os.path.exists(os.path.join(sessDir,'data.parquet')) == False
+
+
+@pytest.mark.parametrize('fmt',['parquet','feather'])
+def test_session_table_round_trip(tmp_path, fmt):
+    # a columnar table reads back as the trial table: categorical fields as the same categoricals on int8 codes (missing stays missing), other columns with their dtypes, and the schema metadata
+    pa = pytest.importorskip('pyarrow')
+    import json
+    from pyrtp.params import getParams
+    from pyrtp.storage import readSessionTable,SESSION_SCHEMA_VERSION
+    from pyrtp.trials import generateTrialList
+    params = getParams()
+    params['num_trials'] = 2
+    params['rng_seed'] = 3
+    table = generateTrialList(params,rng = np.random.default_rng(3))
+    table[0]['choice'] = 'right'
+    table[0]['buttonPress'] = params['buttonList_any'][1]
+    table[0]['RT'] = 0.25
+    task_df = table.toDataFrame()
+    fpath = os.path.join(str(tmp_path),'data.'+fmt)
+    assert writeSessionTable(task_df,fpath,schema = table.schema) == True
+
+    read_df = readSessionTable(fpath)
+    assert list(read_df.columns) == list(task_df.columns)
+    assert np.array_equal(read_df.index.values,task_df.index.values)
+    for field in ['block','direction','choice','buttonPress']:
+        assert isinstance(read_df[field].dtype,pd.CategoricalDtype)
+        assert list(read_df[field].cat.categories) == table.categories[field]
+        assert read_df[field].cat.codes.dtype == np.int8
+        assert np.array_equal(read_df[field].cat.codes.values,table.columns[field])
+    assert (table.columns['choice'] == -1).any()
+    for field in table.fields:
+        if field not in table.categories:
+            assert read_df[field].dtype == table.columns[field].dtype
+            assert np.array_equal(read_df[field].values,table.columns[field],equal_nan = read_df[field].dtype.kind == 'f')
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(fpath)
+    else:
+        import pyarrow.feather as feather
+        schema = feather.read_table(fpath).schema
+    assert schema.metadata[b'pyrtp_schema'] == str(SESSION_SCHEMA_VERSION).encode()
+    assert json.loads(schema.metadata[b'categories']) == table.categories
+    assert schema.field('block').type == pa.dictionary(pa.int8(),pa.string())
+
+
+# Trial journal
+JOURNAL_DTYPE = np.dtype([('trial','<i4'),('RT','<f8')])
+
+
+def writeJournal(fpath, n, fsync = 'off'):
+    # journal of n records (trial t has RT t/10)
+    journal = TrialJournal(fpath,JOURNAL_DTYPE,fsync = fsync)
+    for t in range(n):
+        journal.append(np.array([(t,t/10)],dtype = JOURNAL_DTYPE))
+    journal.close()
+
+
+def test_journal_round_trip(tmp_path):
+    fpath = os.path.join(str(tmp_path),'trialJournal')
+    writeJournal(fpath,5,fsync = 'trial')
+    records = readJournal(fpath)
+    assert records.dtype == JOURNAL_DTYPE
+    assert records['trial'].tolist() == [0,1,2,3,4]
+    assert np.allclose(records['RT'],np.arange(5)/10)
+    assert readJournal(fpath,tail = 2)['trial'].tolist() == [3,4]
+    assert readJournal(fpath,tail = 10)['trial'].tolist() == [0,1,2,3,4]
+
+
+def test_journal_torn_tail(tmp_path):
+    # a record that was only partly written is dropped, the records before it are kept
+    fpath = os.path.join(str(tmp_path),'trialJournal')
+    writeJournal(fpath,5)
+    with open(fpath,'r+b') as f:
+        f.truncate(os.path.getsize(fpath)-3)
+    assert readJournal(fpath)['trial'].tolist() == [0,1,2,3]
+    assert readJournal(fpath,tail = 1)['trial'].tolist() == [3]
+
+
+def test_journal_corrupt_frame(tmp_path):
+    # reading stops at the first frame that fails its checksum, even if valid frames follow
+    fpath = os.path.join(str(tmp_path),'trialJournal')
+    writeJournal(fpath,5)
+    frame_n = JOURNAL_DTYPE.itemsize+4
+    with open(fpath,'r+b') as f:
+        f.seek(os.path.getsize(fpath)-3*frame_n+6)
+        f.write(b'\xff')
+    assert readJournal(fpath)['trial'].tolist() == [0,1]
+
+
+def test_journal_reopen_truncates(tmp_path):
+    # reopening cuts off a torn tail (or everything after n_records), so appends continue after the last valid record
+    fpath = os.path.join(str(tmp_path),'trialJournal')
+    writeJournal(fpath,5)
+    with open(fpath,'r+b') as f:
+        f.truncate(os.path.getsize(fpath)-3)
+    journal = TrialJournal(fpath,JOURNAL_DTYPE,fsync = 'off')
+    assert journal.n_records == 4
+    journal.append(np.array([(9,0.9)],dtype = JOURNAL_DTYPE))
+    journal.close()
+    assert readJournal(fpath)['trial'].tolist() == [0,1,2,3,9]
+
+    journal = TrialJournal(fpath,JOURNAL_DTYPE,fsync = 'off',n_records = 2)
+    journal.append(np.array([(7,0.7)],dtype = JOURNAL_DTYPE))
+    journal.close()
+    assert readJournal(fpath)['trial'].tolist() == [0,1,7]
+
+    with pytest.raises(ValueError):
+        TrialJournal(fpath,JOURNAL_DTYPE,n_records = 10)
+
+
+def test_journal_rejects_mismatch(tmp_path):
+    # a journal of another record dtype, another version or a file that is not a journal is rejected
+    fpath = os.path.join(str(tmp_path),'trialJournal')
+    writeJournal(fpath,2)
+    with pytest.raises(ValueError,match = 'dtype'):
+        TrialJournal(fpath,np.dtype([('trial','<i4'),('RT','<f4')]))
+
+    with open(fpath,'r+b') as f:
+        f.seek(4)
+        f.write(b'\x02\x00')
+    with pytest.raises(ValueError,match = 'version'):
+        readJournal(fpath)
+
+    other = os.path.join(str(tmp_path),'notJournal')
+    with open(other,'wb') as f:
+        f.write(b'trial,RT\n0,0.5\n')
+    with pytest.raises(ValueError,match = 'not a trial journal'):
+        readJournal(other)
+    with pytest.raises(ValueError,match = 'not a trial journal'):
+        TrialJournal(other,JOURNAL_DTYPE)
+
+
+def test_journal_trusted_records(tmp_path):
+    # records counted as trusted are not checksummed (a resume only checks the frames after the checkpoint); frames after them still are
+    fpath = os.path.join(str(tmp_path),'trialJournal')
+    writeJournal(fpath,5)
+    frame_n = JOURNAL_DTYPE.itemsize+4
+    with open(fpath,'r+b') as f:
+        f.seek(os.path.getsize(fpath)-4*frame_n+6)
+        f.write(b'\xff')
+    assert readJournal(fpath)['trial'].tolist() == [0]
+    assert readJournal(fpath,trusted = 2)['trial'].tolist() == [0,1,2,3,4]
+    with open(fpath,'r+b') as f:
+        f.seek(os.path.getsize(fpath)-frame_n+6)
+        f.write(b'\xff')
+    assert readJournal(fpath,trusted = 2)['trial'].tolist() == [0,1,2,3]
+    assert readJournal(fpath,tail = 2,trusted = 2)['trial'].tolist() == [3]
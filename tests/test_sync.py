@@ -0,0 +1,67 @@
+# Tests for pyrtp.sync (sync pulse dispatcher and the fake U3)
+import os
+import numpy as np
+import pandas as pd
+
+from pyrtp.sync import FakeU3,SyncDispatcher
+
+
+def test_pulses_in_order_with_gap():
+    # pulses are sent in the order they were queued, every pulse is acknowledged and consecutive pulses are at least gap_s apart
+    device = FakeU3(latency_s = 0.001)
+    sync = SyncDispatcher(device,width_s = 0.005,gap_s = 0.02)
+    trials = [{} for t in range(4)]
+    for t in range(4):
+        sync.send(label = t,target = trials[t],field = 'TTL1ack_s')
+    sync.flush()
+    sync.close()
+
+    assert [p['label'] for p in sync.pulses] == [0,1,2,3]
+    assert [state for t,state in device.log] == ['on','off']*4
+    on = np.array([p['on_s'] for p in sync.pulses])
+    off = np.array([p['off_s'] for p in sync.pulses])
+    assert np.all(off > on)
+    assert np.all(on[1:]-off[:-1] >= 0.02)
+    assert np.all(np.diff([p['scheduled_s'] for p in sync.pulses]) >= 0)
+    assert [trial['TTL1ack_s'] for trial in trials] == on.tolist()
+    assert all([p['error'] is None for p in sync.pulses])
+
+
+class FailingU3(FakeU3):
+    # fake U3 whose second pulse fails (e.g. the device was unplugged)
+    def pulseOn(self):
+        FakeU3.pulseOn(self)
+        if len(self.log) == 3:
+            raise IOError('device unplugged')
+
+
+def test_device_error_is_recorded():
+    # a failing device call is recorded with the pulse, not raised in the thread that sent it, and later pulses are still sent
+    for threaded in [True,False]:
+        sync = SyncDispatcher(FailingU3(latency_s = 0),width_s = 0,gap_s = 0,threaded = threaded)
+        trial = {}
+        for t in range(3):
+            sync.send(label = t,target = trial if t == 1 else None,field = 'TTL1ack_s')
+        sync.close()
+        assert [p['error'] is None for p in sync.pulses] == [True,False,True]
+        assert 'device unplugged' in sync.pulses[1]['error']
+        assert np.isnan(trial['TTL1ack_s'])
+        assert np.isnan(sync.pulses[2]['on_s']) == False
+
+
+def test_session_sync_log(tmp_path):
+    # a session with the fake U3 writes one acknowledged pulse per trial to syncLog.csv, and the ack times reach the trial table
+    from pyrtp.simulate import simParams,simulateSession
+    params = simParams()
+    params['num_trials'] = 1
+    params['rng_seed'] = 2
+    params['SYNC_device'] = 'fake'
+    params['SYNC_width_s'] = 0.001
+    params['dur_waitforsync'] = 0.001
+    task_df,sim_s = simulateSession(params,'s1',0,saveDir = str(tmp_path))
+
+    sync_df = pd.read_csv(os.path.join(str(tmp_path),'s1','session0','syncLog.csv'),index_col = 'pulse')
+    assert sync_df['label'].tolist() == list(range(len(task_df)))
+    assert sync_df['error'].isna().all()
+    assert sync_df['on_s'].notna().all()
+    assert np.allclose(task_df['TTL1ack_s'].to_numpy(),sync_df['on_s'].to_numpy())
@@ -0,0 +1,34 @@
+# Tests for pyrtp.synth (sound cloud synthesis and the tone wavetable cache)
+import numpy as np
+
+from pyrtp.synth import synthCloud,ToneBank
+
+
+def test_cloud_peak_amplitude():
+    # the mix is scaled by 1/num_tones: a single tone and a cloud of identical tones peak at full scale, any cloud stays within [-1, 1]
+    for n in [1,5,10,50]:
+        assert abs(np.abs(synthCloud(np.zeros(n,dtype = int))).max()-1) < 1e-3
+        assert np.abs(synthCloud(np.arange(n)-9)).max() <= 1+1e-6
+
+
+def test_cloud_tone_amplitude():
+    # each tone of a num_tones cloud has amplitude 1/num_tones
+    n = 10
+    dur,sampleRate = 0.05,44100
+    t = np.arange(int(np.round(dur*sampleRate)))/sampleRate
+    buf = synthCloud(np.zeros(n,dtype = int),dur = dur,sampleRate = sampleRate,hamming = False)
+    tone = synthCloud([0],dur = dur,sampleRate = sampleRate,hamming = False)
+    assert np.allclose(buf,tone,atol = 1e-6)
+    assert np.allclose(synthCloud(np.array([0,12]),dur = dur,sampleRate = sampleRate,hamming = False),(np.sin(2*np.pi*440*t)+np.sin(2*np.pi*880*t))/2,atol = 1e-5)
+
+
+def test_bank_matches_synth():
+    # mixing from the cached wavetables gives the synthesized cloud, also for tones outside the prebuilt range
+    bank = ToneBank()
+    bank.prebuild(np.arange(-9,64))
+    rng = np.random.default_rng(0)
+    for arr in [rng.integers(-9,63,size = 10),np.array([70,-12,0]),np.array([5])]:
+        assert np.allclose(bank.mixCloud(arr),synthCloud(arr),atol = 1e-5)
+    out = np.full(2205,np.nan,dtype = 'float32')
+    assert bank.mixCloud(np.array([],dtype = int),out = out) is out
+    assert np.all(out == 0)
@@ -0,0 +1,141 @@
+# Tests for pyrtp.task, run headless with the null audio core of pyrtp.benchmark and a keyboard that presses a response key after a fixed delay
+import os
+import time
+import numpy as np
+import pytest
+
+from pyrtp.params import getParams
+from pyrtp.trials import generateTrialList
+from pyrtp.simulate import SimKey
+from pyrtp.benchmark import NullClock,installNullCore,benchParams
+
+
+class PressKeyboard:
+    # Stand-in for psychopy.hardware.keyboard.Keyboard that reports one press of key, delay_s after it was created (tDown on time.perf_counter, as psychopy timestamps presses in absolute time)
+    delay_s = 0.15
+    key = 'rshift'
+
+    def __init__(self, device = -1, waitForStart = True, **kwargs):
+        self.clock = NullClock()
+        self.tDown = time.perf_counter()+self.delay_s
+        self.reported = False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def clearEvents(self):
+        pass
+
+    def getKeys(self, keyList = None, waitRelease = False, clear = True):
+        if self.reported or (time.perf_counter() < self.tDown):
+            return []
+        self.reported = True
+        return [SimKey(self.key,rt = self.tDown-self.clock.getLastResetTime(),tDown = self.tDown)]
+
+
+class PressKeyboardModule:
+    Keyboard = PressKeyboard
+
+
+@pytest.mark.parametrize('path',['null','step','prerender'])
+def test_press_timing(tmp_path, path):
+    # RT and the press to offset lag are measured from the keyboard's press timestamp on the clock of stimOn_s and stimOff_s, so the stimulus can only stop after the press
+    task = installNullCore()
+    task.keyboard = PressKeyboardModule()
+    params = benchParams(getParams(),100,10,path = path)
+    params['rng_seed'] = 1
+    params['stepLogpath'] = os.path.join(str(tmp_path),'stepLog')
+    task.setupAudio(params)
+
+    trialDict = task.runTrial(generateTrialList(params,rng = np.random.default_rng(1))[0],params,trial = 0)
+
+    assert trialDict['buttonPress'] == 'rshift'
+    assert trialDict['stimOffLag_s'] >= 0
+    assert trialDict['stimOffLag_s'] < 0.05
+    assert trialDict['buttonPress_s'] <= trialDict['stimOff_s']
+    assert 0 < trialDict['RT'] <= PressKeyboard.delay_s
+    assert trialDict['RT'] == pytest.approx(trialDict['buttonPress_s']-trialDict['stimOn_s'])
+
+
+def test_resume_with_checkpoint_ahead_of_journal(tmp_path):
+    # with journal_fsync 'off' the checkpoint can reach the disk before the journal records it counts. Resuming after such a crash falls back to the journal and finishes the session
+    from pyrtp.simulate import simParams,simulateSession
+    from pyrtp.storage import readCheckpoint,readJournal
+    params = simParams()
+    params['num_trials'] = 2
+    params['data_formats'] = ['csv']
+    params['journal_fsync'] = 'off'
+    params['rng_seed'] = 3
+    task_df,sim_s = simulateSession(params,'s1',0,saveDir = str(tmp_path))
+    n_trials = len(task_df)
+
+    # lose all but the first 3 journal records (frames of one record and its crc32)
+    sessDir = os.path.join(str(tmp_path),'s1','session0')
+    journalpath = os.path.join(sessDir,'trialJournal')
+    records = readJournal(journalpath)
+    frame_n = records.dtype.itemsize+4
+    with open(journalpath,'r+b') as f:
+        f.truncate(os.path.getsize(journalpath)-(len(records)-3)*frame_n)
+    assert readCheckpoint(os.path.join(sessDir,'checkpoint.json'))['journalRecords'] == n_trials
+
+    params = simParams()
+    params['num_trials'] = 2
+    params['data_formats'] = ['csv']
+    params['journal_fsync'] = 'off'
+    params['rng_seed'] = 3
+    task_df,sim_s = simulateSession(params,'s1',0,saveDir = str(tmp_path))
+
+    assert len(task_df) == n_trials
+    assert np.all(task_df['wasShown'] == 1)
+    # trials 0-2 finished before the crash, so the session picks up at trial 3 without running trial 2 again
+    assert readJournal(journalpath)['trial'].tolist() == list(range(n_trials))
+
+
+@pytest.mark.parametrize('checkpoint',[True,False])
+def test_resume_keeps_session_seed(tmp_path, checkpoint):
+    # a session without rng_seed draws one when it starts. Resuming it (from the checkpoint or from the journal) keeps that seed and block order, so config.json records the seed every trial was drawn from
+    from pyrtp.simulate import simParams,simulateSession
+    from pyrtp.config import SessionConfig
+    from pyrtp.storage import readCheckpoint,writeCheckpoint,readJournal,readTraces,trialTrace
+    from pyrtp.trials import trialSeeds,trialTrajectories
+    def sessionParams():
+        params = simParams()
+        params['num_trials'] = 2
+        params['data_formats'] = ['csv']
+        params['rng_seed'] = None
+        return params
+
+    simulateSession(sessionParams(),'s1',0,saveDir = str(tmp_path))
+    sessDir = os.path.join(str(tmp_path),'s1','session0')
+    first = SessionConfig.load(os.path.join(sessDir,'config.json')).session
+
+    # crash after trial 2: drop the journal records of the later trials, and the checkpoint (or point it at trial 3 with the journal records it counts)
+    journalpath = os.path.join(sessDir,'trialJournal')
+    records = readJournal(journalpath)
+    frame_n = records.dtype.itemsize+4
+    with open(journalpath,'r+b') as f:
+        f.truncate(os.path.getsize(journalpath)-(len(records)-3)*frame_n)
+    checkpointpath = os.path.join(sessDir,'checkpoint.json')
+    if checkpoint == True:
+        manifest = readCheckpoint(checkpointpath)
+        manifest['journalRecords'] = 3
+        manifest['nextTrial'] = 3
+        manifest.pop('traceRecords')
+        writeCheckpoint(checkpointpath,manifest)
+    else:
+        os.remove(checkpointpath)
+
+    params = sessionParams()
+    task_df,sim_s = simulateSession(params,'s1',0,saveDir = str(tmp_path))
+    session = SessionConfig.load(os.path.join(sessDir,'config.json')).session
+
+    assert session['rng_seed'] == first['rng_seed']
+    assert session['block_list'] == first['block_list']
+    assert np.array_equal(task_df['trialSeed'].to_numpy(),trialSeeds(session['rng_seed'],len(task_df)))
+    traces,index = readTraces(os.path.join(sessDir,'stimTraces'))
+    played,offsets = trialTrajectories(params,task_df)
+    for t in range(len(task_df)):
+        assert np.array_equal(trialTrace(traces,index,t),played[offsets[t]:offsets[t+1]])
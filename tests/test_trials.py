@@ -0,0 +1,69 @@
+# Tests for pyrtp.trials (trial table, per-trial seeds and the step log)
+import os
+import numpy as np
+import pytest
+
+from pyrtp.trials import emptyStepLog,appendStepLog,loadStepLog,openStepLog,stepLogDtype,readStepLogHeader
+
+
+def test_step_log_header(tmp_path):
+    # the step log records its num_tones and record dtype, and loadStepLog checks them
+    fpath = os.path.join(str(tmp_path),'stepLog')
+    openStepLog(fpath,10)
+    for t in [0,1]:
+        stepLog = emptyStepLog(np.zeros((3,10),dtype = int),trial = t)
+        stepLog['onset_s'] = t
+        appendStepLog(fpath,stepLog,num_tones = 10)
+
+    records = loadStepLog(fpath)
+    assert records['trial'].tolist() == [0,0,0,1,1,1]
+    assert records['step'].tolist() == [0,1,2]*2
+    assert loadStepLog(fpath,num_tones = 10).tobytes() == records.tobytes()
+    with pytest.raises(ValueError):
+        loadStepLog(fpath,num_tones = 5)
+    with pytest.raises(ValueError):
+        openStepLog(fpath,5)
+
+    # a new file gets its header from the first append
+    fpath2 = os.path.join(str(tmp_path),'stepLog2')
+    appendStepLog(fpath2,emptyStepLog(np.zeros((2,4),dtype = int)),num_tones = 4)
+    assert readStepLogHeader(fpath2)[0] == 4
+    assert len(loadStepLog(fpath2)) == 2
+
+
+def test_step_log_without_header(tmp_path):
+    # step logs written before the header: read with the num_tones they were written with, a wrong layout raises instead of returning garbage
+    fpath = os.path.join(str(tmp_path),'stepLog')
+    legacy = np.zeros(4,dtype = stepLogDtype(10))
+    legacy['step'] = np.arange(4)
+    legacy['cloud'] = 7
+    legacy.tofile(fpath)
+
+    records = loadStepLog(fpath,num_tones = 10)
+    assert records['step'].tolist() == [0,1,2,3]
+    assert np.all(records['cloud'] == 7)
+    with pytest.raises(ValueError):
+        loadStepLog(fpath)
+    with pytest.raises(ValueError):
+        loadStepLog(fpath,num_tones = 7)
+
+    # a session resumed on it keeps the old file next to a new one with a header
+    openStepLog(fpath,10)
+    assert loadStepLog(fpath+'.v0',num_tones = 10).tobytes() == records.tobytes()
+    assert len(loadStepLog(fpath)) == 0
+
+
+def test_records_without_seeds():
+    # trial dictionaries saved before per-trial seeds: trials not yet shown get distinct seeds derived from rng_seed, shown trials keep 0 (no seed)
+    from pyrtp.params import getParams
+    from pyrtp.trials import TrialTable,trialSeeds
+    params = getParams()
+    params['rng_seed'] = 5
+    records = [{'block':'fast','coherence':0.8,'direction':'increase','wasShown':1 if t < 2 else np.nan} for t in range(6)]
+    table = TrialTable.fromRecords(params,records)
+
+    seeds = table.columns['trialSeed']
+    assert seeds[:2].tolist() == [0,0]
+    assert np.array_equal(seeds[2:],trialSeeds(5,6)[2:])
+    assert len(np.unique(seeds[2:])) == 4
+    assert table.seedsDerived == 4